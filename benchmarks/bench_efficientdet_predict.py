@@ -0,0 +1,75 @@
+"""Per batch latency of `efficientdet.predict` on CPU.
+
+Compares predicting with a bench prepared once (`prepare_for_inference`) with
+the previous behaviour of wrapping the model in a new `DetBenchPredict` and
+moving it to the device on every batch. The "setup" rows only time the
+wrapping, which is the overhead that is removed from every batch.
+
+Usage: `python benchmarks/bench_efficientdet_predict.py`
+"""
+import timeit
+from icevision.all import *
+from effdet import DetBenchPredict, unwrap_bench
+from effdet import create_model_from_config, get_efficientdet_config
+
+
+def create_model(model_name, img_size):
+    config = get_efficientdet_config(model_name=model_name)
+    config.image_size = (img_size, img_size)
+    # random weights, so the benchmark does not need to download them
+    return create_model_from_config(
+        config,
+        bench_task="train",
+        num_classes=5,
+        pretrained=False,
+        pretrained_backbone=False,
+    )
+
+
+@torch.no_grad()
+def predict_rewrap(model, batch, detection_threshold=0.5):
+    imgs, img_info = batch
+    bench = DetBenchPredict(unwrap_bench(model))
+    bench = bench.eval().to(model_device(model))
+    raw_preds = bench(x=imgs, img_info=img_info)
+    return efficientdet.convert_raw_predictions(raw_preds, detection_threshold)
+
+
+def bench(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def report(name, before, after):
+    print(f"{name:<40}{before:>11.4f}s{after:>11.4f}s{before / after:>9.1f}x")
+
+
+def main():
+    torch.manual_seed(0)
+    print(f"{'benchmark':<40}{'before':>12}{'after':>12}{'speedup':>10}")
+    for model_name, img_size in [
+        ("tf_efficientdet_lite0", 384),
+        ("efficientdet_d0", 512),
+    ]:
+        model = create_model(model_name, img_size)
+        device = model_device(model)
+        before = bench(
+            lambda: DetBenchPredict(unwrap_bench(model)).eval().to(device), number=10
+        )
+        after = bench(lambda: efficientdet.prepare_for_inference(model), number=10)
+        report(f"{model_name} setup", before, after)
+
+        for batch_size in [1, 4]:
+            imgs = torch.rand(batch_size, 3, img_size, img_size)
+            img_info = {
+                "img_scale": torch.ones(batch_size),
+                "img_size": torch.tensor([[img_size, img_size]] * batch_size),
+            }
+            batch = (imgs, img_info)
+
+            before = bench(lambda: predict_rewrap(model, batch), number=3)
+            after = bench(lambda: efficientdet.predict(model, batch), number=3)
+            report(f"{model_name} {batch_size}x{img_size}x{img_size}", before, after)
+
+
+if __name__ == "__main__":
+    main()
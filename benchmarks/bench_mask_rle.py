@@ -0,0 +1,55 @@
+"""Micro-benchmark of the RLE conversions in `icevision.core.mask`.
+
+Compares `MaskArray.to_coco_rle` with the pure python implementation it
+replaced.
+
+Usage: `python benchmarks/bench_mask_rle.py`
+"""
+import itertools, timeit
+import numpy as np
+from icevision.all import *
+
+
+def to_coco_rle_groupby(masks: MaskArray, h, w):
+    rles = []
+    for mask in masks.data:
+        counts = []
+        flat = itertools.groupby(mask.ravel(order="F"))
+        for i, (value, elements) in enumerate(flat):
+            if i == 0 and value == 1:
+                counts.append(0)
+            counts.append(len(list(elements)))
+        rles.append({"counts": counts, "size": (h, w)})
+    return rles
+
+
+def random_masks(n, size, seed=0):
+    """Blobs, similar to instance masks, instead of noise."""
+    rng = np.random.RandomState(seed)
+    yy, xx = np.mgrid[:size, :size]
+    masks = []
+    for _ in range(n):
+        cx, cy = rng.randint(0, size, 2)
+        r = rng.randint(size // 16, size // 4)
+        masks.append(((xx - cx) ** 2 + (yy - cy) ** 2) < r ** 2)
+    return MaskArray(np.stack(masks))
+
+
+def bench(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+
+def main():
+    print(f"{'benchmark':<32}{'before':>12}{'after':>12}{'speedup':>10}")
+    for size, n in [(1024, 8), (4096, 2)]:
+        masks = random_masks(n, size)
+        assert masks.to_coco_rle(size, size) == to_coco_rle_groupby(masks, size, size)
+
+        before = bench(lambda: to_coco_rle_groupby(masks, size, size), number=1)
+        after = bench(lambda: masks.to_coco_rle(size, size), number=3)
+        name = f"to_coco_rle {n}x{size}x{size}"
+        print(f"{name:<32}{before:>11.4f}s{after:>11.4f}s{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
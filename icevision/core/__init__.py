@@ -6,5 +6,7 @@ from icevision.core.bbox import *
 from icevision.core.record_type import *
 from icevision.core.record_mixins import *
 from icevision.core.record import *
+from icevision.core.record_collection import *
+from icevision.core.autofix import *
 from icevision.core.keypoints import *
 from icevision.core.record_utils import *
@@ -0,0 +1,255 @@
+__all__ = ["AutofixReport", "autofix_records"]
+
+from icevision.imports import *
+from icevision.utils import *
+from .exceptions import *
+from .record_mixins import *
+from .record import *
+from .record_collection import *
+
+# Record mixins with an `_autofix` that is vectorized by `autofix_records`,
+# records with any other `_autofix` are fixed one by one with `BaseRecord.autofix`
+_BATCHED_AUTOFIX_MIXINS = (
+    RecordMixin,
+    FilepathRecordMixin,
+    LabelsRecordMixin,
+    BBoxesRecordMixin,
+)
+
+_BBOX_CLIPS = ["bbox_clip_xmin", "bbox_clip_ymin", "bbox_clip_xmax", "bbox_clip_ymax"]
+
+
+class AutofixReport:
+    """Summary of the fixes made by `autofix_records`.
+
+    # Arguments
+        counts: Number of times each fix was applied, e.g. `bbox_clip_xmin`.
+        removed_annotations: One dict per removed annotation, with the `imageid`
+        of the record, the `index` of the annotation and the reason.
+        removed_records: One dict per removed record, with the `imageid` and reason.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.removed_annotations: List[dict] = []
+        self.removed_records: List[dict] = []
+
+    def log(self, max_items: int = 10):
+        """Logs the report, listing at most `max_items` removed annotations."""
+        if not (self.counts or self.removed_annotations or self.removed_records):
+            return
+
+        lines = [f"\t- {k}: {v}" for k, v in sorted(self.counts.items())]
+        removed = [*self.removed_records, *self.removed_annotations]
+        lines += [f"\t- Removed {o}" for o in removed[:max_items]]
+        if len(removed) > max_items:
+            lines.append(f"\t- ... and {len(removed) - max_items} more")
+
+        logger.log("AUTOFIX-REPORT", "Autofix report:\n{}", "\n".join(lines))
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__} with {dict(self.counts)}, "
+            f"{len(self.removed_records)} removed records and "
+            f"{len(self.removed_annotations)} removed annotations>"
+        )
+
+
+def autofix_records(
+    records: Sequence[BaseRecord], return_report: bool = False
+) -> Union[Sequence[BaseRecord], Tuple[Sequence[BaseRecord], AutofixReport]]:
+    """Autofixes all records at once, see `BaseRecord.autofix`.
+
+    The bboxes of all records are clipped and validated in a single vectorized
+    pass and one aggregated report is logged at the end. Records are modified
+    in place, a `RecordCollection` is not, a new one is returned instead.
+
+    # Arguments
+        records: Records to fix, usually a whole split.
+        return_report: If True, also returns the `AutofixReport`.
+
+    # Returns
+        The records that could be fixed, and the report if `return_report`.
+    """
+    report = AutofixReport()
+    if isinstance(records, RecordCollection):
+        records = _autofix_collection(records, report)
+    else:
+        records = _autofix_records(records, report)
+
+    report.log()
+    if return_report:
+        return records, report
+    return records
+
+
+def _autofix_records(
+    records: Sequence[BaseRecord], report: AutofixReport
+) -> List[BaseRecord]:
+    keep_records, batched = [], []
+    for record in records:
+        try:
+            if not _is_batched(type(record)):
+                record.autofix()
+            else:
+                record.check_num_annotations()
+                if isinstance(record, FilepathRecordMixin):
+                    _check_filepath(record.filepath)
+                if isinstance(record, BBoxesRecordMixin):
+                    batched.append(record)
+            keep_records.append(record)
+        except AutofixAbort as e:
+            _remove_record(report, record.imageid, str(e))
+
+    if not batched:
+        return keep_records
+
+    xyxys = np.array(
+        [bbox.xyxy for record in batched for bbox in record.bboxes], dtype=np.float64
+    ).reshape(-1, 4)
+    sizes = [(record.width, record.height) for record in batched]
+    offsets = np.cumsum([0, *(len(record.bboxes) for record in batched)])
+    clips, invalid = _autofix_xyxys(xyxys, sizes, offsets, report)
+
+    # only write back the few bboxes that changed
+    for i in np.flatnonzero(clips.any(axis=1) & ~invalid):
+        record_idx = np.searchsorted(offsets, i, side="right") - 1
+        record = batched[record_idx]
+        bbox = record.bboxes[i - offsets[record_idx]]
+        clip_xmin, clip_ymin, clip_xmax, clip_ymax = clips[i]
+        if clip_xmin:
+            bbox.xmin = 0
+        if clip_ymin:
+            bbox.ymin = 0
+        if clip_xmax:
+            bbox.xmax = record.width
+        if clip_ymax:
+            bbox.ymax = record.height
+
+    # remove from the end so the indexes of the other annotations stay valid
+    for i in np.flatnonzero(invalid)[::-1]:
+        record_idx = np.searchsorted(offsets, i, side="right") - 1
+        record = batched[record_idx]
+        annotation_idx = int(i - offsets[record_idx])
+        record.remove_annotation(annotation_idx)
+        _remove_annotation(report, record.imageid, annotation_idx, xyxys[i])
+
+    report.removed_annotations.reverse()
+    return keep_records
+
+
+def _autofix_collection(
+    records: RecordCollection, report: AutofixReport
+) -> RecordCollection:
+    if not _is_batched(records.record_class):
+        return RecordCollection.from_records(
+            _autofix_records(list(records), report), records.record_class
+        )
+
+    columns = records.columns
+    imageids = columns["imageid"]
+    keep_records = np.ones(len(records), dtype=bool)
+
+    counts = {
+        name: np.diff(columns[f"{name}_offsets"])
+        for name in ["labels", "bboxes", "areas", "iscrowds", "masks"]
+        if f"{name}_offsets" in columns
+    }
+    if counts:
+        counts = np.stack(list(counts.values()))
+        for i in np.flatnonzero((counts != counts[0]).any(axis=0)):
+            keep_records[i] = False
+            _remove_record(
+                report,
+                int(imageids[i]),
+                "Number of items should be the same for each annotation type",
+            )
+
+    if issubclass(records.record_class, FilepathRecordMixin):
+        for i, filepath in enumerate(columns["filepath"]):
+            if not keep_records[i]:
+                continue
+            try:
+                _check_filepath(Path(filepath))
+            except AutofixAbort as e:
+                keep_records[i] = False
+                _remove_record(report, int(imageids[i]), str(e))
+
+    records = records.filter(keep_records)
+    if not issubclass(records.record_class, BBoxesRecordMixin):
+        return records
+
+    columns = records.columns
+    xyxys = columns["bboxes"].astype(np.float64)
+    offsets = columns["bboxes_offsets"]
+    sizes = np.stack([columns["width"], columns["height"]], axis=1)
+    _, invalid = _autofix_xyxys(xyxys, sizes, offsets, report)
+
+    for i in np.flatnonzero(invalid):
+        record_idx = np.searchsorted(offsets, i, side="right") - 1
+        annotation_idx = int(i - offsets[record_idx])
+        imageid = int(columns["imageid"][record_idx])
+        _remove_annotation(report, imageid, annotation_idx, xyxys[i])
+
+    fixed = RecordCollection(
+        record_class=records.record_class,
+        columns={**columns, "bboxes": xyxys.astype(columns["bboxes"].dtype)},
+        class_map=records.class_map,
+        keypoints_metadata=records.keypoints_metadata,
+    )
+    return fixed.filter(keep_annotations=~invalid)
+
+
+def _autofix_xyxys(
+    xyxys: np.ndarray,
+    sizes: Sequence[Tuple[int, int]],
+    offsets: np.ndarray,
+    report: AutofixReport,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Clips `xyxys` in place to the image sizes.
+
+    # Returns
+        Which coordinates were clipped `(N, 4)` and which bboxes are invalid `(N,)`.
+    """
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 2)
+    img_wh = np.repeat(sizes, np.diff(offsets), axis=0)
+
+    clips = np.concatenate([xyxys[:, :2] < 0, xyxys[:, 2:] > img_wh], axis=1)
+    np.clip(xyxys[:, :2], 0, None, out=xyxys[:, :2])
+    np.minimum(xyxys[:, 2:], img_wh, out=xyxys[:, 2:])
+    invalid = (xyxys[:, 0] >= xyxys[:, 2]) | (xyxys[:, 1] >= xyxys[:, 3])
+
+    for name, n in zip(_BBOX_CLIPS, clips.sum(axis=0)):
+        if n:
+            report.counts[name] += int(n)
+    if invalid.any():
+        report.counts["bbox_invalid"] += int(invalid.sum())
+
+    return clips, invalid
+
+
+def _is_batched(record_class: type) -> bool:
+    return all(
+        o in _BATCHED_AUTOFIX_MIXINS or issubclass(o, BaseRecord)
+        for o in record_class.mro()
+        if "_autofix" in vars(o)
+    )
+
+
+def _check_filepath(filepath: Path):
+    if not filepath.exists():
+        raise AutofixAbort(f"File '{filepath}' does not exist")
+
+
+def _remove_record(report: AutofixReport, imageid: int, reason: str):
+    report.counts["removed_records"] += 1
+    report.removed_records.append({"imageid": imageid, "reason": reason})
+
+
+def _remove_annotation(
+    report: AutofixReport, imageid: int, index: int, xyxy: np.ndarray
+):
+    reason = f"Cannot auto-fix coordinates: {tuple(xyxy.tolist())}"
+    report.removed_annotations.append(
+        {"imageid": imageid, "index": index, "reason": reason}
+    )
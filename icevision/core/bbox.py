@@ -1,7 +1,8 @@
-__all__ = ["BBox"]
+__all__ = ["BBox", "BBoxArray"]
 
 from icevision.imports import *
 from .exceptions import *
+from collections.abc import Sequence as SequenceABC
 
 
 class BBox:
@@ -145,23 +146,86 @@ class BBox:
 
     @classmethod
     def from_rle(cls, rle, h, w):
-        a = np.array(rle.counts, dtype=int)
-        a = a.reshape((-1, 2))  # an array of (start, length) pairs
-        a[:, 0] -= 1  # `start` is 1-indexed
-        y0 = a[:, 0] % h
-        y1 = y0 + a[:, 1]
-        if np.any(y1 > h):
-            # got `y` overrun, meaning that there are a pixels in mask on 0 and shape[0] position
-            y0 = 0
-            y1 = h
-        else:
-            y0 = np.min(y0)
-            y1 = np.max(y1)
-        x0 = a[:, 0] // h
-        x1 = (a[:, 0] + a[:, 1]) // h
-        x0 = np.min(x0)
-        x1 = np.max(x1)
-        if x1 > w:
-            # just went out of the image dimensions
-            raise ValueError(f"invalid RLE or image dimensions: x1={x1} > shape[1]={w}")
-        return cls.from_xyxy(x0, y0, x1, y1)
+        """Tightest box around a `RLE` mask of an image with size `(h, w)`."""
+        counts = list(rle.to_coco())
+        missing = h * w - sum(counts)
+        if missing < 0:
+            raise ValueError(f"invalid RLE or image dimensions: h={h}, w={w}")
+        if missing > 0:
+            # the trailing run of 0s is omitted, e.g. by `RLE.from_kaggle`
+            if len(counts) % 2 == 0:
+                counts.append(missing)
+            else:
+                counts[-1] += missing
+        erles = mask_utils.frPyObjects([{"counts": counts, "size": [h, w]}], h, w)
+        x, y, width, height = mask_utils.toBbox(erles)[0].tolist()
+        return cls.from_xywh(x, y, width, height)
+
+
+class BBoxArray(SequenceABC):
+    """Bounding boxes of an image stored as a single `(N, 4)` array of xyxy.
+
+    Behaves like a list of `BBox` (`len`, indexing, iteration), the `BBox`
+    objects are only created when accessed. Used by the predictions, where
+    creating one object per detection is costly.
+
+    # Arguments
+        xyxy: Array-like of shape `(N, 4)`.
+
+    # Examples
+    ```python
+    bboxes = BBoxArray(np.array([[1, 2, 3, 4], [5, 6, 7, 8]]))
+    bbox = bboxes[0]
+    xywh = bboxes.xywh
+    ```
+    """
+
+    def __init__(self, xyxy):
+        self.xyxy = np.asarray(xyxy).reshape(-1, 4)
+
+    @classmethod
+    def from_bboxes(cls, bboxes: Sequence[BBox]) -> "BBoxArray":
+        return cls(np.array([bbox.xyxy for bbox in bboxes]))
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            return BBox.from_xyxy(*self.xyxy[idx])
+        return self.__class__(self.xyxy[idx])
+
+    def __iter__(self):
+        for xyxy in self.xyxy:
+            yield BBox.from_xyxy(*xyxy)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BBoxArray):
+            return np.array_equal(self.xyxy, other.xyxy)
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return False
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} ({len(self)} bboxes)>"
+
+    @property
+    def width(self) -> np.ndarray:
+        return self.xyxy[:, 2] - self.xyxy[:, 0]
+
+    @property
+    def height(self) -> np.ndarray:
+        return self.xyxy[:, 3] - self.xyxy[:, 1]
+
+    @property
+    def area(self) -> np.ndarray:
+        return self.width * self.height
+
+    @property
+    def xywh(self) -> np.ndarray:
+        return np.concatenate(
+            [self.xyxy[:, :2], self.xyxy[:, 2:] - self.xyxy[:, :2]], 1
+        )
+
+    def to_tensor(self):
+        return tensor(self.xyxy, dtype=torch.float)
@@ -1,4 +1,9 @@
-__all__ = ["InvalidDataError", "AutofixAbort", "AbortParseRecord"]
+__all__ = [
+    "InvalidDataError",
+    "AutofixAbort",
+    "AbortParseRecord",
+    "UnsupportedRecordError",
+]
 
 
 class InvalidDataError(Exception):
@@ -11,3 +16,7 @@ class AutofixAbort(Exception):
 
 class AbortParseRecord(Exception):
     pass
+
+
+class UnsupportedRecordError(Exception):
+    pass
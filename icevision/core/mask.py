@@ -49,6 +49,8 @@ class EncodedRLEs(Mask):
         self.erles.pop(i)
 
     def to_mask(self, h, w) -> "MaskArray":
+        if len(self.erles) == 0:
+            return MaskArray(np.zeros((0, h, w), dtype=np.uint8))
         mask = mask_utils.decode(self.erles)
         mask = mask.transpose(2, 0, 1)  # channels first
         return MaskArray(mask)
@@ -86,18 +88,15 @@ class MaskArray(Mask):
         )
 
     def to_coco_rle(self, h, w) -> List[dict]:
-        """From https://stackoverflow.com/a/49547872/6772672"""
+        """Uncompressed COCO RLEs, counts alternate between runs of 0s and 1s
+        (starting with 0s) over the masks flattened in column-major order."""
         assert self.data.shape[1:] == (h, w)
-        rles = []
-        for mask in self.data:
-            counts = []
-            flat = itertools.groupby(mask.ravel(order="F"))
-            for i, (value, elements) in enumerate(flat):
-                if i == 0 and value == 1:
-                    counts.append(0)
-                counts.append(len(list(elements)))
-            rles.append({"counts": counts, "size": (h, w)})
-        return rles
+        # pycocotools encodes in C, only its compressed counts need decoding
+        data = np.asfortranarray(self.data.transpose(1, 2, 0), dtype=np.uint8)
+        return [
+            {"counts": _decompress_counts(erle["counts"]).tolist(), "size": (h, w)}
+            for erle in mask_utils.encode(data)
+        ]
 
     @property
     def shape(self):
@@ -248,3 +247,28 @@ class Polygon(Mask):
         erles = mask_utils.frPyObjects(self.points, h, w)
         erle = mask_utils.merge(erles)  # make unconnected polygons a single mask
         return EncodedRLEs([erle])
+
+
+def _decompress_counts(counts: bytes) -> np.ndarray:
+    """Vectorized version of `rleFrString` from pycocotools `maskApi.c`.
+
+    Each count is stored in chunks of 5 bits (least significant first), one char
+    per chunk offset by 48, with bit 6 marking that more chunks follow and bit 5
+    of the last chunk being the sign. From the third count on, counts are stored
+    as the difference with the count two positions before.
+    """
+    chars = np.frombuffer(counts, dtype=np.uint8).astype(np.int64) - 48
+    if len(chars) == 0:
+        return chars
+    is_last = (chars & 0x20) == 0
+    starts = np.concatenate([[0], np.flatnonzero(is_last)[:-1] + 1])
+    nchunks = np.diff(np.append(starts, len(chars)))
+    shifts = 5 * (np.arange(len(chars)) - np.repeat(starts, nchunks))
+
+    values = np.add.reduceat((chars & 0x1F) << shifts, starts)
+    negative = (chars[is_last] & 0x10) != 0
+    values[negative] -= np.left_shift(1, 5 * nchunks[negative])
+
+    values[2::2] = np.cumsum(values[2::2])
+    values[1::2] = np.cumsum(values[1::2])
+    return values
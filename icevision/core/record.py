@@ -1,4 +1,4 @@
-__all__ = ["BaseRecord", "autofix_records", "create_mixed_record"]
+__all__ = ["BaseRecord", "create_mixed_record"]
 
 from icevision.imports import *
 from icevision.utils import *
@@ -48,15 +48,29 @@ class BaseRecord(ImageidRecordMixin, SizeRecordMixin, RecordMixin, MutableMappin
         # TODO: fixed with EncodedRLEs?
         self._remove_annotation(i)
 
+    def merge(self, other: "BaseRecord"):
+        """Appends the annotations of `other` (a record of the same image) to this record."""
+        self._merge(other)
+
     def aggregate_objects(self):
         return self._aggregate_objects()
 
     def copy(self) -> "BaseRecord":
         return copy(self)
 
-    def load(self) -> "BaseRecord":
+    def load(self, lazy_masks: bool = False) -> "BaseRecord":
+        """Returns a copy of the record with the image (and masks) loaded.
+
+        # Arguments
+            lazy_masks: If True, masks are kept as `EncodedRLEs` instead of being
+            decoded to a `MaskArray`. The model dataloaders decode them after the
+            transforms, at the final resolution.
+        """
         record = copy(self)
+        if lazy_masks:
+            record._lazy_masks = True
         record._load()
+        record.__dict__.pop("_lazy_masks", None)
         return record
 
     def __repr__(self) -> str:
@@ -81,30 +95,6 @@ class BaseRecord(ImageidRecordMixin, SizeRecordMixin, RecordMixin, MutableMappin
         return len(self.as_dict())
 
 
-def autofix_records(records: Sequence[BaseRecord]) -> Sequence[BaseRecord]:
-    keep_records = []
-    for record in records:
-
-        def _pre_replay():
-            logger.log(
-                "AUTOFIX-START",
-                "️🔨  Autofixing record with imageid: {}  ️🔨",
-                record.imageid,
-            )
-
-        with ReplaySink(_pre_replay) as sink:
-            try:
-                record.autofix()
-                keep_records.append(record)
-            except AutofixAbort as e:
-                logger.warning(
-                    "🚫 Record could not be autofixed and will be removed because: {}",
-                    str(e),
-                )
-
-    return keep_records
-
-
 def create_mixed_record(
     mixins: Sequence[Type[RecordMixin]], add_base: bool = True
 ) -> Type[BaseRecord]:
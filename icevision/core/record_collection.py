@@ -0,0 +1,453 @@
+__all__ = ["RecordCollection"]
+
+from icevision.imports import *
+from icevision.utils import *
+from collections.abc import Sequence as SequenceABC
+from .bbox import *
+from .mask import *
+from .keypoints import *
+from .class_map import *
+from .exceptions import *
+from .record_mixins import *
+from .record import *
+
+
+class RecordCollection(SequenceABC):
+    """Sequence of records stored in contiguous numpy arrays (columns).
+
+    All annotations of the collection live in a few flat arrays, e.g. the boxes are
+    a single `(num_annotations, 4)` float32 array in the xyxy format and the
+    labels a single int32 array, `<name>_offsets` arrays mark where the
+    annotations of each image start and end. Compressed RLE masks are packed into
+    a single byte buffer. Compared to a list of records this takes a fraction of
+    the memory and is fast to pickle (e.g. when sent to `DataLoader` workers).
+
+    Indexing the collection returns a new record of `record_class`, so it can be
+    used anywhere a list of records is expected (e.g. `Dataset`). The records are
+    copies, changes made to them are not reflected on the collection (i.e.
+    `records[0].set_filepath(...)` has no effect), use `list(records)` to get
+    records that can be modified. Collections can be concatenated with `+`.
+
+    Use `RecordCollection.from_records` to create a collection.
+
+    # Arguments
+        record_class: Class of the records returned when indexing.
+        columns: Arrays with the data of the records.
+        class_map: `ClassMap` shared by all records, only used if `record_class`
+        has a `ClassMapRecordMixin`.
+        keypoints_metadata: `KeypointsMetadata` classes referenced by the
+        `keypoints_metadata` column.
+    """
+
+    def __init__(
+        self,
+        record_class: Type[BaseRecord],
+        columns: Dict[str, np.ndarray],
+        class_map: Optional[ClassMap] = None,
+        keypoints_metadata: Sequence[Type[KeypointsMetadata]] = (),
+    ):
+        self.record_class = record_class
+        self.columns = columns
+        self.class_map = class_map
+        self.keypoints_metadata = list(keypoints_metadata)
+        self._decoders = [
+            _CODECS[mixin][1] for mixin in record_class.mro() if mixin in _CODECS
+        ]
+
+    @classmethod
+    def from_records(
+        cls,
+        records: Sequence[BaseRecord],
+        record_class: Optional[Type[BaseRecord]] = None,
+    ) -> "RecordCollection":
+        """Creates a collection with the data of `records`.
+
+        # Arguments
+            records: Records of the same class, as created by a `Parser`.
+            record_class: Class of the records, only needed if `records` is empty.
+
+        # Returns
+            A `RecordCollection`. Raises `UnsupportedRecordError` if the records have
+            fields that cannot be stored in arrays (e.g. custom record mixins).
+        """
+        if record_class is None:
+            if len(records) == 0:
+                raise ValueError("record_class is required for empty records")
+            record_class = type(records[0])
+
+        unsupported = [
+            o.__name__
+            for o in record_class.mro()
+            if issubclass(o, RecordMixin)
+            and not issubclass(o, BaseRecord)
+            and o not in (*_CODECS, RecordMixin)
+        ]
+        if unsupported:
+            raise UnsupportedRecordError(f"Unsupported record mixins {unsupported}")
+
+        keypoints_metadata = []
+        columns = {}
+        for mixin in record_class.mro():
+            if mixin in _CODECS:
+                encode, _, _ = _CODECS[mixin]
+                columns.update(encode(records, keypoints_metadata))
+
+        class_map = None
+        if issubclass(record_class, ClassMapRecordMixin) and len(records) > 0:
+            class_map = records[0].class_map
+
+        return cls(
+            record_class=record_class,
+            columns=columns,
+            class_map=class_map,
+            keypoints_metadata=keypoints_metadata,
+        )
+
+    def filter(
+        self,
+        keep_records: Optional[np.ndarray] = None,
+        keep_annotations: Optional[np.ndarray] = None,
+    ) -> "RecordCollection":
+        """Creates a new collection without some of the records and annotations.
+
+        # Arguments
+            keep_records: Boolean array with one value per record.
+            keep_annotations: Boolean array with one value per annotation, i.e.
+            per item of the flattened labels, bboxes, masks, areas and iscrowds.
+            Keypoints are never removed, as with `BaseRecord.remove_annotation`.
+
+        # Returns
+            A new `RecordCollection`, the current one is not modified.
+        """
+        if keep_records is None:
+            keep_records = np.ones(len(self), dtype=bool)
+
+        columns = {}
+        for mixin in self.record_class.mro():
+            if mixin in _CODECS:
+                _, _, filter_columns = _CODECS[mixin]
+                columns.update(
+                    filter_columns(self.columns, keep_records, keep_annotations)
+                )
+
+        return type(self)(
+            record_class=self.record_class,
+            columns=columns,
+            class_map=self.class_map,
+            keypoints_metadata=self.keypoints_metadata,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Total number of bytes used by the columns."""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def __len__(self):
+        return len(self.columns["imageid"])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"record index {i} out of range")
+
+        record = self.record_class()
+        for decode in self._decoders:
+            decode(record, self, i)
+        return record
+
+    def __add__(self, other):
+        if not isinstance(other, RecordCollection):
+            return list(self) + list(other)
+        if not (
+            _same_record_class(self.record_class, other.record_class)
+            and self.class_map == other.class_map
+        ):
+            raise ValueError("Only collections of the same records can be added")
+
+        keypoints_metadata = list(self.keypoints_metadata)
+        for metadata in other.keypoints_metadata:
+            if metadata not in keypoints_metadata:
+                keypoints_metadata.append(metadata)
+
+        columns = {}
+        for name, column in self.columns.items():
+            other_column = other.columns[name]
+            if name.endswith("_offsets"):
+                other_column = other_column[1:] + column[-1]
+            elif name == "keypoints_metadata":
+                ids = [keypoints_metadata.index(o) for o in other.keypoints_metadata]
+                other_column = np.array(ids, dtype=column.dtype)[other_column]
+            columns[name] = np.concatenate([column, other_column])
+
+        return type(self)(
+            record_class=self.record_class,
+            columns=columns,
+            class_map=self.class_map,
+            keypoints_metadata=keypoints_metadata,
+        )
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (SequenceABC, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return False
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} with {len(self)} records>"
+
+
+def _same_record_class(a: Type[BaseRecord], b: Type[BaseRecord]) -> bool:
+    # `Parser.record_class` creates a new (but equivalent) class on every call
+    return a is b or (a.__name__ == b.__name__ and a.__bases__ == b.__bases__)
+
+
+### Columns codecs ###
+def _offsets(lengths: Sequence[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _encode_ragged(name: str, values: List[list], dtype, shape=()) -> dict:
+    """Stores a list of lists as a flat array plus per record offsets."""
+    flat = [o for record_values in values for o in record_values]
+    return {
+        name: np.array(flat, dtype=dtype).reshape(-1, *shape),
+        f"{name}_offsets": _offsets([len(o) for o in values]),
+    }
+
+
+def _decode_ragged(columns: Dict[str, np.ndarray], name: str, i: int) -> list:
+    start, end = columns[f"{name}_offsets"][i : i + 2]
+    return columns[name][start:end].tolist()
+
+
+def _filter_ragged(
+    columns: Dict[str, np.ndarray],
+    name: str,
+    keep_records: np.ndarray,
+    keep_items: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the new `<name>_offsets` and which items of `<name>` to keep."""
+    counts = np.diff(columns[f"{name}_offsets"])
+    owners = np.repeat(np.arange(len(counts)), counts)
+    keep = keep_records[owners]
+    if keep_items is not None:
+        keep &= keep_items
+    new_counts = np.bincount(owners[keep], minlength=len(counts))[keep_records]
+    return _offsets(new_counts), keep
+
+
+def _filter_annotations(name: str):
+    def _filter(columns, keep_records, keep_annotations):
+        offsets, keep = _filter_ragged(columns, name, keep_records, keep_annotations)
+        return {name: columns[name][keep], f"{name}_offsets": offsets}
+
+    return _filter
+
+
+def _filter_columns(*names: str):
+    def _filter(columns, keep_records, keep_annotations):
+        return {name: columns[name][keep_records] for name in names}
+
+    return _filter
+
+
+def _encode_class_map(records, keypoints_metadata):
+    # shared by all records, stored in `RecordCollection.class_map`
+    return {}
+
+
+def _decode_class_map(record, collection, i):
+    record.set_class_map(collection.class_map)
+
+
+def _filter_class_map(columns, keep_records, keep_annotations):
+    return {}
+
+
+def _encode_imageid(records, keypoints_metadata):
+    return {"imageid": np.array([o.imageid for o in records], dtype=np.int64)}
+
+
+def _decode_imageid(record, collection, i):
+    record.set_imageid(int(collection.columns["imageid"][i]))
+
+
+def _encode_filepath(records, keypoints_metadata):
+    return {"filepath": np.array([str(o.filepath) for o in records], dtype=str)}
+
+
+def _decode_filepath(record, collection, i):
+    record.set_filepath(str(collection.columns["filepath"][i]))
+
+
+def _encode_size(records, keypoints_metadata):
+    return {
+        "width": np.array([o.width for o in records], dtype=np.int64),
+        "height": np.array([o.height for o in records], dtype=np.int64),
+    }
+
+
+def _decode_size(record, collection, i):
+    width, height = collection.columns["width"][i], collection.columns["height"][i]
+    record.set_image_size(width=int(width), height=int(height))
+
+
+def _encode_labels(records, keypoints_metadata):
+    return _encode_ragged("labels", [o.labels for o in records], np.int32)
+
+
+def _decode_labels(record, collection, i):
+    record.add_labels(_decode_ragged(collection.columns, "labels", i))
+
+
+def _encode_bboxes(records, keypoints_metadata):
+    xyxys = [[bbox.xyxy for bbox in o.bboxes] for o in records]
+    return _encode_ragged("bboxes", xyxys, np.float32, shape=(4,))
+
+
+def _decode_bboxes(record, collection, i):
+    xyxys = _decode_ragged(collection.columns, "bboxes", i)
+    record.add_bboxes([BBox.from_xyxy(*xyxy) for xyxy in xyxys])
+
+
+def _encode_areas(records, keypoints_metadata):
+    return _encode_ragged("areas", [o.areas for o in records], np.float32)
+
+
+def _decode_areas(record, collection, i):
+    record.add_areas(_decode_ragged(collection.columns, "areas", i))
+
+
+def _encode_iscrowds(records, keypoints_metadata):
+    return _encode_ragged("iscrowds", [o.iscrowds for o in records], np.uint8)
+
+
+def _decode_iscrowds(record, collection, i):
+    record.add_iscrowds(_decode_ragged(collection.columns, "iscrowds", i))
+
+
+def _encode_masks(records, keypoints_metadata):
+    erles = [o.masks.erles for o in records]
+    flat = [erle for record_erles in erles for erle in record_erles]
+    counts = [_to_bytes(erle["counts"]) for erle in flat]
+    sizes = np.array([erle["size"] for erle in flat], dtype=np.int64)
+    return {
+        "masks_offsets": _offsets([len(o) for o in erles]),
+        "masks_sizes": sizes.reshape(-1, 2),
+        "masks_counts_offsets": _offsets([len(o) for o in counts]),
+        "masks_counts": np.frombuffer(b"".join(counts), dtype=np.uint8),
+    }
+
+
+def _decode_masks(record, collection, i):
+    columns = collection.columns
+    start, end = columns["masks_offsets"][i : i + 2]
+    counts_offsets = columns["masks_counts_offsets"]
+    erles = []
+    for j in range(start, end):
+        counts_start, counts_end = counts_offsets[j : j + 2]
+        counts = columns["masks_counts"][counts_start:counts_end].tobytes()
+        erles.append({"size": columns["masks_sizes"][j].tolist(), "counts": counts})
+    record.masks = EncodedRLEs(erles)
+
+
+def _filter_masks(columns, keep_records, keep_annotations):
+    offsets, keep = _filter_ragged(columns, "masks", keep_records, keep_annotations)
+    counts_offsets, keep_counts = _filter_ragged(columns, "masks_counts", keep)
+    return {
+        "masks_offsets": offsets,
+        "masks_sizes": columns["masks_sizes"][keep],
+        "masks_counts_offsets": counts_offsets,
+        "masks_counts": columns["masks_counts"][keep_counts],
+    }
+
+
+def _to_bytes(counts: Union[str, bytes]) -> bytes:
+    if isinstance(counts, bytes):
+        return counts
+    if isinstance(counts, str):
+        return counts.encode()
+    raise UnsupportedRecordError("Masks need to be stored as compressed RLEs")
+
+
+def _encode_keypoints(records, keypoints_metadata):
+    keypoints = [o.keypoints for o in records]
+    flat = [kpts for record_kpts in keypoints for kpts in record_kpts]
+
+    metadata_ids = []
+    for kpts in flat:
+        if kpts.metadata not in keypoints_metadata:
+            keypoints_metadata.append(kpts.metadata)
+        metadata_ids.append(keypoints_metadata.index(kpts.metadata))
+
+    return {
+        "keypoints_offsets": _offsets([len(o) for o in keypoints]),
+        "keypoints_metadata": np.array(metadata_ids, dtype=np.int32),
+        **_encode_ragged(
+            "keypoints_values", [kpts.keypoints for kpts in flat], np.float32
+        ),
+    }
+
+
+def _decode_keypoints(record, collection, i):
+    columns = collection.columns
+    start, end = columns["keypoints_offsets"][i : i + 2]
+    keypoints = []
+    for j in range(start, end):
+        values = _decode_ragged(columns, "keypoints_values", j)
+        metadata = collection.keypoints_metadata[columns["keypoints_metadata"][j]]
+        keypoints.append(KeyPoints.from_xyv(values, metadata))
+    record.add_keypoints(keypoints)
+
+
+def _filter_keypoints(columns, keep_records, keep_annotations):
+    offsets, keep = _filter_ragged(columns, "keypoints", keep_records)
+    values_offsets, keep_values = _filter_ragged(columns, "keypoints_values", keep)
+    return {
+        "keypoints_offsets": offsets,
+        "keypoints_metadata": columns["keypoints_metadata"][keep],
+        "keypoints_values_offsets": values_offsets,
+        "keypoints_values": columns["keypoints_values"][keep_values],
+    }
+
+
+_CODECS = {
+    ClassMapRecordMixin: (_encode_class_map, _decode_class_map, _filter_class_map),
+    ImageidRecordMixin: (
+        _encode_imageid,
+        _decode_imageid,
+        _filter_columns("imageid"),
+    ),
+    FilepathRecordMixin: (
+        _encode_filepath,
+        _decode_filepath,
+        _filter_columns("filepath"),
+    ),
+    SizeRecordMixin: (_encode_size, _decode_size, _filter_columns("width", "height")),
+    LabelsRecordMixin: (
+        _encode_labels,
+        _decode_labels,
+        _filter_annotations("labels"),
+    ),
+    BBoxesRecordMixin: (
+        _encode_bboxes,
+        _decode_bboxes,
+        _filter_annotations("bboxes"),
+    ),
+    AreasRecordMixin: (_encode_areas, _decode_areas, _filter_annotations("areas")),
+    IsCrowdsRecordMixin: (
+        _encode_iscrowds,
+        _decode_iscrowds,
+        _filter_annotations("iscrowds"),
+    ),
+    MasksRecordMixin: (_encode_masks, _decode_masks, _filter_masks),
+    KeyPointsRecordMixin: (_encode_keypoints, _decode_keypoints, _filter_keypoints),
+}
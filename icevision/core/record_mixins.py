@@ -39,6 +39,9 @@ class RecordMixin:
     def _remove_annotation(self, i) -> None:
         return
 
+    def _merge(self, other: "RecordMixin") -> None:
+        return
+
     def _aggregate_objects(self) -> Dict[str, List[dict]]:
         return {}
 
@@ -88,7 +91,9 @@ class FilepathRecordMixin(RecordMixin):
         self.filepath = Path(filepath)
 
     def _load(self):
-        self.img = open_img(self.filepath)
+        # the image might already be set, e.g. when read from an `ImageCache`
+        if getattr(self, "img", None) is None:
+            self.img = open_img(self.filepath)
         # TODO, HACK: is it correct to overwrite height and width here?
         self.height, self.width, _ = self.img.shape
         super()._load()
@@ -150,6 +155,10 @@ class LabelsRecordMixin(RecordMixin):
         super()._remove_annotation(i)
         self.labels.pop(i)
 
+    def _merge(self, other: "LabelsRecordMixin"):
+        super()._merge(other)
+        self.add_labels(other.labels)
+
     def _aggregate_objects(self) -> Dict[str, List[dict]]:
         return {"labels": self.labels, **super()._aggregate_objects()}
 
@@ -187,6 +196,10 @@ class BBoxesRecordMixin(RecordMixin):
         super()._remove_annotation(i)
         self.bboxes.pop(i)
 
+    def _merge(self, other: "BBoxesRecordMixin"):
+        super()._merge(other)
+        self.add_bboxes(other.bboxes)
+
     def _aggregate_objects(self) -> Dict[str, List[dict]]:
         objects = []
         for bbox in self.bboxes:
@@ -212,13 +225,18 @@ class BBoxesRecordMixin(RecordMixin):
 
 
 class MasksRecordMixin(RecordMixin):
+    # set by `BaseRecord.load(lazy_masks=True)`
+    _lazy_masks = False
+
     def __init__(self):
         super().__init__()
         self.masks = EncodedRLEs()
 
     def _load(self):
         super()._load()
-        self.masks = MaskArray.from_masks(self.masks, self.height, self.width)
+        # lazy masks stay RLE encoded, they get decoded by the model dataloaders
+        if not (self._lazy_masks and isinstance(self.masks, EncodedRLEs)):
+            self.masks = MaskArray.from_masks(self.masks, self.height, self.width)
 
     def add_masks(self, masks: Sequence[Mask]):
         erles = [mask.to_erles(h=self.height, w=self.width) for mask in masks]
@@ -231,6 +249,10 @@ class MasksRecordMixin(RecordMixin):
         super()._remove_annotation(i)
         self.masks.pop(i)
 
+    def _merge(self, other: "MasksRecordMixin"):
+        super()._merge(other)
+        self.masks.append(other.masks)
+
     def _repr(self) -> List[str]:
         return [f"Masks: {self.masks}", *super()._repr()]
 
@@ -253,6 +275,10 @@ class AreasRecordMixin(RecordMixin):
         super()._remove_annotation(i)
         self.areas.pop(i)
 
+    def _merge(self, other: "AreasRecordMixin"):
+        super()._merge(other)
+        self.add_areas(other.areas)
+
     def _repr(self) -> List[str]:
         return [f"Areas: {self.areas}", *super()._repr()]
 
@@ -275,6 +301,10 @@ class IsCrowdsRecordMixin(RecordMixin):
         super()._remove_annotation(i)
         self.iscrowds.pop(i)
 
+    def _merge(self, other: "IsCrowdsRecordMixin"):
+        super()._merge(other)
+        self.add_iscrowds(other.iscrowds)
+
     def _aggregate_objects(self) -> Dict[str, List[dict]]:
         return {"iscrowds": self.iscrowds, **super()._aggregate_objects()}
 
@@ -293,6 +323,10 @@ class KeyPointsRecordMixin(RecordMixin):
     def add_keypoints(self, keypoints):
         self.keypoints.extend(keypoints)
 
+    def _merge(self, other: "KeyPointsRecordMixin"):
+        super()._merge(other)
+        self.add_keypoints(other.keypoints)
+
     def _aggregate_objects(self) -> Dict[str, List[dict]]:
         objects = [
             {"keypoint_x": kpt.x, "keypoint_y": kpt.y, "keypoint_visible": kpt.v}
@@ -1,3 +1,6 @@
 from icevision.data.data_splitter import *
+from icevision.data.image_cache import *
+from icevision.data.tfms_cache import *
 from icevision.data.dataset import *
+from icevision.data.batch_sampler import *
 from icevision.data.convert_records_to_coco_style import *
@@ -0,0 +1,98 @@
+__all__ = ["AspectRatioBatchSampler"]
+
+from icevision.imports import *
+from icevision.core import *
+from icevision.data.dataset import *
+from torch.utils.data import Sampler
+
+
+class AspectRatioBatchSampler(Sampler):
+    """Batch sampler that groups images with a similar aspect ratio (and size).
+
+    Images of a batch are padded to the largest height and width of the batch, so
+    mixing portrait and landscape images wastes most of the batch on padding.
+    Records are assigned to a group from `record.width` and `record.height`, which
+    are known without loading the images. Each epoch the records are shuffled and
+    a batch is yielded as soon as a group has `batch_size` records, the remaining
+    records are batched together at the end of the epoch.
+
+    Pass it as `batch_sampler` to a `DataLoader`, or use `group_by_aspect_ratio=True`
+    with the model dataloaders (e.g. `faster_rcnn.train_dl`).
+
+    # Arguments
+        records: A `Dataset`, `RecordCollection` or list of records.
+        batch_size: Number of records per batch.
+        shuffle: If True, the records are shuffled every epoch, with the torch RNG.
+        drop_last: If True, the last incomplete batch is dropped.
+        aspect_ratio_bins: Boundaries of the `width / height` groups, defaults to
+        7 boundaries evenly spaced in log scale between 1/2 and 2.
+        size_bins: Boundaries of the groups by `max(width, height)`, by default
+        records are only grouped by aspect ratio. Useful when the transforms do not
+        resize the images to a fixed size.
+
+    # Examples
+    ```python
+    batch_sampler = AspectRatioBatchSampler(train_ds, batch_size=8, shuffle=True)
+    train_dl = faster_rcnn.train_dl(train_ds, batch_sampler=batch_sampler)
+    ```
+    """
+
+    def __init__(
+        self,
+        records: Union[Dataset, RecordCollection, Sequence[BaseRecord]],
+        batch_size: int,
+        shuffle: bool = False,
+        drop_last: bool = False,
+        aspect_ratio_bins: Optional[Sequence[float]] = None,
+        size_bins: Optional[Sequence[int]] = None,
+    ):
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        if aspect_ratio_bins is None:
+            aspect_ratio_bins = 2 ** np.linspace(-1, 1, 7)
+
+        widths, heights = _image_sizes(records)
+        aspect_ratio_ids = np.digitize(widths / heights, aspect_ratio_bins)
+        size_ids = np.digitize(np.maximum(widths, heights), size_bins or [])
+        self.group_ids = aspect_ratio_ids * (len(size_bins or []) + 1) + size_ids
+
+    def __iter__(self) -> Iterator[List[int]]:
+        n = len(self.group_ids)
+        idxs = torch.randperm(n).tolist() if self.shuffle else range(n)
+
+        buckets = defaultdict(list)
+        batches = []
+        for idx in idxs:
+            bucket = buckets[self.group_ids[idx]]
+            bucket.append(idx)
+            if len(bucket) == self.batch_size:
+                batches.append(bucket)
+                buckets[self.group_ids[idx]] = []
+
+        # only the batches made of the leftovers mix groups
+        leftovers = [idx for group in sorted(buckets) for idx in buckets[group]]
+        for i in range(0, len(leftovers), self.batch_size):
+            batches.append(leftovers[i : i + self.batch_size])
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches.pop()
+
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches)).tolist()]
+        return iter(batches)
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.group_ids) // self.batch_size
+        return math.ceil(len(self.group_ids) / self.batch_size)
+
+
+def _image_sizes(records) -> Tuple[np.ndarray, np.ndarray]:
+    if isinstance(records, Dataset):
+        records = records.records
+    if isinstance(records, RecordCollection):
+        widths, heights = records.columns["width"], records.columns["height"]
+    else:
+        widths = [record.width for record in records]
+        heights = [record.height for record in records]
+    return np.asarray(widths, dtype=np.float64), np.asarray(heights, dtype=np.float64)
@@ -6,6 +6,7 @@ __all__ = [
     "coco_api_from_records",
     "coco_api_from_preds",
     "create_coco_eval",
+    "ParallelCOCOeval",
 ]
 
 from icevision.imports import *
@@ -13,6 +14,7 @@ from icevision.utils import *
 from icevision.core import *
 from pycocotools.coco import COCO
 from pycocotools.cocoeval import COCOeval
+from concurrent.futures import ProcessPoolExecutor
 
 
 def create_coco_api(coco_records) -> COCO:
@@ -41,22 +43,177 @@ def coco_api_from_records(records, show_pbar: bool = False) -> COCO:
 
 
 def create_coco_eval(
-    records, preds, metric_type: str, show_pbar: bool = False
+    records,
+    preds,
+    metric_type: str,
+    show_pbar: bool = False,
+    target_ds: Optional[COCO] = None,
+    num_workers: int = 0,
 ) -> COCOeval:
+    """`COCOeval` of `preds` against `records`.
+
+    # Arguments
+        target_ds: Already built `COCO` api of `records`, skips converting them.
+        num_workers: If greater than 0, `evaluate` is split by image ids across a
+        process pool with this many workers, see `ParallelCOCOeval`.
+    """
     assert len(records) == len(preds)
 
-    for record, pred in zip(records, preds):
-        pred["imageid"] = record["imageid"]
-        pred["height"] = record["height"]
-        pred["width"] = record["width"]
+    preds = [
         # needs 'filepath' for mask `coco.py#418`
-        pred["filepath"] = record["filepath"]
-
-    target_ds = coco_api_from_records(records, show_pbar=show_pbar)
+        {
+            **pred,
+            "imageid": record["imageid"],
+            "height": record["height"],
+            "width": record["width"],
+            "filepath": record["filepath"],
+        }
+        for record, pred in zip(records, preds)
+    ]
+
+    if target_ds is None:
+        target_ds = coco_api_from_records(records, show_pbar=show_pbar)
     pred_ds = coco_api_from_preds(preds, show_pbar=show_pbar)
+    if num_workers > 0:
+        return ParallelCOCOeval(target_ds, pred_ds, metric_type, num_workers)
     return COCOeval(target_ds, pred_ds, metric_type)
 
 
+class ParallelCOCOeval(COCOeval):
+    """`COCOeval` with `evaluate` split by image ids across a process pool.
+
+    Each worker evaluates a contiguous shard of the (sorted) image ids, the
+    per image results are merged in the order of the serial `evaluate`, so
+    `accumulate` and `summarize` give exactly the same results. To keep the
+    transfer from the workers cheap, the entries of `evalImgs` only have the
+    fields used by `accumulate` (`dtMatches` is a boolean mask).
+
+    # Arguments
+        num_workers: Number of worker processes, `0` evaluates serially.
+    """
+
+    def __init__(
+        self,
+        cocoGt: Optional[COCO] = None,
+        cocoDt: Optional[COCO] = None,
+        iouType: str = "segm",
+        num_workers: int = 0,
+    ):
+        super().__init__(cocoGt=cocoGt, cocoDt=cocoDt, iouType=iouType)
+        self.num_workers = num_workers
+
+    def evaluate(self):
+        p = self.params
+        img_ids = list(np.unique(p.imgIds))
+        if self.num_workers <= 0 or len(img_ids) < 2:
+            return super().evaluate()
+
+        p.imgIds = img_ids
+        if p.useCats:
+            p.catIds = list(np.unique(p.catIds))
+        p.maxDets = sorted(p.maxDets)
+
+        shard_size = math.ceil(len(img_ids) / self.num_workers)
+        shards = [
+            img_ids[i : i + shard_size] for i in range(0, len(img_ids), shard_size)
+        ]
+        jobs = [self._shard_job(shard) for shard in shards]
+        eval_imgs = {}
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            for packed in executor.map(_evaluate_shard, *zip(*jobs)):
+                eval_imgs.update(_unpack_eval_imgs(packed, p))
+        self.evalImgs = _ordered_eval_imgs(eval_imgs, p)
+
+        self.ious = {}
+        self._paramsEval = deepcopy(p)
+
+    def _shard_job(self, img_ids) -> Tuple[dict, dict, Any]:
+        def shard_dataset(coco):
+            return {
+                "images": [coco.imgs[i] for i in img_ids if i in coco.imgs],
+                "annotations": coco.loadAnns(coco.getAnnIds(imgIds=img_ids)),
+                "categories": coco.dataset.get("categories", []),
+            }
+
+        params = deepcopy(self.params)
+        params.imgIds = img_ids
+        return shard_dataset(self.cocoGt), shard_dataset(self.cocoDt), params
+
+
+def _evaluate_shard(gt_dataset: dict, dt_dataset: dict, params) -> dict:
+    with CaptureStdout():
+        coco_eval = COCOeval(
+            create_coco_api(gt_dataset), create_coco_api(dt_dataset), params.iouType
+        )
+        coco_eval.params = params
+        coco_eval.evaluate()
+    return _pack_eval_imgs(coco_eval.evalImgs, coco_eval.params)
+
+
+def _pack_eval_imgs(eval_imgs: List[Optional[dict]], params) -> dict:
+    """Concatenates `evaluateImg` results into a few arrays, keeping only what
+    `COCOeval.accumulate` needs. Much smaller and faster to pickle."""
+    area_ranges = [tuple(o) for o in params.areaRng]
+    eval_imgs = [e for e in eval_imgs if e is not None]
+    keys = [
+        (e["category_id"], area_ranges.index(tuple(e["aRng"])), e["image_id"])
+        for e in eval_imgs
+    ]
+    num_iou_thrs = len(params.iouThrs)
+    return {
+        "keys": keys,
+        "dt_offsets": _offsets([len(e["dtScores"]) for e in eval_imgs]),
+        "gt_offsets": _offsets([len(e["gtIgnore"]) for e in eval_imgs]),
+        "dt_scores": _concat([e["dtScores"] for e in eval_imgs], np.float64),
+        "dt_matches": _concat(
+            [e["dtMatches"] > 0 for e in eval_imgs], bool, num_iou_thrs
+        ),
+        "dt_ignore": _concat([e["dtIgnore"] for e in eval_imgs], bool, num_iou_thrs),
+        "gt_ignore": _concat([e["gtIgnore"] for e in eval_imgs], bool),
+    }
+
+
+def _unpack_eval_imgs(packed: dict, params) -> Iterator[Tuple[tuple, dict]]:
+    """Yields `(category_id, area range index, image_id), evaluateImg result`."""
+    dt_offsets, gt_offsets = packed["dt_offsets"], packed["gt_offsets"]
+    for i, (cat_id, area_idx, img_id) in enumerate(packed["keys"]):
+        dt = slice(dt_offsets[i], dt_offsets[i + 1])
+        gt = slice(gt_offsets[i], gt_offsets[i + 1])
+        yield (cat_id, area_idx, img_id), {
+            "image_id": img_id,
+            "category_id": cat_id,
+            "aRng": params.areaRng[area_idx],
+            "maxDet": params.maxDets[-1],
+            "dtScores": packed["dt_scores"][dt],
+            "dtMatches": packed["dt_matches"][:, dt],
+            "dtIgnore": packed["dt_ignore"][:, dt],
+            "gtIgnore": packed["gt_ignore"][gt],
+        }
+
+
+def _ordered_eval_imgs(eval_imgs: Dict[tuple, dict], params) -> List[Optional[dict]]:
+    """`evalImgs` in the order `COCOeval.accumulate` indexes them."""
+    cat_ids = params.catIds if params.useCats else [-1]
+    return [
+        eval_imgs.get((cat_id, area_idx, img_id))
+        for cat_id in cat_ids
+        for area_idx in range(len(params.areaRng))
+        for img_id in params.imgIds
+    ]
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    return np.cumsum([0, *lengths], dtype=np.int64)
+
+
+def _concat(arrays: List[np.ndarray], dtype, num_rows: Optional[int] = None):
+    if num_rows is None:
+        arrays = [np.asarray(o, dtype=dtype).reshape(-1) for o in arrays]
+        return np.concatenate([np.zeros(0, dtype), *arrays])
+    arrays = [np.asarray(o, dtype=dtype).reshape(num_rows, -1) for o in arrays]
+    return np.concatenate([np.zeros((num_rows, 0), dtype), *arrays], axis=1)
+
+
 def convert_record_to_coco_image(record) -> dict:
     image = {}
     image["id"] = record["imageid"]
@@ -67,79 +224,88 @@ def convert_record_to_coco_image(record) -> dict:
 
 
 def convert_record_to_coco_annotations(record):
+    """COCO annotation fields of a record, as a dict of lists (one item per
+    annotation). The record is not modified."""
+    return _convert_records_to_coco_annotations([record])
+
+
+def _convert_records_to_coco_annotations(records) -> Dict[str, list]:
+    """Annotation fields of all records as lists. Boxes and areas are converted
+    with numpy over all the annotations at once."""
+    image_ids, category_ids, areas, iscrowds = [], [], [], []
+    # consecutive `BBox` are collected in a list, arrays of boxes are kept as is
+    xyxys, xyxy_chunks = [], []
+    scores, segmentations = [], []
+    has_masks, has_scores = [], []
+    for record in records:
+        labels = _as_list(record["labels"])
+        n = len(labels)
+        if n:
+            image_ids.extend([record["imageid"]] * n)
+            category_ids.extend(labels)
+
+        bboxes = record["bboxes"]
+        if isinstance(bboxes, BBoxArray):
+            bboxes = bboxes.xyxy
+        if isinstance(bboxes, np.ndarray):
+            xyxy_chunks.extend([np.array(xyxys).reshape(-1, 4), bboxes.reshape(-1, 4)])
+            xyxys = []
+        else:
+            xyxys.extend(bbox.xyxy for bbox in bboxes)
+        # a nan area is computed from the bbox
+        areas.extend(_as_list(record["areas"]) if "areas" in record else [np.nan] * n)
+        # TODO: is auto assigning a value for iscrowds dangerous (may hurt the metric value?)
+        iscrowds.extend(
+            _as_list(record["iscrowds"]) if "iscrowds" in record else [0] * n
+        )
+
+        has_scores.append("scores" in record)
+        if "scores" in record:
+            scores.extend(_as_list(record["scores"]))
+        has_masks.append("masks" in record)
+        if "masks" in record:
+            segmentations.extend(_masks_to_erles(record))
+
+    if not allequal(has_masks) or not allequal(has_scores):
+        raise RuntimeError("Mismatch lenght of elements")
+
+    xyxy_chunks.append(np.array(xyxys).reshape(-1, 4))
+    xywh = np.concatenate(xyxy_chunks).astype(np.float64)
+    xywh[:, 2:] -= xywh[:, :2]
+    areas = np.array(areas, dtype=np.float64)
+    areas = np.where(np.isnan(areas), xywh[:, 2] * xywh[:, 3], areas)
+
     annotations_dict = {
-        "image_id": [],
-        "category_id": [],
-        "bbox": [],
-        "area": [],
-        "iscrowd": [],
+        "image_id": image_ids,
+        "category_id": category_ids,
+        "bbox": xywh.tolist(),
+        "area": areas.tolist(),
+        "iscrowd": iscrowds,
     }
-    # build annotations field
-    for label in record["labels"]:
-        annotations_dict["image_id"].append(record["imageid"])
-        annotations_dict["category_id"].append(label)
-
-    for bbox in record["bboxes"]:
-        annotations_dict["bbox"].append(list(bbox.xywh))
-
-    if "areas" in record:
-        for area in record["areas"]:
-            annotations_dict["area"].append(area)
-    else:
-        for bbox in record["bboxes"]:
-            annotations_dict["area"].append(bbox.area)
+    if any(has_masks):
+        annotations_dict["segmentation"] = segmentations
+    if any(has_scores):
+        annotations_dict["score"] = scores
 
-    # HACK: Because of prepare_record, mask should always be `MaskArray`,
-    # maybe the for loop is not required?
-    if "masks" in record:
-        masks = record["masks"]
+    if not allequal([len(o) for o in annotations_dict.values()]):
+        raise RuntimeError("Mismatch lenght of elements")
+    return annotations_dict
 
-        if isinstance(masks, MaskArray):
-            masks = masks.to_erles(record["height"], record["width"])
 
-        if isinstance(masks, EncodedRLEs):
-            annotations_dict["segmentation"] = masks.erles
+def _as_list(o) -> list:
+    return o.tolist() if isinstance(o, np.ndarray) else o
 
-        else:
-            raise RuntimeError(
-                "masks are expected to be EncodedRLEs only, "
-                "if you get this error please open an issue on github."
-            )
-            # annotations_dict["segmentation"] = []
-            # for mask in record["masks"]:
-            #     if isinstance(mask, MaskArray):
-            #         # HACK: see previous hack
-            #         assert len(mask.shape) == 2
-            #         mask2 = MaskArray(mask.data[None])
-            #         rles = mask2.to_coco_rle(record["height"], record["width"])
-            #         annotations_dict["segmentation"].extend(rles)
-            #     elif isinstance(mask, Polygon):
-            #         annotations_dict["segmentation"].append(mask.points)
-            #     elif isinstance(mask, RLE):
-            #         coco_rle = {
-            #             "counts": mask.to_coco(),
-            #             "size": [record["height"], record["width"]],
-            #         }
-            #         annotations_dict["segmentation"].append(coco_rle)
-            #     elif isinstance(mask, MaskFile):
-            #         rles = mask.to_coco_rle(record["height"], record["width"])
-            #         annotations_dict["segmentation"].extend(rles)
-            #     elif isinstance(mask, EncodedRLEs):
-            #         annotations_dict["segmentation"].append(mask.erles)
-            #     else:
-            #         msg = f"Mask type {type(mask)} unsupported"
-            #         raise ValueError(msg)
-
-    # TODO: is auto assigning a value for iscrowds dangerous (may hurt the metric value?)
-    if "iscrowds" not in record:
-        record["iscrowds"] = [0] * len(record["labels"])
-    for iscrowd in record["iscrowds"]:
-        annotations_dict["iscrowd"].append(iscrowd)
-
-    if "scores" in record:
-        annotations_dict["score"] = record["scores"]
 
-    return annotations_dict
+def _masks_to_erles(record) -> List[dict]:
+    masks = record["masks"]
+    if isinstance(masks, MaskArray):
+        masks = masks.to_erles(record["height"], record["width"])
+    if not isinstance(masks, EncodedRLEs):
+        raise RuntimeError(
+            "masks are expected to be EncodedRLEs only, "
+            "if you get this error please open an issue on github."
+        )
+    return masks.erles
 
 
 def convert_preds_to_coco_style(preds, show_pbar: bool = False):
@@ -157,43 +323,46 @@ def convert_records_to_coco_style(
 ):
     """Converts records from library format to coco format.
     Inspired from: https://github.com/pytorch/vision/blob/master/references/detection/coco_utils.py#L146
-    """
-    images_ = []
-    annotations_dict = defaultdict(list)
 
-    for record in pbar(records, show=show_pbar):
-        if images:
-            image_ = convert_record_to_coco_image(record)
-            images_.append(image_)
-
-        if annotations:
-            annotations_ = convert_record_to_coco_annotations(record)
-            for k, v in annotations_.items():
-                annotations_dict[k].extend(v)
+    The records are not modified. Predictions can store `bboxes` as a `BBoxArray`
+    or a `(N, 4)` array of xyxy boxes instead of a list of `BBox`.
+    """
+    records = list(pbar(records, show=show_pbar))
+    res = {}
+    if images:
+        images_ = [convert_record_to_coco_image(record) for record in records]
+        if images_:
+            res["images"] = images_
 
+    annotations_dict = _convert_records_to_coco_annotations(records)
     if annotations:
-        annotations_dict = dict(annotations_dict)
-        if not allequal([len(o) for o in annotations_dict.values()]):
-            raise RuntimeError("Mismatch lenght of elements")
-
         # convert dict of lists to list of dicts
-        annotations_ = []
-        for i in range(len(annotations_dict["image_id"])):
-            annotation = {k: v[i] for k, v in annotations_dict.items()}
-            # annotations should be initialized starting at 1 (torchvision issue #1530)
-            annotation["id"] = i + 1
-            annotations_.append(annotation)
+        # annotations should be initialized starting at 1 (torchvision issue #1530)
+        annotations_ = [
+            {
+                "image_id": image_id,
+                "category_id": category_id,
+                "bbox": bbox,
+                "area": area,
+                "iscrowd": iscrowd,
+                "id": i,
+            }
+            for i, image_id, category_id, bbox, area, iscrowd in zip(
+                itertools.count(1),
+                annotations_dict["image_id"],
+                annotations_dict["category_id"],
+                annotations_dict["bbox"],
+                annotations_dict["area"],
+                annotations_dict["iscrowd"],
+            )
+        ]
+        for key in ["segmentation", "score"]:
+            for annotation, value in zip(annotations_, annotations_dict.get(key, [])):
+                annotation[key] = value
+        res["annotations"] = annotations_
 
     if categories:
         categories_set = set(annotations_dict["category_id"])
-        categories_ = [{"id": i} for i in categories_set]
-
-    res = {}
-    if images_:
-        res["images"] = images_
-    if annotations:
-        res["annotations"] = annotations_
-    if categories:
-        res["categories"] = categories_
+        res["categories"] = [{"id": i} for i in categories_set]
 
     return res
@@ -3,6 +3,8 @@ __all__ = ["Dataset"]
 from icevision.imports import *
 from icevision.core import *
 from icevision.tfms import *
+from icevision.data.image_cache import *
+import uuid
 
 
 class Dataset:
@@ -16,23 +18,41 @@ class Dataset:
     # Arguments
         records: A list of records.
         tfm: Transforms to be applied to each item.
+        img_cache: Optional `ImageCache`, decoded images are read from it instead of
+        being decoded again every time.
+        lazy_masks: If True, masks stay RLE encoded through the transforms and are
+        only decoded by the model dataloaders, at the final resolution.
     """
 
     def __init__(
         self,
         records: List[dict],
         tfm: Transform = None,
+        img_cache: Optional[ImageCache] = None,
+        lazy_masks: bool = False,
     ):
         self.records = records
         self.tfm = tfm
+        self.img_cache = img_cache
+        self.lazy_masks = lazy_masks
+        # identifies the images of this dataset that have no filepath, together
+        # with their imageid, e.g. for the keys of a `TfmsCache`
+        self._source = uuid.uuid4().hex
 
     def __len__(self):
         return len(self.records)
 
     def __getitem__(self, i):
-        data = self.records[i].load().as_dict()
+        record = self.records[i]
+        if self.img_cache is not None and isinstance(record, FilepathRecordMixin):
+            record = self.img_cache.load(record, lazy_masks=self.lazy_masks)
+        else:
+            record = record.load(lazy_masks=self.lazy_masks)
+
+        data = record.as_dict()
         if self.tfm is not None:
-            data = self.tfm(data)
+            data = self.tfm({**data, "source": self._source})
+            data.pop("source")
         return data
 
     def __repr__(self):
@@ -0,0 +1,365 @@
+__all__ = ["ImageCache"]
+
+from icevision.imports import *
+from icevision.utils import *
+from icevision.core import *
+from multiprocessing import resource_tracker
+from multiprocessing.managers import BaseManager
+from multiprocessing.shared_memory import SharedMemory
+import hashlib, threading, weakref
+
+
+class _SharedCache:
+    """RAM tier in shared memory and optional disk tier of `ImageCache` and
+    `TfmsCache`, the subclasses define what is stored in them.
+
+    # Arguments
+        max_bytes: Byte budget of the RAM tier, 0 disables it.
+        cache_dir: Directory of the disk tier, `None` disables it.
+    """
+
+    def __init__(self, max_bytes: int, cache_dir: Optional[Union[str, Path]]):
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+
+        self._manager, self._index = None, None
+        if max_bytes > 0:
+            self._manager = _CacheManager()
+            self._manager.start()
+            self._index = self._manager.SharedLRU(max_bytes)
+            # the cache outlives the workers, free the shared memory only when
+            # the process that created it is done with it
+            self._finalizer = weakref.finalize(
+                self, _shutdown, self._manager, self._index
+            )
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def __getstate__(self):
+        # the manager can only be used by the process that created it
+        return {**self.__dict__, "_manager": None, "_finalizer": None}
+
+    def clear(self):
+        """Removes all the entries of the RAM tier."""
+        if self._index is not None:
+            self._index.clear()
+
+    def info(self) -> Dict[str, int]:
+        """Number of entries, bytes used, hits and misses of the RAM tier."""
+        return self._index.info() if self._index is not None else {}
+
+    def _write_disk_atomic(self, disk_filepath: Path, write: Callable[[Any], None]):
+        """Writes `disk_filepath` with `write(file)`, atomically since other
+        workers might be writing the same entry."""
+        tmp_filepath = disk_filepath.with_name(f"{disk_filepath.stem}.{os.getpid()}")
+        with open(tmp_filepath, "wb") as f:
+            write(f)
+        os.replace(tmp_filepath, disk_filepath)
+
+
+class ImageCache(_SharedCache):
+    """Cache of decoded images for `Dataset`, shared by all `DataLoader` workers.
+
+    Decoded images are kept in shared memory (RAM tier), the least recently used
+    images are evicted once `max_bytes` is exceeded. The index of the RAM tier
+    lives in a manager process, which also owns the shared memory, so images
+    decoded by one worker are reused by all the others (and across epochs, after
+    the workers exit) instead of each worker keeping a copy.
+
+    Optionally, decoded images are also stored as `.npy` files in `cache_dir`
+    (disk tier), which are memory-mapped when read and persist across runs.
+
+    # Arguments
+        max_bytes: Byte budget of the RAM tier, 0 disables it.
+        cache_dir: Directory of the disk tier, `None` disables it.
+        max_size: If set, images are downscaled (keeping the aspect ratio) so that
+        their longest side is at most `max_size` before being cached. The
+        annotations of the loaded records are rescaled accordingly. Useful when
+        the transforms resize the images to a smaller size anyway.
+
+    # Examples
+    ```python
+    img_cache = ImageCache(max_bytes=4 * 2 ** 30, cache_dir="img_cache")
+    train_ds = Dataset(train_records, train_tfms, img_cache=img_cache)
+    ```
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 2 ** 30,
+        cache_dir: Optional[Union[str, Path]] = None,
+        max_size: Optional[int] = None,
+    ):
+        super().__init__(max_bytes=max_bytes, cache_dir=cache_dir)
+        self.max_size = max_size
+
+    def get(self, filepath: Union[str, Path]) -> np.ndarray:
+        """Returns the decoded (and downscaled if `max_size`) image."""
+        key = str(filepath)
+
+        if self._index is not None:
+            entry = self._index.get(key)
+            if entry is not None:
+                arrays = _read_shared(*entry)
+                if arrays is not None:
+                    return arrays[0]
+
+        img = self._read_disk(filepath)
+        if img is None:
+            img = self._open_img(filepath)
+            self._write_disk(filepath, img)
+
+        if self._index is not None:
+            self._write_shared(key, img)
+        return img
+
+    def load(self, record: BaseRecord, lazy_masks: bool = False) -> BaseRecord:
+        """Same as `record.load()` but the image is read from the cache."""
+        width, height = record.width, record.height
+
+        record = record.copy()
+        record.img = self.get(record.filepath)
+        record = record.load(lazy_masks=lazy_masks)
+
+        if (record.width, record.height) != (width, height):
+            _rescale_annotations(record, record.width / width, record.height / height)
+        return record
+
+    def _open_img(self, filepath: Union[str, Path]) -> np.ndarray:
+        img = open_img(filepath)
+        height, width = img.shape[:2]
+        if self.max_size is not None and max(height, width) > self.max_size:
+            scale = self.max_size / max(height, width)
+            size = (round(width * scale), round(height * scale))
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        return img
+
+    def _disk_filepath(self, filepath: Union[str, Path]) -> Path:
+        # invalidates the cached image when the original file changes
+        stat = Path(filepath).stat()
+        key = f"{Path(filepath).absolute()}:{stat.st_size}:{stat.st_mtime_ns}"
+        key = f"{key}:{self.max_size}"
+        return self.cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.npy"
+
+    def _read_disk(self, filepath: Union[str, Path]) -> Optional[np.ndarray]:
+        if self.cache_dir is None:
+            return None
+        try:
+            img = np.load(self._disk_filepath(filepath), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        # copy, the image is modified in place by some transforms
+        return np.array(img)
+
+    def _write_disk(self, filepath: Union[str, Path], img: np.ndarray):
+        if self.cache_dir is None:
+            return
+        self._write_disk_atomic(
+            self._disk_filepath(filepath),
+            lambda f: np.save(f, img, allow_pickle=False),
+        )
+
+    def _write_shared(self, key: str, img: np.ndarray):
+        if img.nbytes > self.max_bytes:
+            return
+
+        name, layout = _write_shared(self._index, [img])
+        self._index.put(key, (name, layout), img.nbytes)
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__} max_bytes={self.max_bytes}, "
+            f"cache_dir={self.cache_dir}, max_size={self.max_size}>"
+        )
+
+
+class _SharedLRU:
+    """LRU index of the images in shared memory, lives in the manager process.
+
+    The shared memory segments are created and unlinked by the manager process,
+    the workers only attach to them. Segments created by a worker would be
+    unlinked by its resource tracker when the worker exits, at the end of each
+    epoch.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits, self.misses = 0, 0
+        self._entries = OrderedDict()
+        self._segments: Dict[str, SharedMemory] = {}
+        self._lock = threading.Lock()
+
+    def create(self, nbytes: int) -> str:
+        """Creates a segment of `nbytes`, returns its name."""
+        shm = SharedMemory(create=True, size=max(nbytes, 1))
+        with self._lock:
+            self._segments[shm.name] = shm
+        return shm.name
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key: str, entry: tuple, nbytes: int):
+        """Adds `entry`, whose first item is the name of a segment created by
+        `create`, and frees the entries evicted to stay within `max_bytes`."""
+        with self._lock:
+            # replaces the entry of another worker that cached the same key in
+            # the meantime, or a stale one
+            self._remove(key)
+            self._entries[key] = (entry, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            # also frees the segments of the workers that failed before `put`
+            for name in list(self._segments):
+                self._unlink(name)
+
+    def _remove(self, key: str):
+        if key not in self._entries:
+            return
+        entry, nbytes = self._entries.pop(key)
+        self.nbytes -= nbytes
+        self._unlink(entry[0])
+
+    def _unlink(self, name: str):
+        shm = self._segments.pop(name, None)
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "images": len(self._entries),
+                "nbytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class _CacheManager(BaseManager):
+    pass
+
+
+_CacheManager.register("SharedLRU", _SharedLRU)
+
+
+_attach_lock = threading.Lock()
+
+
+def _attach_shared(name: str) -> SharedMemory:
+    """Attaches to a segment of the manager process without registering it to
+    the resource tracker of this process, which would unlink it on exit."""
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    # before python 3.13, attaching always registers the segment (bpo-38119)
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+# offsets of the arrays in a segment are aligned for any dtype
+_SEGMENT_ALIGNMENT = 64
+
+
+def _write_shared(index, arrays: Sequence[np.ndarray]) -> Tuple[str, list]:
+    """Copies `arrays` to a new segment of `index`.
+
+    # Returns
+        The segment name and its layout, the `(offset, shape, dtype)` of each array.
+    """
+    layout, nbytes = [], 0
+    for array in arrays:
+        offset = -(-nbytes // _SEGMENT_ALIGNMENT) * _SEGMENT_ALIGNMENT
+        layout.append((offset, array.shape, array.dtype.str))
+        nbytes = offset + array.nbytes
+
+    name = index.create(nbytes)
+    shm = _attach_shared(name)
+    try:
+        for array, (offset, shape, dtype) in zip(arrays, layout):
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = array
+    finally:
+        shm.close()
+    return name, layout
+
+
+def _read_shared(name: str, layout: list) -> Optional[List[np.ndarray]]:
+    """Copies the arrays written by `_write_shared`, `None` if evicted."""
+    try:
+        shm = _attach_shared(name)
+    except FileNotFoundError:
+        # evicted by another worker
+        return None
+    try:
+        return [
+            np.array(np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset))
+            for offset, shape, dtype in layout
+        ]
+    finally:
+        shm.close()
+
+
+def _shutdown(manager: BaseManager, index):
+    try:
+        index.clear()
+    finally:
+        manager.shutdown()
+
+
+def _rescale_annotations(record: BaseRecord, scale_x: float, scale_y: float):
+    """Rescales the annotations of a loaded record to a downscaled image."""
+    if isinstance(record, BBoxesRecordMixin):
+        record.bboxes = [
+            BBox.from_xyxy(
+                bbox.xmin * scale_x,
+                bbox.ymin * scale_y,
+                bbox.xmax * scale_x,
+                bbox.ymax * scale_y,
+            )
+            for bbox in record.bboxes
+        ]
+
+    if isinstance(record, AreasRecordMixin):
+        record.areas = [area * scale_x * scale_y for area in record.areas]
+
+    if isinstance(record, KeyPointsRecordMixin):
+        keypoints = []
+        for kpts in record.keypoints:
+            values = kpts.keypoints.astype(np.float64)
+            values[0::3] *= scale_x
+            values[1::3] *= scale_y
+            keypoints.append(KeyPoints(values, kpts.metadata))
+        record.keypoints = keypoints
+
+    if isinstance(record, MasksRecordMixin):
+        lazy = isinstance(record.masks, EncodedRLEs)
+        masks = record.masks.to_mask(
+            h=round(record.height / scale_y), w=round(record.width / scale_x)
+        )
+        size = (record.width, record.height)
+        data = [
+            cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST)
+            for mask in masks.data
+        ]
+        data = np.stack(data) if data else np.zeros((0, *size[::-1]), np.uint8)
+        record.masks = MaskArray(data)
+        if lazy:
+            record.masks = record.masks.to_erles(h=record.height, w=record.width)
@@ -0,0 +1,122 @@
+__all__ = ["TfmsCache"]
+
+from icevision.imports import *
+from icevision.utils import *
+from icevision.core import *
+from icevision.data.image_cache import _SharedCache, _read_shared, _write_shared
+import pickle
+
+
+class TfmsCache(_SharedCache):
+    """Cache of the outputs of the deterministic transforms of a `tfms.A.Adapter`.
+
+    The output of the deterministic prefix of the transforms (e.g. the presize of
+    `aug_tfms`), the image and the transformed annotations, is computed once per
+    record and reused on the next epochs, only the random transforms are applied
+    again. Images and dense masks are kept in shared memory (RAM tier), shared by
+    all the `DataLoader` workers, the least recently used outputs are evicted once
+    `max_bytes` is exceeded. Optionally, outputs are also pickled to `cache_dir`
+    (disk tier), which persists across runs.
+
+    Entries are keyed by the source image (filepath, size and modification time,
+    or imageid and `Dataset` for images without a filepath), the annotations and
+    the cached transforms, so changing any of them creates new entries instead of
+    reusing stale ones. Images without a filepath are only cached for the lifetime
+    of their `Dataset`.
+
+    # Arguments
+        max_bytes: Byte budget of the RAM tier, 0 disables it.
+        cache_dir: Directory of the disk tier, `None` disables it.
+
+    # Examples
+    ```python
+    tfms_cache = TfmsCache(max_bytes=4 * 2 ** 30)
+    train_tfms = tfms.A.Adapter(tfms.A.aug_tfms(size=384, presize=512), cache=tfms_cache)
+    ```
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 2 ** 30,
+        cache_dir: Optional[Union[str, Path]] = None,
+    ):
+        super().__init__(max_bytes=max_bytes, cache_dir=cache_dir)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the cached output for `key`, `None` if not cached."""
+        if self._index is not None:
+            entry = self._index.get(key)
+            if entry is not None:
+                out = _read_entry(*entry)
+                if out is not None:
+                    return out
+
+        out = self._read_disk(key)
+        if out is not None and self._index is not None:
+            self._write_shared(key, out)
+        return out
+
+    def put(self, key: str, out: dict):
+        """Caches `out`, the output of the transforms, a dict with an "img" key."""
+        self._write_disk(key, out)
+        if self._index is not None:
+            self._write_shared(key, out)
+
+    def _disk_filepath(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._disk_filepath(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _write_disk(self, key: str, out: dict):
+        if self.cache_dir is None:
+            return
+        self._write_disk_atomic(
+            self._disk_filepath(key),
+            lambda f: pickle.dump(out, f, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+
+    def _write_shared(self, key: str, out: dict):
+        # the image and dense masks go to shared memory, only the (small) rest of
+        # the annotations is stored pickled in the index
+        arrays = {"img": out["img"]}
+        annotations = {}
+        for k, v in out.items():
+            if isinstance(v, MaskArray):
+                arrays[k] = v.data
+            elif k != "img":
+                annotations[k] = v
+        annotations = pickle.dumps(annotations, protocol=pickle.HIGHEST_PROTOCOL)
+
+        nbytes = sum(o.nbytes for o in arrays.values()) + len(annotations)
+        if nbytes > self.max_bytes:
+            return
+
+        name, layout = _write_shared(self._index, list(arrays.values()))
+        entry = (name, layout, list(arrays), annotations)
+        self._index.put(key, entry, nbytes)
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__} max_bytes={self.max_bytes}, "
+            f"cache_dir={self.cache_dir}>"
+        )
+
+
+def _read_entry(
+    name: str, layout: list, array_names: List[str], annotations: bytes
+) -> Optional[dict]:
+    arrays = _read_shared(name, layout)
+    if arrays is None:
+        # evicted by another worker
+        return None
+    out = pickle.loads(annotations)
+    for array_name, array in zip(array_names, arrays):
+        out[array_name] = array if array_name == "img" else MaskArray(array)
+    return out
@@ -2,10 +2,15 @@ __all__ = ["convert_dataloader_to_fastai"]
 
 from icevision.imports import *
 from icevision.engines.fastai.imports import *
-from torch.utils.data import SequentialSampler, RandomSampler
+from torch.utils.data import SequentialSampler, RandomSampler, BatchSampler
 
 
 def convert_dataloader_to_fastai(dataloader: DataLoader):
+    if dataloader.batch_sampler is not None and not isinstance(
+        dataloader.batch_sampler, BatchSampler
+    ):
+        return _convert_batch_sampler_dataloader(dataloader)
+
     def raise_error_convert(data):
         raise NotImplementedError
 
@@ -32,3 +37,28 @@ def convert_dataloader_to_fastai(dataloader: DataLoader):
         shuffle=shuffle,
         pin_memory=dataloader.pin_memory,
     )
+
+
+def _convert_batch_sampler_dataloader(dataloader: DataLoader):
+    """Fastai version of a `DataLoader` with a custom `batch_sampler` (e.g.
+    `AspectRatioBatchSampler`), each index yielded by fastai is a whole batch."""
+    batch_sampler = dataloader.batch_sampler
+
+    class FastaiBatchSamplerDataLoader(fastai.DataLoader):
+        def get_idxs(self):
+            return list(batch_sampler)
+
+        def create_item(self, s):
+            return [self.dataset[i] for i in s]
+
+        def create_batch(self, b):
+            return dataloader.collate_fn(b)
+
+    # `bs=None` tells fastai that the items are already batches
+    return FastaiBatchSamplerDataLoader(
+        dataset=dataloader.dataset,
+        bs=None,
+        n=len(batch_sampler),
+        num_workers=dataloader.num_workers,
+        pin_memory=dataloader.pin_memory,
+    )
@@ -4,6 +4,7 @@ from icevision.imports import *
 from icevision.utils import *
 from icevision.data import *
 from icevision.metrics.metric import *
+from icevision.metrics.coco_metric.streaming_coco_eval import *
 
 
 class COCOMetricType(Enum):
@@ -17,12 +18,19 @@ class COCOMetricType(Enum):
 class COCOMetric(Metric):
     """Wrapper around [cocoapi evaluator](https://github.com/cocodataset/cocoapi)
 
-    Calculates average precision.
+    Calculates average precision. Predictions are matched with the records batch
+    by batch in `accumulate`, so records and predictions are not kept in memory
+    until the end of the epoch.
 
     # Arguments
         metric_type: Dependent on the task you're solving.
         print_summary: If `True`, prints a table with statistics.
-        show_pbar: If `True` shows pbar when preparing the data for evaluation.
+        show_pbar: If `True` shows pbar when preparing the data of each batch.
+        cache_targets: If `True`, the records are converted to COCO style only
+        once and reused on the next epochs (keyed by imageid, image size and
+        annotations).
+        num_workers: If greater than 0, batches are evaluated in the background by a
+        pool with this many processes, overlapping with the validation loop.
     """
 
     def __init__(
@@ -30,33 +38,29 @@ class COCOMetric(Metric):
         metric_type: COCOMetricType = COCOMetricType.bbox,
         print_summary: bool = False,
         show_pbar: bool = False,
+        cache_targets: bool = True,
+        num_workers: int = 0,
     ):
         self.metric_type = metric_type
         self.print_summary = print_summary
         self.show_pbar = show_pbar
-        self._records, self._preds = [], []
+        self.cache_targets = cache_targets
+        self.num_workers = num_workers
+        self._coco_eval = StreamingCOCOEval(
+            metric_type=metric_type.value,
+            show_pbar=show_pbar,
+            cache_targets=cache_targets,
+            num_workers=num_workers,
+        )
 
     def _reset(self):
-        self._records.clear()
-        self._preds.clear()
+        self._coco_eval.reset()
 
     def accumulate(self, records, preds):
-        # to not store whole images and avoid excess memory use
-        for record in records:
-            record.pop("img", None)
-        self._records.extend(records)
-        self._preds.extend(preds)
+        self._coco_eval.update(records=records, preds=preds)
 
     def finalize(self) -> Dict[str, float]:
-        with CaptureStdout():
-            coco_eval = create_coco_eval(
-                records=self._records,
-                preds=self._preds,
-                metric_type=self.metric_type.value,
-                show_pbar=self.show_pbar,
-            )
-            coco_eval.evaluate()
-            coco_eval.accumulate()
+        coco_eval = self._coco_eval.compute()
 
         with CaptureStdout(propagate_stdout=self.print_summary):
             coco_eval.summarize()
@@ -0,0 +1,198 @@
+__all__ = ["StreamingCOCOEval"]
+
+from icevision.imports import *
+from icevision.utils import *
+from icevision.core import *
+from icevision.data import *
+from pycocotools.coco import COCO
+from icevision.data.convert_records_to_coco_style import (
+    _as_list,
+    _evaluate_shard,
+    _pack_eval_imgs,
+    _unpack_eval_imgs,
+    _ordered_eval_imgs,
+)
+from pycocotools.cocoeval import COCOeval
+from concurrent.futures import Future, ProcessPoolExecutor
+import hashlib
+
+
+class StreamingCOCOEval:
+    """Incremental version of pycocotools `COCOeval`.
+
+    The per image matching of `COCOeval.evaluate` (IoUs, TPs/FPs for every IoU
+    threshold and area range) is done batch by batch in `update`, only the
+    compact per detection results are kept. `compute` then runs
+    `COCOeval.accumulate` over them, which gives the same results as evaluating
+    all records at once.
+
+    The records converted to COCO style are cached by imageid, so on later epochs
+    only the predictions are converted. A record whose size or annotations changed
+    (e.g. other valid transforms) is converted again and replaces the cached one.
+    `reset` keeps this cache, call `clear_cache` to free it.
+
+    # Arguments
+        metric_type: The pycocotools `iouType`, one of "bbox", "segm" or "keypoints".
+        show_pbar: If `True` shows pbar when converting the records of each batch.
+        cache_targets: If `False`, the records are converted on every `update`.
+        num_workers: If greater than 0, batches are evaluated in the background by a
+        pool with this many processes, `compute` waits for them. The pool is
+        started on the first `update` and shut down by `compute` and `reset`.
+    """
+
+    def __init__(
+        self,
+        metric_type: str = "bbox",
+        show_pbar: bool = False,
+        cache_targets: bool = True,
+        num_workers: int = 0,
+    ):
+        self.metric_type = metric_type
+        self.show_pbar = show_pbar
+        self.cache_targets = cache_targets
+        self.num_workers = num_workers
+        self._targets = {}
+        self._executor = None
+        self.reset()
+
+    def reset(self):
+        self.close()
+        self._img_ids, self._cat_ids = set(), set()
+        self._batches = []
+
+    def close(self):
+        """Shuts the pool of workers down, the batches still being evaluated are
+        cancelled."""
+        if self._executor is not None:
+            for batch in self._batches:
+                if isinstance(batch, Future):
+                    batch.cancel()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def clear_cache(self):
+        self._targets.clear()
+
+    def update(self, records, preds):
+        """Matches the predictions of a batch with its records."""
+        with CaptureStdout():
+            coco_eval = create_coco_eval(
+                records=records,
+                preds=preds,
+                metric_type=self.metric_type,
+                show_pbar=self.show_pbar,
+                target_ds=self._target_ds(records) if self.cache_targets else None,
+            )
+        gt_cat_ids = coco_eval.cocoGt.getCatIds()
+        dt_cat_ids = [label for pred in preds for label in pred["labels"]]
+        # detections of a category without ground truth in this batch are false
+        # positives if the category has ground truth in other batches
+        coco_eval.params.catIds = sorted(set(gt_cat_ids) | set(dt_cat_ids))
+        self._img_ids.update(coco_eval.params.imgIds)
+        self._cat_ids.update(gt_cat_ids)
+
+        if self.num_workers > 0:
+            # evaluated in the background, `compute` waits for the results
+            self._batches.append(
+                self._get_executor().submit(
+                    _evaluate_shard,
+                    coco_eval.cocoGt.dataset,
+                    coco_eval.cocoDt.dataset,
+                    coco_eval.params,
+                )
+            )
+        else:
+            with CaptureStdout():
+                coco_eval.evaluate()
+            self._batches.append(_pack_eval_imgs(coco_eval.evalImgs, coco_eval.params))
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.num_workers)
+        return self._executor
+
+    def __getstate__(self):
+        # the pool can only be used by the process that created it
+        return {**self.__dict__, "_executor": None, "_batches": []}
+
+    def _target_ds(self, records) -> COCO:
+        """`COCO` api of the records of a batch, from the cache when possible."""
+        # one entry per image, replaced when its size or annotations change, so the
+        # cache does not grow with e.g. random valid transforms
+        new_keys = {}
+        for record in records:
+            key = _target_key(record)
+            cached = self._targets.get(record["imageid"])
+            if cached is None or cached[0] != key:
+                new_keys[record["imageid"]] = key
+
+        if new_keys:
+            new_records = [o for o in records if o["imageid"] in new_keys]
+            coco_records = convert_records_to_coco_style(
+                new_records, categories=False, show_pbar=self.show_pbar
+            )
+            for image in coco_records["images"]:
+                self._targets[image["id"]] = (new_keys[image["id"]], image, [])
+            for annotation in coco_records["annotations"]:
+                annotation.pop("id")
+                self._targets[annotation["image_id"]][2].append(annotation)
+
+        images, annotations = [], []
+        for imageid in dict.fromkeys(o["imageid"] for o in records):
+            _, image, image_annotations = self._targets[imageid]
+            images.append(image)
+            annotations.extend(image_annotations)
+
+        return create_coco_api(
+            {
+                "images": images,
+                # annotations should be initialized starting at 1
+                "annotations": [
+                    {**o, "id": i} for i, o in enumerate(annotations, start=1)
+                ],
+                "categories": [
+                    {"id": i} for i in set(o["category_id"] for o in annotations)
+                ],
+            }
+        )
+
+    def compute(self) -> COCOeval:
+        """`COCOeval` with `accumulate` already called, ready for `summarize`."""
+        coco_eval = COCOeval(iouType=self.metric_type)
+        params = coco_eval.params
+        params.imgIds = sorted(self._img_ids)
+        # same as pycocotools, only categories with ground truth are evaluated
+        params.catIds = sorted(self._cat_ids)
+        params.maxDets = sorted(params.maxDets)
+
+        eval_imgs = {}
+        for batch in self._batches:
+            if isinstance(batch, Future):
+                batch = batch.result()
+            eval_imgs.update(_unpack_eval_imgs(batch, params))
+        # the pool is started again on the next `update`, e.g. on the next epoch
+        self.close()
+        coco_eval.evalImgs = _ordered_eval_imgs(eval_imgs, params)
+        coco_eval._paramsEval = deepcopy(params)
+
+        with CaptureStdout():
+            coco_eval.accumulate()
+        return coco_eval
+
+    def __len__(self):
+        return len(self._img_ids)
+
+
+def _target_key(record) -> tuple:
+    """Key of a converted record in the cache. The masks and keypoints are
+    transformed together with the boxes, only the labels and boxes are hashed."""
+    bboxes = record["bboxes"]
+    xyxy = bboxes.xyxy if isinstance(bboxes, BBoxArray) else [o.xyxy for o in bboxes]
+    fingerprint = hashlib.sha1(np.asarray(xyxy, dtype=np.float64).tobytes())
+    fingerprint.update(repr(_as_list(record["labels"])).encode())
+    return (
+        record["imageid"],
+        record["height"],
+        record["width"],
+        fingerprint.hexdigest(),
+    )
@@ -1,5 +1,11 @@
 from icevision.models.utils import *
 from icevision.models.interpretation import *
+from icevision.models.tiling import *
+from icevision.models.export import *
+from icevision.models.inference_engine import *
+from icevision.models.quantization import *
+from icevision.models.inference_server import *
+from icevision.models import tta
 
 # backwards compatibility
 from icevision.models.torchvision import (
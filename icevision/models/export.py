@@ -0,0 +1,253 @@
+__all__ = [
+    "InferenceModule",
+    "TorchvisionInferenceModule",
+    "EfficientDetInferenceModule",
+    "inference_module",
+    "export_torchscript",
+    "export_onnx",
+]
+
+from icevision.imports import *
+from icevision.utils import *
+from icevision.soft_dependencies import SoftDependencies
+import inspect
+from torchvision.models.detection.generalized_rcnn import GeneralizedRCNN
+from torchvision.models.detection.retinanet import RetinaNet
+from torchvision.models.detection.mask_rcnn import MaskRCNN
+from torchvision.models.detection.keypoint_rcnn import KeypointRCNN
+
+if SoftDependencies.effdet:
+    from effdet import DetBenchPredict, DetBenchTrain, EfficientDet, unwrap_bench
+    from effdet.efficientdet import HeadNet
+
+
+class InferenceModule(nn.Module):
+    """A model together with its preprocessing, ready to be exported.
+
+    The module takes a batch of uint8 images `(N, H, W, C)`, already transformed
+    like for `predict` except for the normalization, which is done by the module
+    the same way as `A.Normalize` + `build_infer_batch`. The predictions of all
+    the images are returned as flat tensors: `boxes` (xyxy), `scores`, `labels`,
+    `counts` (number of detections per image) and `masks` for mask models. Only
+    tensors go in and out, so the module can be scripted, traced and exported to
+    ONNX, see `InferenceEngine` to run the exported module.
+    """
+
+    model_type: str = ""
+    # only used in python, not part of the exported module
+    __jit_unused_properties__ = ["output_names"]
+
+    def __init__(
+        self,
+        model: nn.Module,
+        mean: Sequence[float] = IMAGENET_STATS[0],
+        std: Sequence[float] = IMAGENET_STATS[1],
+    ):
+        super().__init__()
+        self.model = model
+        # same as `A.Normalize` with `max_pixel_value=255`
+        self.register_buffer("mean", torch.tensor(mean).reshape(1, -1, 1, 1) * 255)
+        self.register_buffer("std", torch.tensor(std).reshape(1, -1, 1, 1) * 255)
+        self.mean_values, self.std_values = list(mean), list(std)
+
+    def preprocess(self, imgs: Tensor) -> Tensor:
+        return (imgs.permute(0, 3, 1, 2).float() - self.mean) / self.std
+
+    @property
+    def output_names(self) -> List[str]:
+        return ["boxes", "scores", "labels", "counts"]
+
+    def metadata(self) -> dict:
+        """Stored with the exported module, used by `InferenceEngine`."""
+        return {
+            "model_type": self.model_type,
+            "outputs": self.output_names,
+            "mean": self.mean_values,
+            "std": self.std_values,
+        }
+
+
+class TorchvisionInferenceModule(InferenceModule):
+    model_type = "torchvision"
+
+    def __init__(self, model: nn.Module, mean=IMAGENET_STATS[0], std=IMAGENET_STATS[1]):
+        if isinstance(model, KeypointRCNN):
+            raise ValueError("Exporting keypoint_rcnn models is not supported")
+        super().__init__(model, mean=mean, std=std)
+        self.with_masks = isinstance(model, MaskRCNN)
+
+    @property
+    def output_names(self) -> List[str]:
+        return super().output_names + (["masks"] if self.with_masks else [])
+
+    def forward(self, imgs: Tensor) -> List[Tensor]:
+        x = self.preprocess(imgs)
+        dets = self._detect([img for img in x.unbind(0)])
+
+        outputs = [
+            torch.cat([det["boxes"] for det in dets]),
+            torch.cat([det["scores"] for det in dets]),
+            torch.cat([det["labels"] for det in dets]),
+            torch.stack([torch.tensor(len(det["scores"])) for det in dets]),
+        ]
+        if self.with_masks:
+            outputs.append(torch.cat([det["masks"] for det in dets]))
+        return outputs
+
+    def _detect(self, imgs: List[Tensor]) -> List[Dict[str, Tensor]]:
+        # scripted torchvision models always return `(losses, detections)`
+        if torch.jit.is_scripting():
+            return self.model(imgs)[1]
+        return self.model(imgs)
+
+
+class EfficientDetInferenceModule(InferenceModule):
+    model_type = "efficientdet"
+
+    def __init__(self, model: nn.Module, mean=IMAGENET_STATS[0], std=IMAGENET_STATS[1]):
+        if not isinstance(model, DetBenchPredict):
+            model = DetBenchPredict(unwrap_bench(model))
+        # TorchScript can only index the batchnorms of the heads by feature level
+        for head in [model.model.class_net, model.model.box_net]:
+            if not head.bn_level_first:
+                head.toggle_bn_level_first()
+            head.__class__ = _LevelFirstHeadNet
+        super().__init__(model, mean=mean, std=std)
+
+    def forward(self, imgs: Tensor) -> List[Tensor]:
+        x = self.preprocess(imgs)
+        # same as `build_infer_batch`, boxes are predicted on the input image
+        batch_size, height, width = x.shape[0], x.shape[2], x.shape[3]
+        img_info = {
+            "img_scale": torch.ones(batch_size, dtype=torch.float32),
+            "img_size": torch.tensor([height, width], dtype=torch.float32)
+            .unsqueeze(0)
+            .expand(batch_size, 2),
+        }
+        dets = self.model(x, img_info)
+
+        max_dets = dets.shape[1]
+        dets = dets.reshape(-1, 6)
+        counts = torch.full([batch_size], max_dets, dtype=torch.int64)
+        return [dets[:, :4], dets[:, 4], dets[:, 5].long(), counts]
+
+
+if SoftDependencies.effdet:
+
+    class _LevelFirstHeadNet(HeadNet):
+        """`HeadNet` without the python only (`torch.jit.ignore`) code path, which
+        can be scripted but not saved."""
+
+        def forward(self, x: List[Tensor]) -> List[Tensor]:
+            return self._forward_level_first(x)
+
+
+def inference_module(
+    model: nn.Module,
+    mean: Sequence[float] = IMAGENET_STATS[0],
+    std: Sequence[float] = IMAGENET_STATS[1],
+) -> InferenceModule:
+    """Wraps a model created by `faster_rcnn.model`, `retinanet.model`,
+    `mask_rcnn.model` or `efficientdet.model` in an `InferenceModule`, on the CPU
+    and in eval mode. The model is copied, `model` itself is not modified.
+
+    # Arguments
+        model: The trained model.
+        mean: Mean of the `A.Normalize` used for training.
+        std: Std of the `A.Normalize` used for training.
+    """
+    model = deepcopy(model).cpu()
+    if isinstance(model, (GeneralizedRCNN, RetinaNet)):
+        module = TorchvisionInferenceModule(model, mean=mean, std=std)
+    elif SoftDependencies.effdet and isinstance(
+        model, (DetBenchTrain, DetBenchPredict, EfficientDet)
+    ):
+        module = EfficientDetInferenceModule(model, mean=mean, std=std)
+    else:
+        raise ValueError(f"Exporting {model.__class__.__name__} is not supported")
+    return module.eval()
+
+
+def export_torchscript(
+    model: nn.Module,
+    filepath: Union[str, Path],
+    mean: Sequence[float] = IMAGENET_STATS[0],
+    std: Sequence[float] = IMAGENET_STATS[1],
+) -> Path:
+    """Scripts the model and its preprocessing (see `InferenceModule`) and saves it
+    to `filepath`, to be run with `InferenceEngine` (or `torch.jit.load`).
+
+    # Arguments
+        model: The trained model.
+        filepath: Where the TorchScript module is saved, usually a `.pt` file.
+        mean: Mean of the `A.Normalize` used for training.
+        std: Std of the `A.Normalize` used for training.
+
+    # Returns
+        The path of the saved module.
+    """
+    module = inference_module(model, mean=mean, std=std)
+    scripted = torch.jit.script(module)
+    extra_files = {"icevision.json": json.dumps(module.metadata())}
+    torch.jit.save(scripted, str(filepath), _extra_files=extra_files)
+    return Path(filepath)
+
+
+def export_onnx(
+    model: nn.Module,
+    filepath: Union[str, Path],
+    img_size: Union[int, Tuple[int, int]],
+    mean: Sequence[float] = IMAGENET_STATS[0],
+    std: Sequence[float] = IMAGENET_STATS[1],
+    opset_version: int = 11,
+) -> Path:
+    """Exports the model and its preprocessing (see `InferenceModule`) to ONNX, to
+    be run with `InferenceEngine` (or onnxruntime). Requires the `onnx` package.
+
+    # Arguments
+        model: The trained model.
+        filepath: Where the model is saved, usually a `.onnx` file.
+        img_size: `(height, width)` of the images the model is traced with, the
+        exported model can also be used with other sizes and batch sizes.
+        mean: Mean of the `A.Normalize` used for training.
+        std: Std of the `A.Normalize` used for training.
+        opset_version: ONNX opset, torchvision detection models need at least 11.
+
+    # Returns
+        The path of the saved model.
+    """
+    import onnx
+
+    height, width = (img_size, img_size) if isinstance(img_size, int) else img_size
+    module = inference_module(model, mean=mean, std=std)
+    imgs = torch.zeros((1, height, width, 3), dtype=torch.uint8)
+    output_names = module.output_names
+
+    dynamic_axes = {name: {0: name} for name in output_names}
+    dynamic_axes["imgs"] = {0: "batch_size", 1: "height", 2: "width"}
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            (imgs,),
+            str(filepath),
+            input_names=["imgs"],
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+            **_onnx_export_kwargs(),
+        )
+
+    onnx_model = onnx.load(str(filepath))
+    onnx.helper.set_model_props(
+        onnx_model, {"icevision": json.dumps(module.metadata())}
+    )
+    onnx.save(onnx_model, str(filepath))
+    return Path(filepath)
+
+
+def _onnx_export_kwargs() -> dict:
+    """Selects the TorchScript based exporter on torch versions that also have the
+    dynamo one, older versions do not accept the `dynamo` argument."""
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        return {"dynamo": False}
+    return {}
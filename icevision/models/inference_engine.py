@@ -0,0 +1,137 @@
+__all__ = ["InferenceEngine"]
+
+from icevision.imports import *
+from icevision.utils import *
+from icevision.core import *
+
+
+class InferenceEngine:
+    """Runs a model exported by `export_torchscript` (with TorchScript) or
+    `export_onnx` (with onnxruntime) on the CPU.
+
+    Returns the same predictions as the `predict` function of the model, without
+    needing the model code, the normalization and the conversion of the raw
+    predictions are part of the exported model or vectorized with numpy.
+
+    # Arguments
+        filepath: The exported model, `.onnx` files are run with onnxruntime, other
+        files are loaded as TorchScript.
+        num_threads: Number of threads used by the runtime, defaults to the runtime
+        default. With TorchScript, the number of threads of torch is only changed
+        while the model runs, it is a process-wide setting.
+
+    # Examples
+    ```python
+    export_torchscript(model, "model.pt")
+    engine = InferenceEngine("model.pt")
+    # images transformed like for training, without `A.Normalize`
+    preds = engine.predict([img], detection_threshold=0.5)
+    ```
+    """
+
+    def __init__(self, filepath: Union[str, Path], num_threads: Optional[int] = None):
+        self.filepath = Path(filepath)
+        self.num_threads = num_threads
+        self.runtime = "onnx" if self.filepath.suffix == ".onnx" else "torchscript"
+
+        if self.runtime == "onnx":
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            if num_threads is not None:
+                options.intra_op_num_threads = num_threads
+            self._session = onnxruntime.InferenceSession(
+                str(self.filepath), options, providers=["CPUExecutionProvider"]
+            )
+            metadata = self._session.get_modelmeta().custom_metadata_map["icevision"]
+        else:
+            extra_files = {"icevision.json": ""}
+            self._module = torch.jit.load(
+                str(self.filepath), map_location="cpu", _extra_files=extra_files
+            )
+            metadata = extra_files["icevision.json"]
+
+        self.metadata = json.loads(metadata)
+
+    def __call__(
+        self, imgs: Union[np.ndarray, Sequence[np.ndarray]]
+    ) -> Dict[str, np.ndarray]:
+        """Raw outputs of the exported model (flat arrays of all the images)."""
+        imgs = np.ascontiguousarray(np.stack(imgs), dtype=np.uint8)
+        if self.runtime == "onnx":
+            outputs = self._session.run(None, {"imgs": imgs})
+        else:
+            with torch.no_grad(), _torch_num_threads(self.num_threads):
+                outputs = self._module(torch.from_numpy(imgs))
+            outputs = [output.numpy() for output in outputs]
+        return dict(zip(self.metadata["outputs"], outputs))
+
+    def predict(
+        self,
+        imgs: Union[np.ndarray, Sequence[np.ndarray]],
+        detection_threshold: float = 0.5,
+        mask_threshold: float = 0.5,
+    ) -> List[dict]:
+        """Predictions of a batch of images.
+
+        # Arguments
+            imgs: uint8 images `(H, W, C)` of the same size, transformed like for
+            `predict` except for `A.Normalize`, which is part of the exported model.
+            detection_threshold: Same as `predict`.
+            mask_threshold: Same as `mask_rcnn.predict`.
+
+        # Returns
+            The same predictions as the `predict` function of the model.
+        """
+        outputs = self(imgs)
+        sections = np.cumsum(outputs["counts"])[:-1]
+        splits = {k: np.split(v, sections) for k, v in outputs.items() if k != "counts"}
+
+        preds = []
+        for i in range(len(outputs["counts"])):
+            output = {k: v[i] for k, v in splits.items()}
+            preds.append(self._convert(output, detection_threshold, mask_threshold))
+        return preds
+
+    def _convert(
+        self, output: Dict[str, np.ndarray], detection_threshold, mask_threshold
+    ) -> dict:
+        scores = output["scores"]
+        # same thresholds as the `convert_raw_predictions` of each model
+        if self.metadata["model_type"] == "efficientdet":
+            keep = scores > detection_threshold
+            if detection_threshold <= 0:
+                keep = np.ones(len(scores), dtype=bool)
+        else:
+            keep = scores >= detection_threshold
+
+        pred = {
+            "labels": output["labels"][keep],
+            "scores": scores[keep],
+            "bboxes": BBoxArray(output["boxes"][keep]),
+        }
+        if self.metadata["model_type"] == "torchvision":
+            pred["above_threshold"] = keep
+        if "masks" in output:
+            masks = output["masks"][keep] > mask_threshold
+            pred["masks"] = MaskArray(masks.squeeze(1))
+        return pred
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__} {self.runtime} "
+            f"{self.metadata['model_type']}: {self.filepath}>"
+        )
+
+
+@contextmanager
+def _torch_num_threads(num_threads: Optional[int]):
+    if num_threads is None:
+        yield
+        return
+    default_num_threads = torch.get_num_threads()
+    torch.set_num_threads(num_threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(default_num_threads)
@@ -0,0 +1,339 @@
+__all__ = ["InferenceServer", "serve_http"]
+
+from icevision.imports import *
+from icevision.utils import *
+from icevision.core import *
+from icevision.data import Dataset
+from icevision.tfms import Transform
+from collections import Counter, deque
+from concurrent.futures import Future, InvalidStateError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio, queue, threading, time
+
+
+class _Request:
+    def __init__(self, img: np.ndarray):
+        self.img = img
+        self.future = Future()
+        self.start = time.perf_counter()
+
+
+class _ModelWorker:
+    """Predicts the requests of a model in batches, in its own thread."""
+
+    def __init__(
+        self,
+        name: str,
+        model: nn.Module,
+        model_type,
+        tfm: Optional[Transform],
+        max_batch_size: int,
+        max_latency: float,
+        num_latencies: int,
+        predict_kwargs: dict,
+    ):
+        self.name, self.model, self.model_type, self.tfm = name, model, model_type, tfm
+        self.max_batch_size, self.max_latency = max_batch_size, max_latency
+        self.predict_kwargs = predict_kwargs
+        self.requests = queue.Queue()
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=num_latencies)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name=f"icevision-{name}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self.requests.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._predict(batch)
+            except Exception as e:
+                # a bad batch should never stop the worker
+                logger.exception(f"Failed to predict a batch of {self.name}")
+                for request in batch:
+                    _set_exception(request.future, e)
+
+    def _next_request(self, timeout: Optional[float] = None) -> Optional[_Request]:
+        """Next request that was not cancelled by its client, `None` to stop.
+        Raises `queue.Empty` after `timeout`."""
+        while True:
+            request = self.requests.get(timeout=timeout)
+            # once running, the request can no longer be cancelled
+            if request is None or request.future.set_running_or_notify_cancel():
+                return request
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        """Waits for a request, then for more requests until the batch is full or
+        `max_latency` has passed since the first one was received."""
+        first = self._next_request()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first.start + self.max_latency
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = self._next_request(timeout=max(timeout, 0))
+            except queue.Empty:
+                break
+            if request is None:
+                # stop after the pending requests are predicted
+                self.requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _predict(self, batch: List[_Request]):
+        """Predicts the requests of a batch, the images are collated by size so
+        an image of another size does not fail the whole batch."""
+        try:
+            infer_ds = Dataset.from_images([r.img for r in batch], self.tfm)
+            samples = list(infer_ds)
+        except Exception as e:
+            for request in batch:
+                _set_exception(request.future, e)
+            return
+
+        groups = defaultdict(list)
+        for request, sample in zip(batch, samples):
+            groups[sample["img"].shape].append((request, sample))
+        for group in groups.values():
+            self._predict_group(group)
+
+    def _predict_group(self, group: List[Tuple[_Request, Any]]):
+        requests, samples = zip(*group)
+        try:
+            infer_batch, _ = self.model_type.build_infer_batch(list(samples))
+            preds = self.model_type.predict(
+                model=self.model, batch=infer_batch, **self.predict_kwargs
+            )
+        except Exception as e:
+            for request in requests:
+                _set_exception(request.future, e)
+            return
+
+        end = time.perf_counter()
+        with self._lock:
+            self.batch_sizes[len(requests)] += 1
+            self.latencies.extend(end - request.start for request in requests)
+        for request, pred in zip(requests, preds):
+            _set_result(request.future, pred)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            latencies = np.array(self.latencies)
+            batch_sizes = dict(sorted(self.batch_sizes.items()))
+        p50, p99 = (
+            np.percentile(latencies, [50, 99]) * 1000
+            if len(latencies)
+            else (float("nan"), float("nan"))
+        )
+        return {
+            "queue_depth": self.requests.qsize(),
+            "batch_sizes": batch_sizes,
+            "latency_p50 (ms)": float(p50),
+            "latency_p99 (ms)": float(p99),
+        }
+
+
+class InferenceServer:
+    """Serves several models in the same process, single image requests are
+    coalesced into batches.
+
+    Each model has a queue and a thread: the first request of a batch waits at
+    most `max_latency` seconds for other requests, the batch is then transformed,
+    collated by `build_infer_batch` and predicted by `predict` of the model type.
+    Images of different sizes (after `tfm`) are predicted in separate batches.
+    Requests cancelled by their client before being batched are dropped.
+    Requests can be sent from any thread with `predict` (blocking) or `submit`,
+    and from asyncio code with `predict_async`.
+
+    # Arguments
+        max_batch_size: Maximum number of images predicted at a time by a model.
+        max_latency: Maximum time in seconds a request waits for other requests to
+        be batched with.
+        num_latencies: Number of latest requests used for the latency metrics.
+
+    # Examples
+    ```python
+    server = InferenceServer(max_batch_size=8, max_latency=0.01)
+    server.add_model(
+        "fridge", model, faster_rcnn, tfm=tfms.A.Adapter(valid_tfms), detection_threshold=0.5
+    )
+    pred = server.predict("fridge", img)
+    # or, in a coroutine
+    pred = await server.predict_async("fridge", img)
+    server.stop()
+    ```
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 8,
+        max_latency: float = 0.01,
+        num_latencies: int = 10000,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.num_latencies = num_latencies
+        self._workers: Dict[str, _ModelWorker] = {}
+
+    def add_model(
+        self,
+        name: str,
+        model: nn.Module,
+        model_type,
+        tfm: Optional[Transform] = None,
+        **predict_kwargs,
+    ):
+        """Starts serving a model.
+
+        # Arguments
+            name: Name of the model in the requests.
+            model: The model, in eval mode on the device it is predicted on.
+            model_type: The module of the model, e.g. `faster_rcnn` or `efficientdet`,
+            its `build_infer_batch` and `predict` are used.
+            tfm: Transform applied to the images, usually the validation transforms.
+            predict_kwargs: Passed to `predict`, e.g. `detection_threshold`.
+        """
+        if name in self._workers:
+            raise ValueError(f"A model named {name} is already served")
+        self._workers[name] = _ModelWorker(
+            name=name,
+            model=model,
+            model_type=model_type,
+            tfm=tfm,
+            max_batch_size=self.max_batch_size,
+            max_latency=self.max_latency,
+            num_latencies=self.num_latencies,
+            predict_kwargs=predict_kwargs,
+        )
+
+    @property
+    def model_names(self) -> List[str]:
+        return list(self._workers)
+
+    def submit(self, name: str, img: np.ndarray) -> Future:
+        """Queues an image (HWC) for model `name`, returns a future of its
+        prediction."""
+        if name not in self._workers:
+            raise KeyError(f"No model named {name}, served models: {self.model_names}")
+        request = _Request(img)
+        self._workers[name].requests.put(request)
+        return request.future
+
+    def predict(
+        self, name: str, img: np.ndarray, timeout: Optional[float] = None
+    ) -> dict:
+        """Predicts an image (HWC) with model `name`, blocks until it is done."""
+        return self.submit(name, img).result(timeout=timeout)
+
+    async def predict_async(self, name: str, img: np.ndarray) -> dict:
+        """Same as `predict`, without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(name, img))
+
+    def metrics(self) -> Dict[str, dict]:
+        """For each model, the number of requests waiting in the queue, the number
+        of batches predicted for each batch size and the 50th and 99th percentiles
+        of the latency (from `submit` to the prediction) in milliseconds."""
+        return {name: worker.metrics() for name, worker in self._workers.items()}
+
+    def stop(self):
+        """Predicts the queued requests and stops all the threads."""
+        for worker in self._workers.values():
+            worker.stop()
+        self._workers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def serve_http(
+    server: InferenceServer, host: str = "127.0.0.1", port: int = 8000
+) -> ThreadingHTTPServer:
+    """Minimal HTTP frontend of an `InferenceServer`, for testing.
+
+    `POST /predict/<model name>` with an encoded image (e.g. jpg or png) as body
+    returns the prediction as json, `GET /metrics` returns `server.metrics()`.
+    Each connection is handled in its own thread, so concurrent requests are
+    batched together.
+
+    # Returns
+        The http server, call `serve_forever` to start it (e.g. in a thread) and
+        `shutdown` to stop it. Use port 0 to pick a free port, available at
+        `server_address`.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                return self.send_error(404)
+            self._send_json(server.metrics())
+
+        def do_POST(self):
+            prefix = "/predict/"
+            name = self.path[len(prefix) :]
+            if not self.path.startswith(prefix) or name not in server.model_names:
+                return self.send_error(404, f"No model named {name}")
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            img = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                return self.send_error(400, "Could not decode the image")
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            try:
+                pred = server.predict(name, img)
+            except Exception as e:
+                return self.send_error(500, str(e))
+            self._send_json(_pred_to_json(pred))
+
+        def _send_json(self, obj):
+            body = json.dumps(obj).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def _set_result(future: Future, result):
+    try:
+        future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+def _set_exception(future: Future, exception: Exception):
+    try:
+        future.set_exception(exception)
+    except InvalidStateError:
+        pass
+
+
+def _pred_to_json(pred: dict) -> dict:
+    xyxy = np.array([bbox.xyxy for bbox in pred["bboxes"]], dtype=float)
+    out = {
+        "labels": np.asarray(pred["labels"]).tolist(),
+        "scores": np.asarray(pred["scores"]).tolist(),
+        "bboxes": xyxy.reshape(-1, 4).tolist(),
+    }
+    if "masks" in pred:
+        # COCO RLEs, with the counts as a string
+        erles = pred["masks"].to_erles(h=None, w=None).erles
+        out["masks"] = [{**erle, "counts": erle["counts"].decode()} for erle in erles]
+    return out
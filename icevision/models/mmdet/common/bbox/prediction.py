@@ -1,22 +1,41 @@
-__all__ = ["predict", "predict_dl", "convert_raw_prediction", "convert_raw_predictions"]
+__all__ = [
+    "predict",
+    "predict_dl",
+    "predict_from_dl",
+    "predict_tiled",
+    "convert_raw_prediction",
+    "convert_raw_predictions",
+]
 
 from icevision.imports import *
 from icevision.utils import *
 from icevision.core import *
-from icevision.models.utils import _predict_dl
+from icevision.models.utils import _predict_dl, _predict_from_dl
+from icevision.models.tiling import _predict_tiled
+from icevision.tfms import Transform
+from icevision.models.mmdet.common.bbox.dataloaders import build_infer_batch
 
 
 @torch.no_grad()
-def predict(
+def _forward(
     model: nn.Module,
     batch: Sequence[torch.Tensor],
-    detection_threshold: float = 0.5,
     device: Optional[torch.device] = None,
 ):
     device = device or model_device(model)
     batch["img"] = [img.to(device) for img in batch["img"]]
 
-    raw_pred = model(return_loss=False, rescale=False, **batch)
+    return model(return_loss=False, rescale=False, **batch)
+
+
+@torch.no_grad()
+def predict(
+    model: nn.Module,
+    batch: Sequence[torch.Tensor],
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    raw_pred = _forward(model=model, batch=batch, device=device)
     return convert_raw_predictions(raw_pred, detection_threshold=detection_threshold)
 
 
@@ -32,6 +51,61 @@ def predict_dl(
     )
 
 
+def predict_from_dl(
+    model: nn.Module,
+    infer_dl: DataLoader,
+    show_pbar: bool = True,
+    keep_images: bool = False,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    """Same as `predict_dl`, but yields `(sample, pred)` pairs as the batches are
+    predicted instead of returning them all at the end.
+
+    # Arguments
+        keep_images: If `False`, the `img` array is removed from the samples.
+    """
+    return _predict_from_dl(
+        forward_fn=_forward,
+        convert_fn=convert_raw_predictions,
+        model=model,
+        infer_dl=infer_dl,
+        show_pbar=show_pbar,
+        keep_images=keep_images,
+        device=device,
+        detection_threshold=detection_threshold,
+    )
+
+
+def predict_tiled(
+    model: nn.Module,
+    images: Iterable[Union[str, Path, np.ndarray]],
+    tfm: Optional[Transform] = None,
+    tile_size: int = 1024,
+    overlap: int = 128,
+    batch_size: int = 8,
+    iou_threshold: float = 0.5,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+    show_pbar: bool = True,
+) -> Iterator[dict]:
+    """Same as `faster_rcnn.predict_tiled`."""
+    return _predict_tiled(
+        predict_fn=predict,
+        build_batch=build_infer_batch,
+        model=model,
+        images=images,
+        tfm=tfm,
+        tile_size=tile_size,
+        overlap=overlap,
+        batch_size=batch_size,
+        iou_threshold=iou_threshold,
+        show_pbar=show_pbar,
+        detection_threshold=detection_threshold,
+        device=device,
+    )
+
+
 def convert_raw_predictions(
     raw_preds: Sequence[Sequence[np.ndarray]], detection_threshold: float
 ):
@@ -47,7 +121,7 @@ def convert_raw_prediction(raw_pred: Sequence[np.ndarray], detection_threshold:
     keep_mask = scores > detection_threshold
     keep_scores = scores[keep_mask]
     keep_labels = labels[keep_mask]
-    keep_bboxes = [BBox.from_xyxy(*o) for o in bboxes[keep_mask]]
+    keep_bboxes = BBoxArray(bboxes[keep_mask])
 
     return {
         "scores": keep_scores,
@@ -113,6 +113,7 @@ def _masks(record):
     if len(record["masks"]) == 0:
         raise RuntimeError("Negative samples still needs to be implemented")
     else:
-        mask = record["masks"].data
-        _, h, w = mask.shape
+        # lazy masks are only decoded here, at the final resolution
+        h, w = record["img"].shape[:-1]
+        mask = record["masks"].to_mask(h=h, w=w).data
         return BitmapMasks(mask, height=h, width=w)
@@ -0,0 +1,175 @@
+__all__ = ["quantize_backbone", "quantization_report"]
+
+from icevision.imports import *
+from icevision.utils import *
+from icevision.metrics import Metric
+from torchvision.ops.misc import FrozenBatchNorm2d
+import time
+
+
+def quantize_backbone(backbone: nn.Module, backend: str = "fbgemm") -> nn.Module:
+    """Prepares a backbone (e.g. `resnet_fpn`, `mobilenet`) for int8 static
+    quantization: conv-bn-relu are fused and observers are added to record the
+    range of the activations. Forward calibration images through the returned
+    module, then call `torch.ao.quantization.quantize_fx.convert_fx` on it.
+    Requires torch >= 1.13.
+
+    # Arguments
+        backbone: The backbone, in eval mode, it is modified in place.
+        backend: `fbgemm` (x86) or `qnnpack` (ARM).
+    """
+    # imported here, `torch.ao` is not available on all the supported versions
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx
+
+    backbone = _unfreeze_batchnorms(backbone).eval()
+    # only used to check the graph, the backbone works with any image size
+    example_inputs = (torch.zeros(1, 3, 64, 64),)
+    qconfig_mapping = get_default_qconfig_mapping(backend)
+    try:
+        with _quantized_engine(backend):
+            return prepare_fx(backbone, qconfig_mapping, example_inputs)
+    except torch.fx.proxy.TraceError as e:
+        raise ValueError(
+            f"{backbone.__class__.__name__} cannot be statically quantized, "
+            "use `mode='dynamic'`"
+        ) from e
+
+
+@contextmanager
+def _quantized_engine(backend: str):
+    """Sets the global quantized engine, restores the previous one on exit."""
+    engine = torch.backends.quantized.engine
+    torch.backends.quantized.engine = backend
+    try:
+        yield
+    finally:
+        torch.backends.quantized.engine = engine
+
+
+def _unfreeze_batchnorms(module: nn.Module) -> nn.Module:
+    """Replaces the `FrozenBatchNorm2d` of the torchvision backbones with an
+    equivalent `nn.BatchNorm2d`, which can be fused with the convolutions."""
+    for name, child in module.named_children():
+        if isinstance(child, FrozenBatchNorm2d):
+            bn = nn.BatchNorm2d(len(child.weight), eps=child.eps).eval()
+            with torch.no_grad():
+                bn.weight.copy_(child.weight)
+                bn.bias.copy_(child.bias)
+                bn.running_mean.copy_(child.running_mean)
+                bn.running_var.copy_(child.running_var)
+            setattr(module, name, bn)
+        else:
+            _unfreeze_batchnorms(child)
+    return module
+
+
+def _quantize(
+    predict_fn,
+    model: nn.Module,
+    calib_dl: Optional[DataLoader] = None,
+    mode: str = "static",
+    backend: str = "fbgemm",
+    max_calib_batches: Optional[int] = None,
+    show_pbar: bool = True,
+) -> nn.Module:
+    """Quantized copy of a torchvision model, see `faster_rcnn.quantize`.
+
+    The backbone is statically quantized, calibrated by predicting the batches of
+    `calib_dl` with `predict_fn`, so it sees the exact inputs of inference. The
+    `nn.Linear` of the heads are dynamically quantized.
+    """
+    if mode not in ["static", "dynamic"]:
+        raise ValueError(f"mode should be 'static' or 'dynamic', got {mode}")
+    if mode == "static" and calib_dl is None:
+        raise ValueError("Static quantization needs a calib_dl for calibration")
+    from torch.ao.quantization import quantize_dynamic
+    from torch.ao.quantization.quantize_fx import convert_fx
+
+    model = deepcopy(model).cpu().eval()
+
+    with _quantized_engine(backend):
+        if mode == "static":
+            model.backbone = quantize_backbone(model.backbone, backend=backend)
+            batches = itertools.islice(calib_dl, max_calib_batches)
+            for batch, _ in pbar(batches, show=show_pbar):
+                predict_fn(model=model, batch=batch, device=torch.device("cpu"))
+            model.backbone = convert_fx(model.backbone)
+
+        return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def quantization_report(
+    models: Dict[str, nn.Module],
+    predict_fn,
+    valid_dl: DataLoader,
+    metrics: Sequence[Metric],
+    print_summary: bool = True,
+    show_pbar: bool = True,
+    **predict_kwargs,
+) -> Dict[str, Dict[str, float]]:
+    """Compares the latency, size and metrics of models, e.g. a model and its
+    quantized versions.
+
+    # Arguments
+        models: The models to compare, by name.
+        predict_fn: The `predict` function of the models, e.g. `faster_rcnn.predict`.
+        valid_dl: A dataloader of the validation records, created with `infer_dl`.
+        metrics: Metrics computed for each model, e.g. `[COCOMetric()]`.
+        print_summary: If `True`, prints the report as a table.
+        predict_kwargs: Passed to `predict_fn`, e.g. `detection_threshold`.
+
+    # Returns
+        For each model, the latency in ms per image (only the time spent in
+        `predict_fn`), the size of the weights in MB and the logs of the metrics.
+
+    # Examples
+    ```python
+    int8_model = faster_rcnn.quantize(model, calib_dl)
+    quantization_report(
+        {"float": model, "int8": int8_model},
+        faster_rcnn.predict,
+        faster_rcnn.infer_dl(valid_ds, batch_size=4),
+        metrics=[COCOMetric()],
+    )
+    ```
+    """
+    report = {}
+    for name, model in models.items():
+        elapsed, num_imgs = 0.0, 0
+        for batch, records in pbar(valid_dl, show=show_pbar):
+            start = time.perf_counter()
+            preds = predict_fn(model=model, batch=batch, **predict_kwargs)
+            elapsed += time.perf_counter() - start
+            num_imgs += len(records)
+            for metric in metrics:
+                metric.accumulate(records=records, preds=preds)
+
+        report[name] = {
+            "latency (ms/img)": 1000 * elapsed / max(num_imgs, 1),
+            "size (MB)": _state_dict_size(model) / 2 ** 20,
+        }
+        for metric in metrics:
+            for k, v in metric.finalize().items():
+                report[name][f"{metric.name}/{k}"] = v
+
+    if print_summary:
+        print(_format_report(report))
+    return report
+
+
+def _state_dict_size(model: nn.Module) -> int:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def _format_report(report: Dict[str, Dict[str, float]]) -> str:
+    names = list(report)
+    columns = list(dict.fromkeys(k for logs in report.values() for k in logs))
+    width = max(len(column) for column in columns)
+    lines = [" " * width + "".join(f"{name:>14}" for name in names)]
+    for column in columns:
+        values = [report[name].get(column, float("nan")) for name in names]
+        lines.append(f"{column:<{width}}" + "".join(f"{v:>14.3f}" for v in values))
+    return "\n".join(lines)
@@ -97,7 +97,7 @@ def build_train_batch(records, batch_tfms=None):
     )
 
     # convert to tensors
-    batch_images = torch.stack(batch_images)
+    batch_images = _stack_imgs(batch_images)
     batch_bboxes = [tensor(bboxes, dtype=torch.float32) for bboxes in batch_bboxes]
     batch_classes = [tensor(classes, dtype=torch.float32) for classes in batch_classes]
 
@@ -158,7 +158,7 @@ def build_infer_batch(records, batch_tfms=None):
     )
 
     # convert to tensors
-    batch_images = torch.stack(batch_images)
+    batch_images = _stack_imgs(batch_images)
     batch_sizes = tensor(batch_sizes, dtype=torch.float32)
     batch_scales = tensor(batch_scales, dtype=torch.float32)
 
@@ -170,7 +170,7 @@ def build_infer_batch(records, batch_tfms=None):
 
 def process_train_record(record) -> tuple:
     """Extracts information from record and prepares a format required by the EffDet training"""
-    image = im2tensor(record["img"])
+    image = _im2tensor(record["img"])
     # background and dummy if no label in record
     classes = record["labels"] if record["labels"] else [0]
     bboxes = (
@@ -183,7 +183,7 @@ def process_train_record(record) -> tuple:
 
 def process_infer_record(record) -> tuple:
     """Extracts information from record and prepares a format required by the EffDet inference"""
-    image = im2tensor(record["img"])
+    image = _im2tensor(record["img"])
     image_size = image.shape[-2:]
     image_scale = 1.0
 
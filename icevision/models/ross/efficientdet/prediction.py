@@ -1,28 +1,87 @@
-__all__ = ["predict", "predict_dl", "convert_raw_predictions"]
+__all__ = [
+    "prepare_for_inference",
+    "predict",
+    "predict_dl",
+    "predict_from_dl",
+    "predict_tiled",
+    "predict_tta",
+    "convert_raw_predictions",
+]
 
 from icevision.imports import *
 from icevision.utils import *
 from icevision.core import *
-from icevision.models.utils import _predict_dl
+from icevision.models.utils import _predict_dl, _predict_from_dl
+from icevision.models.tiling import _predict_tiled
+from icevision.models.tta import _predict_tta
+from icevision.models import tta
+from icevision.tfms import Transform
+from icevision.models.ross.efficientdet.dataloaders import build_infer_batch
 from effdet import DetBenchTrain, DetBenchPredict, unwrap_bench
 
 
+def prepare_for_inference(
+    model: Union[DetBenchTrain, DetBenchPredict, nn.Module],
+    device: Optional[torch.device] = None,
+) -> DetBenchPredict:
+    """Wraps the model in a `DetBenchPredict`, in eval mode and on `device`.
+
+    The bench is created once per model and then reused, so the anchors are not
+    generated again for every batch. `predict_dl` and `predict_from_dl` prepare
+    the model once for all the batches, call this before calling `predict` in a
+    loop to do the same.
+
+    # Arguments
+        model: The model to wrap, can also be an already prepared bench.
+        device: Device of the bench, defaults to the device of the model.
+
+    # Returns
+        The `DetBenchPredict`, that can be passed as `model` to the prediction
+        functions.
+    """
+    device = device or model_device(model)
+    if isinstance(model, DetBenchPredict):
+        bench = model
+    else:
+        efficientdet = unwrap_bench(model)
+        bench = efficientdet.__dict__.get("_icevision_predict_bench")
+        if bench is None:
+            bench = DetBenchPredict(efficientdet)
+            # bypasses `nn.Module.__setattr__`, the bench is not a submodule and
+            # so is not part of the state dict of the model
+            efficientdet.__dict__["_icevision_predict_bench"] = bench
+
+    if bench.anchors.boxes.device != torch.device(device):
+        bench.to(device)
+    # the model might have been set to train mode since the last prediction
+    if bench.training or bench.model.training:
+        bench.eval()
+    return bench
+
+
 @torch.no_grad()
-def predict(
+def _forward(
     model: Union[DetBenchTrain, DetBenchPredict],
     batch: Sequence[torch.Tensor],
-    detection_threshold: float = 0.5,
     device: Optional[torch.device] = None,
 ):
-    device = device or model_device(model)
+    bench = prepare_for_inference(model, device=device)
+    device = bench.anchors.boxes.device
     imgs, img_info = batch
     imgs = imgs.to(device)
     img_info = {k: v.to(device) for k, v in img_info.items()}
 
-    bench = DetBenchPredict(unwrap_bench(model))
-    bench = bench.eval().to(device)
+    return bench(x=imgs, img_info=img_info)
 
-    raw_preds = bench(x=imgs, img_info=img_info)
+
+@torch.no_grad()
+def predict(
+    model: Union[DetBenchTrain, DetBenchPredict],
+    batch: Sequence[torch.Tensor],
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    raw_preds = _forward(model=model, batch=batch, device=device)
     return convert_raw_predictions(raw_preds, detection_threshold=detection_threshold)
 
 
@@ -31,13 +90,131 @@ def predict_dl(
 ):
     return _predict_dl(
         predict_fn=predict,
-        model=model,
+        model=prepare_for_inference(model, device=predict_kwargs.get("device")),
         infer_dl=infer_dl,
         show_pbar=show_pbar,
         **predict_kwargs,
     )
 
 
+def predict_from_dl(
+    model: nn.Module,
+    infer_dl: DataLoader,
+    show_pbar: bool = True,
+    keep_images: bool = False,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    """Same as `predict_dl`, but yields `(sample, pred)` pairs as the batches are
+    predicted instead of returning them all at the end.
+
+    # Arguments
+        keep_images: If `False`, the `img` array is removed from the samples.
+    """
+    return _predict_from_dl(
+        forward_fn=_forward,
+        convert_fn=convert_raw_predictions,
+        model=prepare_for_inference(model, device=device),
+        infer_dl=infer_dl,
+        show_pbar=show_pbar,
+        keep_images=keep_images,
+        device=device,
+        detection_threshold=detection_threshold,
+    )
+
+
+def predict_tiled(
+    model: nn.Module,
+    images: Iterable[Union[str, Path, np.ndarray]],
+    tfm: Optional[Transform] = None,
+    tile_size: int = 512,
+    overlap: int = 64,
+    batch_size: int = 8,
+    iou_threshold: float = 0.5,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+    show_pbar: bool = True,
+) -> Iterator[dict]:
+    """Same as `faster_rcnn.predict_tiled`, `tile_size` should be the `img_size`
+    the model was created with."""
+    return _predict_tiled(
+        predict_fn=predict,
+        build_batch=build_infer_batch,
+        model=prepare_for_inference(model, device=device),
+        images=images,
+        tfm=tfm,
+        tile_size=tile_size,
+        overlap=overlap,
+        batch_size=batch_size,
+        iou_threshold=iou_threshold,
+        show_pbar=show_pbar,
+        detection_threshold=detection_threshold,
+        device=device,
+    )
+
+
+@torch.no_grad()
+def predict_tta(
+    model: Union[DetBenchTrain, DetBenchPredict],
+    batch: Sequence[torch.Tensor],
+    views: Optional[Sequence[tta.View]] = None,
+    fusion: str = "wbf",
+    iou_threshold: float = 0.55,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    """Same as `faster_rcnn.predict_tta`. The anchors of the model are generated
+    for its image size, so the views can not be larger than the images, smaller
+    views (`tta.Scale` with a factor below 1) are padded to the image size."""
+    return _predict_tta(
+        forward_fn=_forward,
+        convert_fn=_convert_fused_predictions,
+        rebuild_batch=_tta_batch,
+        model=model,
+        batch=batch,
+        views=views,
+        fusion=fusion,
+        iou_threshold=iou_threshold,
+        size_divisor=None,
+        device=device,
+        to_dicts=_dets_to_dicts,
+        detection_threshold=detection_threshold,
+    )
+
+
+def _tta_batch(batch, imgs: torch.Tensor):
+    height, width = imgs.shape[-2:]
+    img_info = {
+        "img_size": imgs.new_tensor([[height, width]]).expand(len(imgs), 2),
+        "img_scale": imgs.new_ones(len(imgs)),
+    }
+    return imgs, img_info
+
+
+def _dets_to_dicts(dets: torch.Tensor) -> List[Dict[str, torch.Tensor]]:
+    return [
+        {"boxes": det[:, :4], "scores": det[:, 4], "labels": det[:, 5].long()}
+        for det in dets
+    ]
+
+
+def _convert_fused_predictions(
+    raw_preds: List[Dict[str, torch.Tensor]], detection_threshold: float
+) -> List[dict]:
+    preds = []
+    for raw_pred in raw_preds:
+        det = torch.cat(
+            [
+                raw_pred["boxes"],
+                raw_pred["scores"][:, None],
+                raw_pred["labels"][:, None].to(raw_pred["boxes"].dtype),
+            ],
+            dim=1,
+        )
+        preds.extend(convert_raw_predictions(det[None], detection_threshold))
+    return preds
+
+
 def convert_raw_predictions(
     raw_preds: torch.Tensor, detection_threshold: float
 ) -> List[dict]:
@@ -52,7 +229,7 @@ def convert_raw_predictions(
         pred = {
             "scores": det[:, 4],
             "labels": det[:, 5].astype(int),
-            "bboxes": [BBox.from_xyxy(*xyxy) for xyxy in det[:, :4]],
+            "bboxes": BBoxArray(det[:, :4]),
         }
         preds.append(pred)
 
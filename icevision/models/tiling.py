@@ -0,0 +1,276 @@
+__all__ = ["tile_offsets", "_predict_tiled"]
+
+from icevision.imports import *
+from icevision.utils import *
+from icevision.core import *
+from icevision.tfms import Transform
+from torchvision.ops import batched_nms
+
+
+def tile_offsets(size: int, tile_size: int, overlap: int) -> List[int]:
+    """Offsets of the tiles along a dimension of length `size`.
+
+    Consecutive tiles overlap by at least `overlap` pixels, the first tile starts
+    at 0 and the last one ends at `size`. The offsets are evenly spread, so all
+    the tiles have about the same overlap.
+    """
+    if not 0 <= overlap < tile_size:
+        raise ValueError(f"overlap must be in [0, {tile_size}), got {overlap}")
+    if size <= tile_size:
+        return [0]
+    n = math.ceil((size - tile_size) / (tile_size - overlap)) + 1
+    return np.linspace(0, size - tile_size, n).round().astype(int).tolist()
+
+
+def _predict_tiled(
+    predict_fn,
+    build_batch,
+    model: nn.Module,
+    images: Iterable[Union[str, Path, np.ndarray]],
+    tfm: Optional[Transform] = None,
+    tile_size: int = 1024,
+    overlap: int = 128,
+    batch_size: int = 8,
+    iou_threshold: float = 0.5,
+    pad_value: int = 0,
+    show_pbar: bool = True,
+    **predict_kwargs,
+) -> Iterator[dict]:
+    """Yields the predictions of each image, in the same order as `images`.
+
+    Images are cut in overlapping tiles that are predicted `batch_size` at a time
+    by `predict_fn`, tiles of consecutive images are batched together. The
+    detections are moved to the coordinates of the image and the duplicates on
+    the overlaps are removed with a per class NMS. Only the tiles of a batch and
+    the detections of the images being predicted are kept in memory.
+    """
+    pending = OrderedDict()
+    tiles = _iter_tiles(images, tile_size, overlap, pad_value, show_pbar)
+    for chunk in _chunks(tiles, batch_size):
+        records = [tile.record() for tile in chunk]
+        if tfm is not None:
+            records = [tfm(record) for record in records]
+        batch, _ = build_batch(records)
+        preds = predict_fn(model=model, batch=batch, **predict_kwargs)
+
+        for tile, pred in zip(chunk, preds):
+            if tile.image_idx not in pending:
+                pending[tile.image_idx] = _TiledPrediction(tile.height, tile.width)
+            pending[tile.image_idx].add(tile, pred)
+
+        # tiles are predicted in order, the images before the last one are done
+        last_idx = chunk[-1].image_idx
+        while pending and next(iter(pending)) != last_idx:
+            yield pending.popitem(last=False)[1].merge(iou_threshold)
+        if chunk[-1].is_last:
+            yield pending.popitem(last=False)[1].merge(iou_threshold)
+
+
+class _Tile:
+    def __init__(self, image_idx, img, x, y, height, width, is_last):
+        self.image_idx, self.img = image_idx, img
+        self.x, self.y = x, y
+        self.height, self.width = height, width
+        self.is_last = is_last
+
+    def record(self) -> dict:
+        tile_height, tile_width = self.valid_size
+        return {
+            "imageid": self.image_idx,
+            "img": self.img,
+            "height": tile_height,
+            "width": tile_width,
+        }
+
+    @property
+    def valid_size(self) -> Tuple[int, int]:
+        """Size of the tile without the padding of the images smaller than a tile."""
+        return min(len(self.img), self.height), min(len(self.img[0]), self.width)
+
+
+def _iter_tiles(images, tile_size, overlap, pad_value, show_pbar) -> Iterator[_Tile]:
+    for image_idx, image in enumerate(pbar(images, show=show_pbar)):
+        img = _open_tiled_img(image)
+        height, width = img.shape[:2]
+        offsets = [
+            (x, y)
+            for y in tile_offsets(height, tile_size, overlap)
+            for x in tile_offsets(width, tile_size, overlap)
+        ]
+        for i, (x, y) in enumerate(offsets):
+            # only the tile is read, `img` might be memory mapped
+            tile = np.array(img[y : y + tile_size, x : x + tile_size])
+            tile = _pad_tile(tile, tile_size, pad_value)
+            is_last = i == len(offsets) - 1
+            yield _Tile(image_idx, tile, x, y, height, width, is_last)
+
+
+def _open_tiled_img(image: Union[str, Path, np.ndarray]) -> np.ndarray:
+    """The image as an array that is sliced tile by tile. Arrays are used as is
+    (e.g. a `np.memmap`), `.npy` files are memory mapped so only the tiles being
+    predicted are read from disk, other files are decoded."""
+    if not isinstance(image, (str, Path)):
+        return image
+    if Path(image).suffix == ".npy":
+        return np.load(image, mmap_mode="r")
+    # unlike PIL, cv2 does not refuse images above ~90 megapixels
+    img = cv2.imread(str(image), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError(f"Could not read the image {image}")
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+
+
+def _pad_tile(tile: np.ndarray, tile_size: int, pad_value: int) -> np.ndarray:
+    """Pads the bottom and right of tiles of images smaller than `tile_size`, so
+    all tiles can be batched together."""
+    height, width = tile.shape[:2]
+    if (height, width) == (tile_size, tile_size):
+        return tile
+    padded = np.full((tile_size, tile_size, *tile.shape[2:]), pad_value, tile.dtype)
+    padded[:height, :width] = tile
+    return padded
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _TiledPrediction:
+    """Detections of the tiles of an image, in the coordinates of the image."""
+
+    def __init__(self, height: int, width: int):
+        self.height, self.width = height, width
+        self.xyxy, self.scores, self.labels, self.truncated = [], [], [], []
+        # masks are cropped to their box, so they only take the memory of the box
+        self.masks = None
+
+    def add(self, tile: _Tile, pred: dict):
+        tile_height, tile_width = tile.valid_size
+        xyxy = _pred_xyxy(pred["bboxes"])
+        # detections on the padding of a tile are clipped to the image
+        xyxy = xyxy.clip(0, [tile_width, tile_height, tile_width, tile_height])
+        keep = (xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])
+
+        self.xyxy.append(xyxy[keep] + [tile.x, tile.y, tile.x, tile.y])
+        self.scores.append(np.asarray(pred["scores"], dtype=np.float32)[keep])
+        self.labels.append(np.asarray(pred["labels"], dtype=np.int64)[keep])
+        self.truncated.append(_is_truncated(xyxy[keep], tile))
+
+        if "masks" in pred:
+            if self.masks is None:
+                self.masks = []
+            masks = pred["masks"].to_mask(h=len(tile.img), w=len(tile.img[0])).data
+            for box, mask in zip(xyxy[keep], masks[keep]):
+                xmin, ymin = np.floor(box[:2]).astype(int)
+                xmax, ymax = np.ceil(box[2:]).astype(int)
+                crop = mask[ymin:ymax, xmin:xmax].copy()
+                self.masks.append((crop, tile.x + xmin, tile.y + ymin))
+
+    def merge(self, iou_threshold: float) -> dict:
+        xyxy = np.concatenate(self.xyxy) if self.xyxy else np.zeros((0, 4))
+        scores = np.concatenate(self.scores) if self.scores else np.zeros(0)
+        labels = np.concatenate(self.labels) if self.labels else np.zeros(0, int)
+        truncated = np.concatenate(self.truncated) if self.truncated else []
+
+        # parts of objects cut by a tile, that another tile sees in full
+        keep = np.flatnonzero(
+            ~_is_covered(xyxy, labels, truncated, threshold=iou_threshold)
+        )
+        # duplicates of an object seen by more than one tile, per class
+        keep = keep[
+            batched_nms(
+                torch.from_numpy(xyxy[keep]).float(),
+                torch.from_numpy(scores[keep]).float(),
+                torch.from_numpy(labels[keep]),
+                iou_threshold,
+            ).numpy()
+        ]
+
+        pred = {
+            "scores": scores[keep],
+            "labels": labels[keep],
+            "bboxes": BBoxArray(xyxy[keep]),
+        }
+        if self.masks is not None:
+            pred["masks"] = EncodedRLEs(
+                [
+                    _offset_erle(*self.masks[i], height=self.height, width=self.width)
+                    for i in keep
+                ]
+            )
+        return pred
+
+
+def _is_truncated(xyxy: np.ndarray, tile: _Tile, margin: float = 1) -> np.ndarray:
+    """Whether the boxes touch an edge of the tile that is not an edge of the image,
+    in which case the object might continue outside of the tile."""
+    tile_height, tile_width = tile.valid_size
+    return (
+        ((xyxy[:, 0] <= margin) & (tile.x > 0))
+        | ((xyxy[:, 1] <= margin) & (tile.y > 0))
+        | ((xyxy[:, 2] >= tile_width - margin) & (tile.x + tile_width < tile.width))
+        | ((xyxy[:, 3] >= tile_height - margin) & (tile.y + tile_height < tile.height))
+    )
+
+
+def _is_covered(
+    xyxy: np.ndarray,
+    labels: np.ndarray,
+    truncated: np.ndarray,
+    threshold: float,
+    chunk_size: int = 1024,
+) -> np.ndarray:
+    """Whether the truncated boxes have more than `threshold` of their area inside a
+    box of the same class that is not truncated."""
+    covered = np.zeros(len(xyxy), dtype=bool)
+    truncated_idxs = np.flatnonzero(truncated)
+    full_idxs = np.flatnonzero(~np.asarray(truncated, dtype=bool))
+    if len(truncated_idxs) == 0 or len(full_idxs) == 0:
+        return covered
+
+    full = xyxy[full_idxs]
+    for i in range(0, len(truncated_idxs), chunk_size):
+        idxs = truncated_idxs[i : i + chunk_size]
+        boxes = xyxy[idxs]
+        top_left = np.maximum(boxes[:, None, :2], full[None, :, :2])
+        bottom_right = np.minimum(boxes[:, None, 2:], full[None, :, 2:])
+        inter = np.prod((bottom_right - top_left).clip(0), axis=-1)
+        area = np.prod(boxes[:, 2:] - boxes[:, :2], axis=-1)
+        same_class = labels[idxs][:, None] == labels[full_idxs][None]
+        covered[idxs] = ((inter / area[:, None] > threshold) & same_class).any(1)
+    return covered
+
+
+def _pred_xyxy(bboxes: Union[BBoxArray, Sequence[BBox]]) -> np.ndarray:
+    if isinstance(bboxes, BBoxArray):
+        return np.array(bboxes.xyxy, dtype=np.float64)
+    return np.array([bbox.xyxy for bbox in bboxes], dtype=np.float64).reshape(-1, 4)
+
+
+def _offset_erle(mask: np.ndarray, x: int, y: int, height: int, width: int) -> dict:
+    """Encoded RLE of `mask` pasted at `(x, y)` on an empty `height` x `width`
+    image, without creating the mask of the full image."""
+    # index of the pixels of the mask in the image flattened in column-major order
+    cols, rows = np.nonzero(mask.T)
+    idxs = (cols.astype(np.int64) + x) * height + rows + y
+    if len(idxs) == 0:
+        counts = [height * width]
+    else:
+        # runs of consecutive pixels, counts alternate between 0s and 1s
+        breaks = np.flatnonzero(np.diff(idxs) != 1) + 1
+        starts = idxs[np.r_[0, breaks]]
+        ends = idxs[np.r_[breaks - 1, len(idxs) - 1]] + 1
+        counts = np.empty(2 * len(starts) + 1, dtype=np.int64)
+        counts[0::2] = np.r_[
+            starts[0], starts[1:] - ends[:-1], height * width - ends[-1]
+        ]
+        counts[1::2] = ends - starts
+        counts = counts.tolist()
+    return mask_utils.frPyObjects(
+        {"counts": counts, "size": [height, width]}, height, width
+    )
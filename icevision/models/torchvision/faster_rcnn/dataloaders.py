@@ -77,7 +77,7 @@ def _build_train_sample(
 ) -> Tuple[torch.Tensor, Dict[str, torch.Tensor]]:
     assert len(record["labels"]) == len(record["bboxes"])
 
-    image = im2tensor(record["img"])
+    image = _im2tensor(record["img"])
     target = {}
 
     # If no labels and bboxes are present, use as negative samples as described in
@@ -173,7 +173,6 @@ def build_infer_batch(dataset: Sequence[RecordType], batch_tfms=None):
     """
     samples = common_build_batch(dataset, batch_tfms=batch_tfms)
 
-    tensor_imgs = [im2tensor(sample["img"]) for sample in samples]
-    tensor_imgs = torch.stack(tensor_imgs)
+    tensor_imgs = _stack_imgs([sample["img"] for sample in samples])
 
     return (tensor_imgs,), samples
@@ -1,6 +1,10 @@
 __all__ = [
     "predict",
     "predict_dl",
+    "predict_from_dl",
+    "predict_tiled",
+    "predict_tta",
+    "quantize",
     "convert_raw_prediction",
     "convert_raw_predictions",
 ]
@@ -8,23 +12,40 @@ __all__ = [
 from icevision.imports import *
 from icevision.utils import *
 from icevision.core import *
-from icevision.models.utils import _predict_dl
+from icevision.models.utils import _predict_dl, _predict_from_dl
+from icevision.models.tta import _predict_tta
+from icevision.models import tta
+from icevision.models.tiling import _predict_tiled
+from icevision.models.quantization import _quantize
+from icevision.tfms import Transform
 from icevision.data import *
-from icevision.models.torchvision.faster_rcnn.dataloaders import infer_dl
+from icevision.models.torchvision.faster_rcnn.dataloaders import (
+    infer_dl,
+    build_infer_batch,
+)
 
 
 @torch.no_grad()
-def predict(
+def _forward(
     model: nn.Module,
     batch: Sequence[torch.Tensor],
-    detection_threshold: float = 0.5,
     device: Optional[torch.device] = None,
 ):
     model.eval()
     device = device or model_device(model)
     batch = [o.to(device) for o in batch]
 
-    raw_preds = model(*batch)
+    return model(*batch)
+
+
+@torch.no_grad()
+def predict(
+    model: nn.Module,
+    batch: Sequence[torch.Tensor],
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    raw_preds = _forward(model=model, batch=batch, device=device)
     return convert_raw_predictions(
         raw_preds=raw_preds, detection_threshold=detection_threshold
     )
@@ -45,7 +66,204 @@ def predict_dl(
     )
 
 
+def predict_from_dl(
+    model: nn.Module,
+    infer_dl: DataLoader,
+    show_pbar: bool = True,
+    keep_images: bool = False,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    """Same as `predict_dl`, but yields `(sample, pred)` pairs as the batches are
+    predicted instead of returning them all at the end.
+
+    # Arguments
+        keep_images: If `False`, the `img` array is removed from the samples.
+    """
+    return _predict_from_dl(
+        forward_fn=_forward,
+        convert_fn=convert_raw_predictions,
+        model=model,
+        infer_dl=infer_dl,
+        show_pbar=show_pbar,
+        keep_images=keep_images,
+        device=device,
+        detection_threshold=detection_threshold,
+    )
+
+
+@torch.no_grad()
+def predict_tta(
+    model: nn.Module,
+    batch: Sequence[torch.Tensor],
+    views: Optional[Sequence[tta.View]] = None,
+    fusion: str = "wbf",
+    iou_threshold: float = 0.55,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    """Test time augmentation, predicts the images of `batch` with several views
+    (e.g. flips and scales) and fuses the predictions of the views.
+
+    The views of the same size are predicted together, in a batch that many times
+    larger, instead of calling `predict` once per view. The scaled views
+    (`tta.Scale`) are predicted at their scale, so downscaled views cost less: if
+    the model keeps its internal resize (`remove_internal_transforms=False`), the
+    views are resized by the factor of the images instead of to `min_size`. The
+    boxes predicted on each view are mapped back to the images and the detections
+    of the views are fused (see `tta.fuse`).
+
+    # Arguments
+        model: The model used for the predictions.
+        batch: Same as `predict`.
+        views: The views, defaults to the images and their horizontal flips
+        (`[tta.Identity(), tta.HFlip()]`).
+        fusion: `wbf` (weighted boxes fusion) or `nms`.
+        iou_threshold: IoU above which detections of the same class are fused.
+        detection_threshold: Same as `predict`, applied to the fused detections.
+        device: Same as `predict`.
+
+    # Examples
+    ```python
+    views = [tta.Identity(), tta.HFlip(), tta.Scale(0.75)]
+    preds = faster_rcnn.predict_tta(model, batch, views=views)
+    ```
+    """
+    return _predict_tta(
+        forward_fn=_forward,
+        convert_fn=convert_raw_predictions,
+        rebuild_batch=_tta_batch,
+        model=model,
+        batch=batch,
+        views=views,
+        fusion=fusion,
+        iou_threshold=iou_threshold,
+        device=device,
+        resize_model=_tta_resize,
+        detection_threshold=detection_threshold,
+    )
+
+
+def _tta_batch(batch: Sequence[torch.Tensor], imgs: torch.Tensor):
+    return (imgs,)
+
+
+def _tta_resize(
+    model: nn.Module, padded_size: Tuple[int, int], size: Tuple[int, int]
+) -> nn.Module:
+    """`GeneralizedRCNNTransform` resizes each input to `min_size`, which would
+    undo `tta.Scale`. Returns a shallow copy of `model` that resizes the padded
+    views by the factor of the images of `size` instead. `model` is not modified,
+    so it can be used by other threads at the same time."""
+    transform = copy(model.transform)
+    min_size, max_size = transform.min_size, transform.max_size
+    scale = min(min_size[-1] / min(size), max_size / max(size))
+    transform.min_size = (scale * min(padded_size),)
+    transform.max_size = scale * max(padded_size)
+
+    resized = copy(model)
+    # the copy shares the submodules of `model`, but assigning the transform to
+    # the same `_modules` dict would replace it in `model` too
+    resized._modules = OrderedDict(model._modules)
+    resized.transform = transform
+    return resized
+
+
+def predict_tiled(
+    model: nn.Module,
+    images: Iterable[Union[str, Path, np.ndarray]],
+    tfm: Optional[Transform] = None,
+    tile_size: int = 1024,
+    overlap: int = 128,
+    batch_size: int = 8,
+    iou_threshold: float = 0.5,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+    show_pbar: bool = True,
+) -> Iterator[dict]:
+    """Predicts images too large to be predicted at once (e.g. aerial images) by
+    cutting them in overlapping tiles, yields the predictions of each image.
+
+    Tiles of consecutive images are batched together, the detections are moved to
+    the coordinates of the image and duplicates on the overlaps are removed with a
+    per class NMS. Only a batch of tiles is in memory at a time, images given as
+    `np.memmap` or `.npy` files are also only read tile by tile.
+
+    # Arguments
+        model: The model used for the predictions.
+        images: Filepaths or arrays (HWC) of the images.
+        tfm: Transform applied to each tile, e.g. `tfms.A.Adapter([tfms.A.Normalize()])`.
+        It should not resize the tiles, the boxes are mapped back assuming it does not.
+        tile_size: Height and width of the tiles, smaller images are padded.
+        overlap: Minimum overlap between tiles, should be larger than the objects so
+        each object is seen in full by at least one tile.
+        batch_size: Number of tiles predicted at a time.
+        iou_threshold: IoU above which detections of the same class are merged.
+        detection_threshold: Same as `predict`.
+        device: Same as `predict`.
+
+    # Returns
+        A generator of predictions, one per image in the order of `images`, with
+        boxes in the coordinates of the full image.
+    """
+    return _predict_tiled(
+        predict_fn=predict,
+        build_batch=build_infer_batch,
+        model=model,
+        images=images,
+        tfm=tfm,
+        tile_size=tile_size,
+        overlap=overlap,
+        batch_size=batch_size,
+        iou_threshold=iou_threshold,
+        show_pbar=show_pbar,
+        detection_threshold=detection_threshold,
+        device=device,
+    )
+
+
+def quantize(
+    model: nn.Module,
+    calib_dl: Optional[DataLoader] = None,
+    mode: str = "static",
+    backend: str = "fbgemm",
+    max_calib_batches: Optional[int] = None,
+    show_pbar: bool = True,
+) -> nn.Module:
+    """Quantized copy of the model for CPU inference, with int8 weights and
+    activations in the backbone (including the FPN) and int8 weights in the
+    `nn.Linear` of the heads. The quantized model is used like the original one,
+    with `predict`, `predict_dl`, etc. on the CPU. Requires torch >= 1.13.
+
+    # Arguments
+        model: The trained model, it is not modified.
+        calib_dl: Dataloader of calibration images (a few hundred training or
+        validation images), created with `infer_dl`, used to record the range of
+        the activations of the backbone.
+        mode: `static` also quantizes the backbone, `dynamic` only quantizes the
+        `nn.Linear` of the heads (retinanet has none) and needs no calibration.
+        backend: `fbgemm` (x86) or `qnnpack` (ARM). The global
+        `torch.backends.quantized.engine` is only set to it while quantizing, set
+        it before running the model if `backend` is not the default of the platform.
+        max_calib_batches: Maximum number of batches of `calib_dl` used.
+
+    # Returns
+        The quantized model, compare it with the original model with
+        `quantization_report`.
+    """
+    return _quantize(
+        predict_fn=predict,
+        model=model,
+        calib_dl=calib_dl,
+        mode=mode,
+        backend=backend,
+        max_calib_batches=max_calib_batches,
+        show_pbar=show_pbar,
+    )
+
+
 def convert_raw_predictions(raw_preds, detection_threshold: float):
+    raw_preds = _raw_preds_to_numpy(raw_preds, keys=["boxes", "scores", "labels"])
     return [
         convert_raw_prediction(
             raw_pred,
@@ -56,24 +274,39 @@ def convert_raw_predictions(raw_preds, detection_threshold: float):
 
 
 def convert_raw_prediction(raw_pred: dict, detection_threshold: float):
-    above_threshold = raw_pred["scores"] >= detection_threshold
-
-    labels = raw_pred["labels"][above_threshold]
-    labels = labels.detach().cpu().numpy()
-
-    scores = raw_pred["scores"][above_threshold]
-    scores = scores.detach().cpu().numpy()
+    """`raw_pred` values can be tensors or arrays already on the host."""
+    scores = _to_numpy(raw_pred["scores"])
+    above_threshold = scores >= detection_threshold
 
-    boxes = raw_pred["boxes"][above_threshold]
-    bboxes = []
-    for box_tensor in boxes:
-        xyxy = box_tensor.cpu().numpy()
-        bbox = BBox.from_xyxy(*xyxy)
-        bboxes.append(bbox)
+    labels = _to_numpy(raw_pred["labels"])[above_threshold]
+    boxes = _to_numpy(raw_pred["boxes"])[above_threshold]
 
     return {
         "labels": labels,
-        "scores": scores,
-        "bboxes": bboxes,
+        "scores": scores[above_threshold],
+        "bboxes": BBoxArray(boxes),
         "above_threshold": above_threshold,
     }
+
+
+def _to_numpy(values: Union[torch.Tensor, np.ndarray]) -> np.ndarray:
+    if isinstance(values, torch.Tensor):
+        return values.detach().cpu().numpy()
+    return values
+
+
+def _raw_preds_to_numpy(
+    raw_preds: List[Dict[str, torch.Tensor]], keys: List[str]
+) -> List[Dict[str, np.ndarray]]:
+    """Moves `keys` of the predictions of a batch to the host, with a single
+    device to host transfer per key instead of one per image (or per box)."""
+    if not raw_preds:
+        return []
+    sections = np.cumsum([len(raw_pred[keys[0]]) for raw_pred in raw_preds])[:-1]
+    outputs = [{**raw_pred} for raw_pred in raw_preds]
+    for key in keys:
+        values = torch.cat([raw_pred[key] for raw_pred in raw_preds])
+        values = values.detach().cpu().numpy()
+        for output, value in zip(outputs, np.split(values, sections)):
+            output[key] = value
+    return outputs
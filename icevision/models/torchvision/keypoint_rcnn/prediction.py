@@ -1,12 +1,26 @@
-__all__ = ["predict", "predict_dl", "convert_raw_prediction", "convert_raw_predictions"]
+__all__ = [
+    "predict",
+    "predict_dl",
+    "predict_from_dl",
+    "predict_tta",
+    "convert_raw_prediction",
+    "convert_raw_predictions",
+]
 
 from itertools import chain
 from icevision.imports import *
 from icevision.core import *
 from icevision.utils import *
-from icevision.models.utils import _predict_dl
+from icevision.models.utils import _predict_dl, _predict_from_dl
+from icevision.models.tta import _predict_tta
+from icevision.models import tta
 from icevision.models.torchvision.faster_rcnn.prediction import (
     convert_raw_prediction as faster_convert_raw_prediction,
+    _forward,
+    _tta_batch,
+    _tta_resize,
+    _raw_preds_to_numpy,
+    _to_numpy,
 )
 
 
@@ -17,11 +31,7 @@ def predict(
     detection_threshold: float = 0.5,
     device: Optional[torch.device] = None,
 ):
-    model.eval()
-    device = device or model_device(model)
-    batch = [o.to(device) for o in batch]
-
-    raw_preds = model(*batch)
+    raw_preds = _forward(model=model, batch=batch, device=device)
     return convert_raw_predictions(
         raw_preds=raw_preds, detection_threshold=detection_threshold
     )
@@ -42,7 +52,62 @@ def predict_dl(
     )
 
 
+def predict_from_dl(
+    model: nn.Module,
+    infer_dl: DataLoader,
+    show_pbar: bool = True,
+    keep_images: bool = False,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    """Same as `predict_dl`, but yields `(sample, pred)` pairs as the batches are
+    predicted instead of returning them all at the end.
+
+    # Arguments
+        keep_images: If `False`, the `img` array is removed from the samples.
+    """
+    return _predict_from_dl(
+        forward_fn=_forward,
+        convert_fn=convert_raw_predictions,
+        model=model,
+        infer_dl=infer_dl,
+        show_pbar=show_pbar,
+        keep_images=keep_images,
+        device=device,
+        detection_threshold=detection_threshold,
+    )
+
+
+@torch.no_grad()
+def predict_tta(
+    model: nn.Module,
+    batch: Sequence[torch.Tensor],
+    views: Optional[Sequence[tta.View]] = None,
+    fusion: str = "wbf",
+    iou_threshold: float = 0.55,
+    detection_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    """Same as `faster_rcnn.predict_tta`, the keypoints of the views are averaged.
+    Use `tta.HFlip(keypoints_flip_idxs)` so mirrored keypoints keep their meaning."""
+    return _predict_tta(
+        forward_fn=_forward,
+        convert_fn=convert_raw_predictions,
+        rebuild_batch=_tta_batch,
+        resize_model=_tta_resize,
+        model=model,
+        batch=batch,
+        views=views,
+        fusion=fusion,
+        iou_threshold=iou_threshold,
+        device=device,
+        detection_threshold=detection_threshold,
+    )
+
+
 def convert_raw_predictions(raw_preds, detection_threshold: float):
+    keys = ["boxes", "scores", "labels", "keypoints", "keypoints_scores"]
+    raw_preds = _raw_preds_to_numpy(raw_preds, keys=keys)
     return [
         convert_raw_prediction(
             raw_pred,
@@ -58,10 +123,9 @@ def convert_raw_prediction(raw_pred: dict, detection_threshold: float):
     )
 
     above_threshold = preds["above_threshold"]
-    kps = raw_pred["keypoints"][above_threshold]
+    kps = _to_numpy(raw_pred["keypoints"])[above_threshold]
     keypoints = []
     for k in kps:
-        k = k.cpu().numpy()
         k = list(chain.from_iterable(k))
         # `if sum(k) > 0` prevents empty `KeyPoints` objects to be instantiated.
         # E.g. `k = [0, 0, 0, 0, 0, 0]` is a flattened list of 2 points `(0, 0, 0)` and `(0, 0, 0)`. We don't want a `KeyPoints` object to be created on top of this list.
@@ -69,8 +133,6 @@ def convert_raw_prediction(raw_pred: dict, detection_threshold: float):
             keypoints.append(KeyPoints.from_xyv(k, None))
 
     preds["keypoints"] = keypoints
-    preds["keypoints_scores"] = (
-        raw_pred["keypoints_scores"][above_threshold].detach().cpu().numpy()
-    )
+    preds["keypoints_scores"] = _to_numpy(raw_pred["keypoints_scores"])[above_threshold]
 
     return preds
@@ -70,7 +70,10 @@ def _build_mask_train_sample(record: RecordType):
         height, width = record["img"].shape[:-1]
         target["masks"] = torch.zeros((0, height, width), dtype=torch.uint8)
     else:
-        target["masks"] = tensor(record["masks"].data, dtype=torch.uint8)
+        # lazy masks are only decoded here, at the final resolution
+        height, width = record["img"].shape[:-1]
+        masks = record["masks"].to_mask(h=height, w=width)
+        target["masks"] = tensor(masks.data, dtype=torch.uint8)
 
     return image, target
 
@@ -1,11 +1,31 @@
-__all__ = ["predict", "predict_dl", "convert_raw_prediction", "convert_raw_predictions"]
+__all__ = [
+    "predict",
+    "predict_dl",
+    "predict_from_dl",
+    "predict_tiled",
+    "predict_tta",
+    "quantize",
+    "convert_raw_prediction",
+    "convert_raw_predictions",
+]
 
 from icevision.imports import *
 from icevision.utils import *
 from icevision.core import *
-from icevision.models.utils import _predict_dl
+from icevision.models.utils import _predict_dl, _predict_from_dl
+from icevision.models.tta import _predict_tta
+from icevision.models import tta
+from icevision.models.tiling import _predict_tiled
+from icevision.models.quantization import _quantize
+from icevision.tfms import Transform
+from icevision.models.torchvision.mask_rcnn.dataloaders import build_infer_batch
 from icevision.models.torchvision.faster_rcnn.prediction import (
     convert_raw_prediction as faster_convert_raw_prediction,
+    _forward,
+    _tta_batch,
+    _tta_resize,
+    _raw_preds_to_numpy,
+    _to_numpy,
 )
 
 
@@ -17,11 +37,7 @@ def predict(
     mask_threshold: float = 0.5,
     device: Optional[torch.device] = None,
 ):
-    model.eval()
-    device = device or model_device(model)
-    batch = [o.to(device) for o in batch]
-
-    raw_preds = model(*batch)
+    raw_preds = _forward(model=model, batch=batch, device=device)
     return convert_raw_predictions(
         raw_preds=raw_preds,
         detection_threshold=detection_threshold,
@@ -41,18 +57,142 @@ def predict_dl(
     )
 
 
+def predict_from_dl(
+    model: nn.Module,
+    infer_dl: DataLoader,
+    show_pbar: bool = True,
+    keep_images: bool = False,
+    detection_threshold: float = 0.5,
+    mask_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    """Same as `predict_dl`, but yields `(sample, pred)` pairs as the batches are
+    predicted instead of returning them all at the end.
+
+    # Arguments
+        keep_images: If `False`, the `img` array is removed from the samples.
+    """
+    return _predict_from_dl(
+        forward_fn=_forward,
+        convert_fn=convert_raw_predictions,
+        model=model,
+        infer_dl=infer_dl,
+        show_pbar=show_pbar,
+        keep_images=keep_images,
+        device=device,
+        detection_threshold=detection_threshold,
+        mask_threshold=mask_threshold,
+    )
+
+
+@torch.no_grad()
+def predict_tta(
+    model: nn.Module,
+    batch: Sequence[torch.Tensor],
+    views: Optional[Sequence[tta.View]] = None,
+    fusion: str = "wbf",
+    iou_threshold: float = 0.55,
+    detection_threshold: float = 0.5,
+    mask_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+):
+    """Same as `faster_rcnn.predict_tta`, the mask probabilities of the views are
+    averaged before `mask_threshold` is applied."""
+    return _predict_tta(
+        forward_fn=_forward,
+        convert_fn=convert_raw_predictions,
+        rebuild_batch=_tta_batch,
+        resize_model=_tta_resize,
+        model=model,
+        batch=batch,
+        views=views,
+        fusion=fusion,
+        iou_threshold=iou_threshold,
+        device=device,
+        detection_threshold=detection_threshold,
+        mask_threshold=mask_threshold,
+    )
+
+
+def predict_tiled(
+    model: nn.Module,
+    images: Iterable[Union[str, Path, np.ndarray]],
+    tfm: Optional[Transform] = None,
+    tile_size: int = 1024,
+    overlap: int = 128,
+    batch_size: int = 8,
+    iou_threshold: float = 0.5,
+    detection_threshold: float = 0.5,
+    mask_threshold: float = 0.5,
+    device: Optional[torch.device] = None,
+    show_pbar: bool = True,
+) -> Iterator[dict]:
+    """Same as `faster_rcnn.predict_tiled`, the masks are stitched back as
+    `EncodedRLEs` of the full image, without creating its dense masks."""
+    return _predict_tiled(
+        predict_fn=predict,
+        build_batch=build_infer_batch,
+        model=model,
+        images=images,
+        tfm=tfm,
+        tile_size=tile_size,
+        overlap=overlap,
+        batch_size=batch_size,
+        iou_threshold=iou_threshold,
+        show_pbar=show_pbar,
+        detection_threshold=detection_threshold,
+        mask_threshold=mask_threshold,
+        device=device,
+    )
+
+
+def quantize(
+    model: nn.Module,
+    calib_dl: Optional[DataLoader] = None,
+    mode: str = "static",
+    backend: str = "fbgemm",
+    max_calib_batches: Optional[int] = None,
+    show_pbar: bool = True,
+) -> nn.Module:
+    """Same as `faster_rcnn.quantize`, the convolutions of the mask head are not
+    quantized."""
+    return _quantize(
+        predict_fn=predict,
+        model=model,
+        calib_dl=calib_dl,
+        mode=mode,
+        backend=backend,
+        max_calib_batches=max_calib_batches,
+        show_pbar=show_pbar,
+    )
+
+
 def convert_raw_predictions(
     raw_preds: List[dict], detection_threshold: float, mask_threshold: float
 ):
-    return [
-        convert_raw_prediction(
-            raw_pred=raw_pred,
-            detection_threshold=detection_threshold,
-            mask_threshold=mask_threshold,
+    raw_preds = _raw_preds_to_numpy(raw_preds, keys=["boxes", "scores", "labels"])
+    preds = [
+        faster_convert_raw_prediction(
+            raw_pred=raw_pred, detection_threshold=detection_threshold
         )
         for raw_pred in raw_preds
     ]
 
+    # only the masks above the threshold are moved to the host, all at once
+    if raw_preds:
+        masks = torch.cat(
+            [
+                raw_pred["masks"][torch.from_numpy(pred["above_threshold"])]
+                for raw_pred, pred in zip(raw_preds, preds)
+            ]
+        )
+        masks = (masks > mask_threshold).squeeze(1).cpu().numpy()
+        sections = np.cumsum([len(pred["labels"]) for pred in preds])[:-1]
+        for pred, pred_masks in zip(preds, np.split(masks, sections)):
+            pred["masks"] = MaskArray(pred_masks)
+
+    return preds
+
 
 def convert_raw_prediction(
     raw_pred: dict, detection_threshold: float, mask_threshold: float
@@ -61,9 +201,8 @@ def convert_raw_prediction(
         raw_pred=raw_pred, detection_threshold=detection_threshold
     )
 
-    above_threshold = preds["above_threshold"]
-    masks_probs = raw_pred["masks"][above_threshold]
-    masks_probs = masks_probs.detach().cpu().numpy()
+    above_threshold = torch.from_numpy(preds["above_threshold"])
+    masks_probs = _to_numpy(raw_pred["masks"][above_threshold])
     # convert probabilities to 0 or 1 based on mask_threshold
     masks = masks_probs > mask_threshold
     masks = MaskArray(masks.squeeze(1))
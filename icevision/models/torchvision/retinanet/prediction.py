@@ -1,3 +1,12 @@
-__all__ = ["predict", "predict_dl", "convert_raw_prediction", "convert_raw_predictions"]
+__all__ = [
+    "predict",
+    "predict_dl",
+    "predict_from_dl",
+    "predict_tiled",
+    "predict_tta",
+    "quantize",
+    "convert_raw_prediction",
+    "convert_raw_predictions",
+]
 
 from icevision.models.torchvision.faster_rcnn.prediction import *
@@ -0,0 +1,359 @@
+__all__ = [
+    "View",
+    "Identity",
+    "HFlip",
+    "VFlip",
+    "Scale",
+    "Compose",
+    "default_views",
+    "fuse",
+]
+
+from icevision.imports import *
+from icevision.utils import *
+from torchvision.ops import batched_nms, box_iou
+import torch.nn.functional as F
+
+# keys of the raw predictions of a detection, only the ones present are used
+_RAW_KEYS = ["boxes", "scores", "labels", "masks", "keypoints", "keypoints_scores"]
+
+
+class View(ABC):
+    """A view of the images, predicted together with the other views.
+
+    `apply` transforms a batch of images `(N, C, H, W)`, the `invert_*` methods
+    map the predictions on the view back to the original images of size `size`.
+    """
+
+    def output_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """Size of the view of an image of size `size`."""
+        return size
+
+    @abstractmethod
+    def apply(self, imgs: Tensor) -> Tensor:
+        """Creates the view of a batch of images."""
+
+    @abstractmethod
+    def invert_points(self, xy: Tensor, size: Tuple[int, int]) -> Tensor:
+        """Maps points `(..., 2)` on the view back to the image."""
+
+    @abstractmethod
+    def invert_masks(self, masks: Tensor, size: Tuple[int, int]) -> Tensor:
+        """Maps mask probabilities `(n, 1, h, w)` on the view back to the image."""
+
+    def invert_keypoints(self, keypoints: Tensor, size: Tuple[int, int]) -> Tensor:
+        """Maps keypoints `(n, K, 3)` on the view back to the image."""
+        xy = self.invert_points(keypoints[..., :2], size)
+        return torch.cat([xy, keypoints[..., 2:]], dim=-1)
+
+    def invert_boxes(self, boxes: Tensor, size: Tuple[int, int]) -> Tensor:
+        """Maps xyxy boxes `(n, 4)` on the view back to the image."""
+        corners = self.invert_points(boxes.reshape(-1, 2, 2), size)
+        return torch.cat([corners.min(1).values, corners.max(1).values], dim=1)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class Identity(View):
+    def apply(self, imgs):
+        return imgs
+
+    def invert_points(self, xy, size):
+        return xy
+
+    def invert_masks(self, masks, size):
+        return masks
+
+
+class _Flip(View):
+    # index of the flipped coordinate in xy and of the flipped dim of the images
+    _xy_idx, _img_dim, _size_idx = None, None, None
+
+    def __init__(self, keypoints_flip_idxs: Optional[Sequence[int]] = None):
+        self.keypoints_flip_idxs = keypoints_flip_idxs
+
+    def apply(self, imgs):
+        return imgs.flip(self._img_dim)
+
+    def invert_points(self, xy, size):
+        xy = xy.clone()
+        xy[..., self._xy_idx] = size[self._size_idx] - xy[..., self._xy_idx]
+        return xy
+
+    def invert_masks(self, masks, size):
+        return masks.flip(self._img_dim)
+
+    def invert_keypoints(self, keypoints, size):
+        keypoints = super().invert_keypoints(keypoints, size)
+        if self.keypoints_flip_idxs is not None:
+            keypoints = keypoints[:, list(self.keypoints_flip_idxs)]
+        return keypoints
+
+
+class HFlip(_Flip):
+    """Horizontal flip.
+
+    # Arguments
+        keypoints_flip_idxs: For each keypoint, the index of its mirrored keypoint
+        (e.g. the left eye for the right eye), so keypoints keep their meaning.
+    """
+
+    _xy_idx, _img_dim, _size_idx = 0, -1, 1
+
+
+class VFlip(_Flip):
+    """Vertical flip, see `HFlip`."""
+
+    _xy_idx, _img_dim, _size_idx = 1, -2, 0
+
+
+class Scale(View):
+    """Resizes the images by `factor`, e.g. to help with large objects with a
+    factor below 1. Views smaller than the images are cheaper to predict, except
+    for efficientdet, whose views are padded to the image size.
+
+    # Arguments
+        factor: Resize factor of the height and width.
+        mode: `torch.nn.functional.interpolate` mode used for the images.
+    """
+
+    def __init__(self, factor: float, mode: str = "bilinear"):
+        self.factor, self.mode = factor, mode
+
+    def output_size(self, size):
+        return tuple(max(1, round(s * self.factor)) for s in size)
+
+    def apply(self, imgs):
+        size = self.output_size(imgs.shape[-2:])
+        return F.interpolate(imgs, size=size, mode=self.mode, align_corners=False)
+
+    def invert_points(self, xy, size):
+        height, width = size
+        view_height, view_width = self.output_size(size)
+        return xy * xy.new_tensor([width / view_width, height / view_height])
+
+    def invert_masks(self, masks, size):
+        if len(masks) == 0:
+            return masks.new_zeros((0, masks.shape[1], *size))
+        return F.interpolate(masks, size=size, mode="bilinear", align_corners=False)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.factor})"
+
+
+class Compose(View):
+    """Applies `views` one after the other, e.g. `Compose([Scale(0.5), HFlip()])`."""
+
+    def __init__(self, views: Sequence[View]):
+        self.views = list(views)
+
+    def _sizes(self, size) -> List[Tuple[int, int]]:
+        """Input size of each view."""
+        sizes = [tuple(size)]
+        for view in self.views[:-1]:
+            sizes.append(view.output_size(sizes[-1]))
+        return sizes
+
+    def output_size(self, size):
+        return self.views[-1].output_size(self._sizes(size)[-1])
+
+    def apply(self, imgs):
+        for view in self.views:
+            imgs = view.apply(imgs)
+        return imgs
+
+    def _invert(self, method: str, x: Tensor, size) -> Tensor:
+        for view, view_size in zip(self.views[::-1], self._sizes(size)[::-1]):
+            x = getattr(view, method)(x, view_size)
+        return x
+
+    def invert_points(self, xy, size):
+        return self._invert("invert_points", xy, size)
+
+    def invert_masks(self, masks, size):
+        return self._invert("invert_masks", masks, size)
+
+    def invert_keypoints(self, keypoints, size):
+        return self._invert("invert_keypoints", keypoints, size)
+
+    def invert_boxes(self, boxes, size):
+        return self._invert("invert_boxes", boxes, size)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.views})"
+
+
+def default_views() -> List[View]:
+    return [Identity(), HFlip()]
+
+
+def fuse(
+    preds: List[Dict[str, Tensor]],
+    fusion: str = "wbf",
+    iou_threshold: float = 0.55,
+) -> Dict[str, Tensor]:
+    """Fuses the raw predictions (`boxes`, `scores`, `labels` and optionally
+    `masks`, `keypoints`, `keypoints_scores`) of the views of an image.
+
+    With `nms`, only the highest scoring detection of each group of overlapping
+    detections of the same class is kept. With `wbf` (weighted boxes fusion),
+    the detections are clustered around the ones kept by NMS, the boxes, masks and
+    keypoints of a cluster are averaged weighted by their scores and the score of
+    a cluster is its mean score scaled by the fraction of the views that found it.
+    Both are vectorized, the clusters are found with a single IoU matrix.
+    """
+    if fusion not in ["wbf", "nms"]:
+        raise ValueError(f"fusion should be 'wbf' or 'nms', got {fusion}")
+    keys = [key for key in _RAW_KEYS if key in preds[0]]
+    merged = {key: torch.cat([pred[key] for pred in preds]) for key in keys}
+    boxes, scores, labels = merged["boxes"], merged["scores"], merged["labels"]
+    keep = batched_nms(boxes.float(), scores.float(), labels, iou_threshold)
+    if fusion == "nms" or len(keep) == 0:
+        return {key: value[keep] for key, value in merged.items()}
+
+    # every box suppressed by NMS overlaps a kept box of its class, it joins the
+    # highest scoring one (NMS returns the kept boxes by decreasing score)
+    ious = box_iou(boxes.float(), boxes[keep].float())
+    matches = (ious > iou_threshold) & (labels[:, None] == labels[keep][None])
+    matches[keep, torch.arange(len(keep))] = True
+    clusters = matches.int().argmax(1)
+
+    def weighted_mean(values: Tensor) -> Tensor:
+        weights = scores.reshape(-1, *[1] * (values.dim() - 1)).to(values.dtype)
+        total = values.new_zeros((len(keep), *values.shape[1:]))
+        total.index_add_(0, clusters, values * weights)
+        weight = scores.new_zeros(len(keep)).index_add_(0, clusters, scores)
+        return total / weight.reshape(-1, *[1] * (values.dim() - 1)).to(values.dtype)
+
+    num_views = len(preds)
+    counts = torch.bincount(clusters, minlength=len(keep)).to(scores.dtype)
+    mean_scores = scores.new_zeros(len(keep)).index_add_(0, clusters, scores) / counts
+    fused = {
+        "boxes": weighted_mean(boxes),
+        "scores": mean_scores * counts.clamp(max=num_views) / num_views,
+        "labels": labels[keep],
+    }
+    for key in ["masks", "keypoints", "keypoints_scores"]:
+        if key in merged:
+            fused[key] = weighted_mean(merged[key].float())
+    return fused
+
+
+def _predict_tta(
+    forward_fn,
+    convert_fn,
+    rebuild_batch,
+    model: nn.Module,
+    batch: Sequence[Any],
+    views: Optional[Sequence[View]] = None,
+    fusion: str = "wbf",
+    iou_threshold: float = 0.55,
+    size_divisor: Optional[int] = 32,
+    device: Optional[torch.device] = None,
+    to_dicts=None,
+    resize_model=None,
+    **convert_kwargs,
+) -> List[dict]:
+    """Predicts the views of a batch in batches, inverts their geometry and fuses
+    them, then converts the fused raw predictions with `convert_fn`.
+
+    `rebuild_batch(batch, imgs)` creates the batch of the model with the images of
+    the views, `to_dicts` converts the raw predictions of the model to dicts of
+    tensors (like the predictions of the torchvision models).
+    `resize_model(model, padded_size, size)` returns the model used for the views
+    of each size, for models that resize their inputs, to keep the scale of the
+    views relative to the images. It should not modify `model`, which might be
+    used by other threads.
+
+    Views of the same size (once padded, bottom and right, to a multiple of
+    `size_divisor`) are concatenated in a single batch, so the model is called
+    once per size: e.g. once for `[Identity(), HFlip(), VFlip()]` and twice for
+    `[Identity(), HFlip(), Scale(0.5)]`. With `size_divisor=None` all the views
+    are padded to the size of the images, so they can not be larger (e.g. models
+    with fixed size anchors).
+    """
+    views = views or default_views()
+    # the views are created on the device of the model
+    imgs = batch[0].to(device or model_device(model))
+    num_imgs, _, height, width = imgs.shape
+    size = (height, width)
+
+    view_sizes = [view.output_size(size) for view in views]
+    groups = defaultdict(list)
+    for k, view_size in enumerate(view_sizes):
+        groups[_padded_size(view_size, size, size_divisor)].append(k)
+
+    view_preds = [None] * len(views)
+    for padded_size, idxs in groups.items():
+        group_imgs = _pad_views(imgs, [views[k] for k in idxs], padded_size)
+        size_model = (
+            resize_model(model, padded_size, size)
+            if resize_model is not None
+            else model
+        )
+        raw_preds = forward_fn(
+            model=size_model, batch=rebuild_batch(batch, group_imgs), device=device
+        )
+        raw_preds = to_dicts(raw_preds) if to_dicts is not None else raw_preds
+        for j, k in enumerate(idxs):
+            view_preds[k] = raw_preds[j * num_imgs : (j + 1) * num_imgs]
+
+    fused_preds = []
+    for i in range(num_imgs):
+        inverted = [
+            _invert(preds[i], view, view_size, size)
+            for preds, view, view_size in zip(view_preds, views, view_sizes)
+        ]
+        fused_preds.append(fuse(inverted, fusion=fusion, iou_threshold=iou_threshold))
+    return convert_fn(fused_preds, **convert_kwargs)
+
+
+def _padded_size(view_size, size, size_divisor: Optional[int]) -> Tuple[int, int]:
+    if size_divisor is None:
+        if view_size[0] > size[0] or view_size[1] > size[1]:
+            raise ValueError("Views can not be larger than the images for this model")
+        return tuple(size)
+    return tuple(math.ceil(s / size_divisor) * size_divisor for s in view_size)
+
+
+def _pad_views(imgs: Tensor, views: List[View], padded_size) -> Tensor:
+    """Batch of the views of `imgs`, one view after the other."""
+    num_imgs, channels = imgs.shape[:2]
+    # normalized images, 0 is the mean color, like the padding of the models
+    padded = imgs.new_zeros((len(views) * num_imgs, channels, *padded_size))
+    for j, view in enumerate(views):
+        view_imgs = view.apply(imgs)
+        view_height, view_width = view_imgs.shape[-2:]
+        padded[
+            j * num_imgs : (j + 1) * num_imgs, :, :view_height, :view_width
+        ] = view_imgs
+    return padded
+
+
+def _invert(raw_pred: dict, view: View, view_size, size) -> Dict[str, Tensor]:
+    """Maps the raw predictions of a view (on the padded batch) to the image."""
+    height, width = size
+    boxes = view.invert_boxes(raw_pred["boxes"], size)
+    boxes = torch.stack(
+        [
+            boxes[:, 0].clamp(0, width),
+            boxes[:, 1].clamp(0, height),
+            boxes[:, 2].clamp(0, width),
+            boxes[:, 3].clamp(0, height),
+        ],
+        dim=1,
+    )
+    inverted = {
+        "boxes": boxes,
+        "scores": raw_pred["scores"],
+        "labels": raw_pred["labels"],
+    }
+    if "masks" in raw_pred:
+        view_height, view_width = view_size
+        masks = raw_pred["masks"][..., :view_height, :view_width]
+        inverted["masks"] = view.invert_masks(masks, size)
+    if "keypoints" in raw_pred:
+        inverted["keypoints"] = view.invert_keypoints(raw_pred["keypoints"], size)
+        inverted["keypoints_scores"] = raw_pred["keypoints_scores"]
+    return inverted
@@ -3,14 +3,20 @@ __all__ = [
     "unfreeze",
     "freeze",
     "transform_dl",
+    "slim_record",
     "common_build_batch",
+    "_im2tensor",
+    "_stack_imgs",
     "_predict_dl",
+    "_predict_from_dl",
 ]
 
 from icevision.imports import *
 from icevision.utils import *
 from icevision.core import *
 from icevision.parsers import *
+from icevision.data import *
+from concurrent.futures import ThreadPoolExecutor
 
 BN_TYPES = (nn.BatchNorm1d, nn.BatchNorm2d, nn.BatchNorm3d)
 
@@ -51,11 +57,76 @@ def freeze(params):
         p.requires_grad = False
 
 
-def transform_dl(dataset, build_batch, batch_tfms=None, **dataloader_kwargs):
+def transform_dl(
+    dataset,
+    build_batch,
+    batch_tfms=None,
+    slim_records=False,
+    group_by_aspect_ratio=False,
+    **dataloader_kwargs,
+):
+    """A `DataLoader` that collates records with `build_batch`.
+
+    # Arguments
+        dataset: Any `Sequence` that returns records.
+        build_batch: Function that builds the model batch, returns `(batch, records)`.
+        batch_tfms: Transforms to be applied at the batch level.
+        slim_records: If True, the records returned with the batch only keep the
+        annotations (see `slim_record`). The images and dense masks are already in
+        the batch tensors, which the workers send through shared memory, so they
+        are not pickled a second time with the records.
+        group_by_aspect_ratio: If True, batches are sampled by an
+        `AspectRatioBatchSampler` built from `batch_size`, `shuffle` and `drop_last`,
+        so the images of a batch need less padding.
+        **dataloader_kwargs: Keyword arguments passed to the Pytorch `DataLoader`.
+    """
     collate_fn = partial(build_batch, batch_tfms=batch_tfms)
+    if slim_records:
+        collate_fn = partial(_slim_collate, collate_fn=collate_fn)
+    if group_by_aspect_ratio:
+        dataloader_kwargs["batch_sampler"] = AspectRatioBatchSampler(
+            dataset,
+            batch_size=dataloader_kwargs.pop("batch_size", 1),
+            shuffle=dataloader_kwargs.pop("shuffle", False),
+            drop_last=dataloader_kwargs.pop("drop_last", False),
+        )
     return DataLoader(dataset=dataset, collate_fn=collate_fn, **dataloader_kwargs)
 
 
+SLIM_RECORD_KEYS = (
+    "imageid",
+    "filepath",
+    "height",
+    "width",
+    "labels",
+    "bboxes",
+    "areas",
+    "iscrowds",
+    "keypoints",
+)
+
+
+def slim_record(record: dict) -> dict:
+    """Metadata and annotations of a transformed record, without the image.
+
+    Dense masks are RLE encoded, which is what the metrics need anyways.
+    """
+    if not isinstance(record, dict):
+        record = record.as_dict()
+    slim = {k: record[k] for k in SLIM_RECORD_KEYS if k in record}
+    if "masks" in record:
+        masks = record["masks"]
+        if isinstance(masks, MaskArray):
+            masks = masks.to_erles(h=record["height"], w=record["width"])
+        slim["masks"] = masks
+    return slim
+
+
+def _slim_collate(records, collate_fn):
+    batch, records = collate_fn(records)
+    return batch, [slim_record(record) for record in records]
+
+
 def common_build_batch(records: Sequence[RecordType], batch_tfms=None):
     if batch_tfms is not None:
         records = batch_tfms(records)
@@ -63,6 +134,31 @@ def common_build_batch(records: Sequence[RecordType], batch_tfms=None):
     return records
 
 
+def _im2tensor(img: Union[np.ndarray, torch.Tensor]) -> torch.Tensor:
+    """`im2tensor`, unless the image already is a CHW tensor (`ImgPadStackTensor`)."""
+    return img if isinstance(img, torch.Tensor) else im2tensor(img)
+
+
+def _stack_imgs(imgs: Sequence[Union[np.ndarray, torch.Tensor]]) -> torch.Tensor:
+    """Stacks the images in a `(N, C, H, W)` tensor. Images that are consecutive
+    views of a batch tensor (`ImgPadStackTensor`) are returned as that batch
+    instead of being copied again."""
+    imgs = [_im2tensor(img) for img in imgs]
+    first = imgs[0]
+    offset = first.numel() * first.element_size()
+    stacked = first.is_contiguous() and all(
+        img.shape == first.shape
+        and img.is_contiguous()
+        and img.data_ptr() == first.data_ptr() + i * offset
+        for i, img in enumerate(imgs)
+    )
+    if stacked:
+        return first.as_strided(
+            (len(imgs), *first.shape), (first.numel(), *first.stride())
+        )
+    return torch.stack(imgs)
+
+
 @torch.no_grad()
 def _predict_dl(
     predict_fn,
@@ -79,3 +175,36 @@ def _predict_dl(
         all_preds.extend(preds)
 
     return all_samples, all_preds
+
+
+def _predict_from_dl(
+    forward_fn,
+    convert_fn,
+    model: nn.Module,
+    infer_dl: DataLoader,
+    show_pbar: bool = True,
+    keep_images: bool = False,
+    device: Optional[torch.device] = None,
+    **convert_kwargs,
+) -> Iterator[Tuple[dict, dict]]:
+    """Yields `(sample, pred)` pairs as the batches of `infer_dl` are predicted.
+
+    The raw predictions of a batch are converted by `convert_fn` in a background
+    thread while the next batch is moved to the device and forwarded through the
+    model by `forward_fn`. At most two batches are kept at a time, so memory does
+    not grow with the size of the dataset.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = None
+        for batch, samples in pbar(infer_dl, show=show_pbar):
+            raw_preds = forward_fn(model=model, batch=batch, device=device)
+            if not keep_images:
+                samples = [{k: v for k, v in o.items() if k != "img"} for o in samples]
+            future = executor.submit(convert_fn, raw_preds, **convert_kwargs)
+
+            if pending is not None:
+                yield from zip(pending[0], pending[1].result())
+            pending = samples, future
+
+        if pending is not None:
+            yield from zip(pending[0], pending[1].result())
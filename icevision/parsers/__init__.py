@@ -1,4 +1,5 @@
 from icevision.parsers.mixins import *
+from icevision.parsers.records_cache import *
 from icevision.parsers.parser import *
 from icevision.parsers.defaults import *
 
@@ -26,14 +26,31 @@ def coco(
 class COCOBaseParser(
     Parser, FilepathMixin, SizeMixin, LabelsMixin, AreasMixin, IsCrowdsMixin
 ):
+    """Base parser for COCO style annotations.
+
+    Annotations of the same image share its file checks, which are memoized
+    per image. The image size is read from the `images` section of the
+    annotations when available, otherwise from the image file.
+
+    # Arguments
+        annotations_filepath: Path to the COCO json annotations file.
+        img_dir: Directory containing the images.
+        idmap: Maps from COCO image ids to unique ids.
+        memo_size: Maximum number of images for which file checks are memoized.
+    """
+
     def __init__(
         self,
         annotations_filepath: Union[str, Path],
         img_dir: Union[str, Path],
         idmap: Optional[IDMap] = None,
+        memo_size: int = 4096,
     ):
-        self.annotations_dict = json.loads(Path(annotations_filepath).read_bytes())
+        self.annotations_filepath = Path(annotations_filepath)
+        self.annotations_dict = json.loads(self.annotations_filepath.read_bytes())
         self.img_dir = Path(img_dir)
+        self.memo_size = memo_size
+        self._imageid2memo = OrderedDict()
 
         self._imageid2info = {o["id"]: o for o in self.annotations_dict["images"]}
 
@@ -50,8 +67,23 @@ class COCOBaseParser(
     def __len__(self):
         return len(self.annotations_dict["annotations"])
 
+    def source_files(self) -> List[Path]:
+        return [self.annotations_filepath]
+
     def prepare(self, o):
         self._info = self._imageid2info[o["image_id"]]
+        self._memo = self._image_memo(o["image_id"])
+
+    def _image_memo(self, image_id: int) -> dict:
+        """Returns the memo of `image_id`, evicting the least recently used one."""
+        try:
+            self._imageid2memo.move_to_end(image_id)
+            return self._imageid2memo[image_id]
+        except KeyError:
+            memo = self._imageid2memo[image_id] = {}
+            if len(self._imageid2memo) > self.memo_size:
+                self._imageid2memo.popitem(last=False)
+            return memo
 
     def imageid(self, o) -> int:
         return o["image_id"]
@@ -59,8 +91,22 @@ class COCOBaseParser(
     def filepath(self, o) -> Path:
         return self.img_dir / self._info["file_name"]
 
+    def _filepath_exists(self, o, filepath: Path) -> bool:
+        try:
+            return self._memo["exists"]
+        except KeyError:
+            exists = self._memo["exists"] = filepath.exists()
+            return exists
+
     def image_width_height(self, o) -> Tuple[int, int]:
-        return get_image_size(self.filepath(o))
+        if "width" in self._info and "height" in self._info:
+            return self._info["width"], self._info["height"]
+
+        try:
+            return self._memo["size"]
+        except KeyError:
+            size = self._memo["size"] = get_image_size(self.filepath(o))
+            return size
 
     def labels(self, o) -> List[Hashable]:
         return [self._cocoid2name[o["category_id"]]]
@@ -66,7 +66,7 @@ class FilepathMixin(ParserMixin):
     def parse_fields(self, o, record):
         filepath = Path(self.filepath(o))
 
-        if not filepath.exists():
+        if not self._filepath_exists(o, filepath):
             raise AbortParseRecord(f"File '{filepath}' does not exist")
 
         record.set_filepath(filepath)
@@ -76,6 +76,10 @@ class FilepathMixin(ParserMixin):
     def filepath(self, o) -> Union[str, Path]:
         pass
 
+    def _filepath_exists(self, o, filepath: Path) -> bool:
+        """Override to avoid checking the same file multiple times."""
+        return filepath.exists()
+
     @classmethod
     def _templates(cls) -> List[str]:
         return ["def filepath(self, o) -> Union[str, Path]:"] + super()._templates()
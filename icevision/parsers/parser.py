@@ -5,6 +5,8 @@ from icevision.utils import *
 from icevision.core import *
 from icevision.data import *
 from icevision.parsers.mixins import *
+from icevision.parsers.records_cache import *
+from concurrent.futures import ProcessPoolExecutor
 
 
 def camel_to_snake(name):
@@ -58,7 +60,24 @@ class Parser(ClassMapMixin, ImageidMixin, SizeMixin, ParserInterface, ABC):
     def record_class(self) -> BaseRecord:
         return create_mixed_record(self.record_mixins())
 
-    def parse_dicted(self, show_pbar: bool = True) -> Dict[int, RecordType]:
+    def source_files(self) -> List[Path]:
+        """Files the parsed records depend on, e.g. the annotations file.
+
+        Used for detecting when the records cache is outdated. If it is not
+        overridden the cache is instead checked against the content of the
+        parser attributes and of the samples returned by `__iter__`, which
+        requires iterating the data and misses changes to files only read
+        while parsing (e.g. in `prepare`).
+        """
+        return []
+
+    def parse_dicted(
+        self, show_pbar: bool = True, num_workers: int = 0
+    ) -> Dict[int, RecordType]:
+        if num_workers > 0:
+            return self._parse_dicted_parallel(
+                num_workers=num_workers, show_pbar=show_pbar
+            )
 
         Record = self.record_class()
         records = {}
@@ -89,11 +108,53 @@ class Parser(ClassMapMixin, ImageidMixin, SizeMixin, ParserInterface, ABC):
 
         return dict(records)
 
-    def _check_path(self, path: Union[str, Path] = None):
-        if path is None:
-            return False
-        if path is not None:
-            return Path(path).exists()
+    def _parse_dicted_parallel(
+        self, num_workers: int, show_pbar: bool = True
+    ) -> Dict[int, RecordType]:
+        """Parses contiguous shards of samples in a process pool.
+
+        Shards are merged in order, so `idmap` ids, `class_map` ids and the order
+        of the annotations are the same as when parsing serially.
+        """
+        # creates (and patches to `__main__`) the record class that workers pickle
+        self.record_class()
+
+        samples = list(self)
+        num_shards = num_workers * _SHARDS_PER_WORKER
+        shard_size = max(math.ceil(len(samples) / num_shards), 1)
+        shards = [
+            samples[i : i + shard_size] for i in range(0, len(samples), shard_size)
+        ]
+
+        records = {}
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_parse_worker,
+            initargs=(self,),
+        ) as executor:
+            results = executor.map(_parse_shard, shards)
+            for shard_records, class_names in pbar(results, show_pbar):
+                # labels were parsed with the worker copy of the class_map
+                label_ids = [self.class_map.get_by_name(name) for name in class_names]
+
+                for true_imageid, shard_record in shard_records.items():
+                    imageid = self.idmap[true_imageid]
+                    if shard_record is None:
+                        continue
+
+                    shard_record.set_imageid(imageid)
+                    shard_record.set_class_map(self.class_map)
+                    if isinstance(shard_record, LabelsRecordMixin):
+                        shard_record.labels = [
+                            label_ids[i] for i in shard_record.labels
+                        ]
+
+                    try:
+                        records[imageid].merge(shard_record)
+                    except KeyError:
+                        records[imageid] = shard_record
+
+        return records
 
     def parse(
         self,
@@ -101,48 +162,66 @@ class Parser(ClassMapMixin, ImageidMixin, SizeMixin, ParserInterface, ABC):
         autofix: bool = True,
         show_pbar: bool = True,
         cache_filepath: Union[str, Path] = None,
+        num_workers: int = 0,
     ) -> List[List[BaseRecord]]:
         """Loops through all data points parsing the required fields.
 
         # Arguments
             data_splitter: How to split the parsed data, defaults to a [0.8, 0.2] random split.
             show_pbar: Whether or not to show a progress bar while parsing the data.
-            cache_filepath: Path to save records in pickle format. Defaults to None, e.g.
-                            if the user does not specify a path, no saving nor loading happens.
+            cache_filepath: Directory where the parsed records are cached. If the cache
+                is valid for the current parser, annotation files, data splitter and
+                icevision version the records are loaded from it (lazily, memory-mapped),
+                otherwise they are parsed and the cache is (re)written. Defaults to None,
+                e.g. if the user does not specify a path, no saving nor loading happens.
+            num_workers: How many subprocesses to use for parsing. `0` means that the data
+                will be parsed in the main process. The parser needs to be picklable
+                for platforms that do not support `fork`.
 
         # Returns
-            A list of records for each split defined by `data_splitter`.
+            A list of records for each split defined by `data_splitter`. With
+            `cache_filepath` each split is a `RecordCollection` instead (whether the
+            records were parsed or loaded from the cache), its records are copies,
+            use `list(split)` if they need to be modified. Records that cannot be
+            stored in a `RecordCollection` (e.g. custom record mixins) are always
+            returned as lists and not cached.
         """
+        data_splitter = data_splitter or RandomSplitter([0.8, 0.2])
 
-        # Hack to define the class of the mixed_record in the local namespace. This is required for pickeling.
-        Record = self.record_class()
-
-        if self._check_path(cache_filepath):
-            logger.info(
-                f"Loading cached records from {cache_filepath}",
+        if cache_filepath is not None:
+            cache = RecordsCache(cache_filepath)
+            fingerprint = cache.fingerprint(
+                parser=self, data_splitter=data_splitter, autofix=autofix
             )
-            return pickle.load(open(Path(cache_filepath), "rb"))
-        else:
-            data_splitter = data_splitter or RandomSplitter([0.8, 0.2])
-            records = self.parse_dicted(show_pbar=show_pbar)
+            if fingerprint is not None:
+                cached_splits = cache.load(parser=self, fingerprint=fingerprint)
+                if cached_splits is not None:
+                    return cached_splits
 
-            splits = data_splitter(idmap=self.idmap)
-            all_splits_records = []
-            if autofix:
-                logger.opt(colors=True).info("<blue><bold>Autofixing records</></>")
-            for ids in splits:
-                split_records = [records[i] for i in ids if i in records]
+        records = self.parse_dicted(show_pbar=show_pbar, num_workers=num_workers)
+
+        splits = data_splitter(idmap=self.idmap)
+        all_splits_records = []
+        if autofix:
+            logger.opt(colors=True).info("<blue><bold>Autofixing records</></>")
+        for ids in splits:
+            split_records = [records[i] for i in ids if i in records]
 
-                if autofix:
-                    split_records = autofix_records(split_records)
+            if autofix:
+                split_records = autofix_records(split_records)
 
-                all_splits_records.append(split_records)
+            all_splits_records.append(split_records)
 
-            self.class_map.lock()
-            if cache_filepath is not None:
-                pickle.dump(all_splits_records, open(Path(cache_filepath), "wb"))
+        self.class_map.lock()
+        if cache_filepath is not None:
+            collections = cache.to_collections(parser=self, splits=all_splits_records)
+            if collections is not None:
+                if fingerprint is not None:
+                    cache.save(parser=self, fingerprint=fingerprint, splits=collections)
+                # same type as when the splits are loaded from the cache
+                all_splits_records = collections
 
-            return all_splits_records
+        return all_splits_records
 
     @classmethod
     def _templates(cls) -> List[str]:
@@ -153,3 +232,53 @@ class Parser(ClassMapMixin, ImageidMixin, SizeMixin, ParserInterface, ABC):
     def generate_template(cls):
         for template in cls._templates():
             print(f"{template}")
+
+
+# Each worker receives a few shards, so a slow shard does not stall the whole pool
+_SHARDS_PER_WORKER = 4
+_worker_parser = None
+
+
+def _init_parse_worker(parser: Parser):
+    global _worker_parser
+    _worker_parser = parser
+    # real ids are assigned by the main process when merging the shards
+    _worker_parser.idmap = IDMap()
+
+
+def _parse_shard(
+    samples: Sequence[Any],
+) -> Tuple[Dict[Hashable, Optional[BaseRecord]], List[Hashable]]:
+    """Parses `samples` with the worker parser.
+
+    # Returns
+        A tuple with two items. The first maps the original imageids, in order of
+        appearance, to the parsed records (`None` if the record was skipped). The
+        second are the class names of the worker `class_map`, in id order.
+    """
+    parser = _worker_parser
+    Record = parser.record_class()
+    records = {}
+
+    for sample in samples:
+        try:
+            parser.prepare(sample)
+            true_imageid = parser.imageid(sample)
+            record = records.setdefault(true_imageid, None)
+            if record is None:
+                record = Record()
+
+            parser.parse_fields(sample, record)
+            records[true_imageid] = record
+
+        except AbortParseRecord as e:
+            logger.warning(
+                "Record with imageid: {} was skipped because: {}",
+                true_imageid,
+                str(e),
+            )
+
+    class_map = parser.class_map
+    class_names = [class_map.get_by_id(i) for i in range(len(class_map))]
+
+    return records, class_names
@@ -0,0 +1,249 @@
+__all__ = ["RecordsCache"]
+
+from icevision.imports import *
+from icevision.utils import *
+from icevision.core import *
+from icevision.data import *
+import hashlib, importlib
+
+# Bump when the layout of the files written by `RecordsCache` changes
+CACHE_FORMAT_VERSION = 1
+
+
+class RecordsCache:
+    """On-disk cache for the records created by `Parser.parse`.
+
+    Each split is stored as the columns of a `RecordCollection` (one `.npy` file
+    per column), which do not depend on the dynamically created record class,
+    and is loaded memory-mapped. The cache is keyed by a fingerprint of everything the parsed
+    records depend on: the icevision version, the parser class and arguments,
+    the size and modification time of `Parser.source_files`, the initial state of
+    the `class_map` and `idmap`, the data splitter and the `autofix` flag.
+    Parsers without `source_files` (e.g. parsing in-memory data) are instead
+    fingerprinted by the content of their attributes and of the samples they
+    iterate over. A cache with a different fingerprint is ignored and overwritten.
+
+    # Arguments
+        path: Directory where the cache is stored.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+
+    @property
+    def meta_filepath(self) -> Path:
+        return self.path / "meta.json"
+
+    def fingerprint(
+        self, parser, data_splitter: DataSplitter, autofix: bool
+    ) -> Optional[str]:
+        """Computes the key of the records parsed by `parser`.
+
+        # Returns
+            The fingerprint or `None` if some of the inputs cannot be fingerprinted
+            (e.g. a lambda passed to the data splitter), in which case the records
+            should not be cached, a warning is logged.
+        """
+        from icevision import __version__
+
+        source_files = parser.source_files()
+        payload = {
+            "format_version": CACHE_FORMAT_VERSION,
+            "icevision_version": __version__,
+            "parser": _qualname(type(parser)),
+            "parser_args": _public_attributes(parser),
+            "record_mixins": [_qualname(o) for o in parser.record_mixins()],
+            "sources": [_file_signature(o) for o in source_files],
+            "class_map": _class_names(parser.class_map),
+            "class_map_locked": parser.class_map._lock,
+            "idmap": parser.idmap.get_names(),
+            "data_splitter": _qualname(type(data_splitter)),
+            "data_splitter_args": vars(data_splitter),
+            "autofix": autofix,
+        }
+        try:
+            if not source_files:
+                payload["data"] = _data_signature(parser)
+            dumped = json.dumps(payload, sort_keys=True, default=_json_default)
+        except TypeError as e:
+            logger.warning("Records will not be cached because: {}", str(e))
+            return None
+
+        return hashlib.sha1(dumped.encode()).hexdigest()
+
+    def load(self, parser, fingerprint: str) -> Optional[List[RecordCollection]]:
+        """Loads the cached splits if the cache is valid for `fingerprint`.
+
+        The `class_map` and `idmap` of `parser` are updated to the state they had
+        after parsing, as if the records were parsed again.
+
+        # Returns
+            The splits or `None` if there is no valid cache.
+        """
+        if not self.path.exists():
+            return None
+        if self.path.is_file():
+            logger.warning(
+                "Ignoring records cache in the old pickle format at {}, "
+                "it will be replaced",
+                self.path,
+            )
+            return None
+
+        try:
+            meta = json.loads(self.meta_filepath.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring invalid records cache at {}: {}", self.path, e)
+            return None
+
+        if meta.get("fingerprint") != fingerprint:
+            logger.info("Records cache at {} is outdated, parsing again", self.path)
+            return None
+
+        try:
+            splits_keypoints_metadata = [
+                lmap(_import_qualname, names) for names in meta["keypoints_metadata"]
+            ]
+        except (ImportError, AttributeError) as e:
+            logger.warning("Ignoring records cache at {}: {}", self.path, e)
+            return None
+
+        logger.info(f"Loading cached records from {self.path}")
+        for name in meta["class_map"]:
+            parser.class_map.get_by_name(name)
+        parser.class_map.lock()
+        for name in meta["idmap"]:
+            parser.idmap[name]
+
+        Record = parser.record_class()
+        splits = []
+        for i, keypoints_metadata in enumerate(splits_keypoints_metadata):
+            split_dir = self.path / f"split_{i}"
+            columns = {
+                filepath.stem: np.load(filepath, mmap_mode="r")
+                for filepath in split_dir.glob("*.npy")
+            }
+            records = RecordCollection(
+                record_class=Record,
+                columns=columns,
+                class_map=parser.class_map,
+                keypoints_metadata=keypoints_metadata,
+            )
+            splits.append(records)
+
+        return splits
+
+    def to_collections(
+        self, parser, splits: Sequence[Sequence[BaseRecord]]
+    ) -> Optional[List[RecordCollection]]:
+        """Converts the parsed `splits` to the format stored in the cache.
+
+        # Returns
+            A `RecordCollection` per split or `None` if the records have fields that
+            cannot be stored (e.g. custom record mixins), a warning is logged.
+        """
+        Record = parser.record_class()
+        try:
+            return [
+                RecordCollection.from_records(records, Record) for records in splits
+            ]
+        except UnsupportedRecordError as e:
+            logger.warning("Records will not be cached because: {}", str(e))
+            return None
+
+    def save(self, parser, fingerprint: str, splits: Sequence[RecordCollection]):
+        """Writes `splits` to the cache, replacing any previous content.
+
+        Imageids that cannot be stored (i.e. not strings or integers) are not
+        cached, a warning is logged instead.
+        """
+        idmap_names = parser.idmap.get_names()
+        if json.loads(json.dumps(idmap_names, default=str)) != idmap_names:
+            logger.warning(
+                "Records will not be cached because imageids must be strings or integers"
+            )
+            return
+
+        meta = {
+            "fingerprint": fingerprint,
+            "format_version": CACHE_FORMAT_VERSION,
+            "class_map": _class_names(parser.class_map),
+            "idmap": idmap_names,
+            "keypoints_metadata": [
+                lmap(_qualname, o.keypoints_metadata) for o in splits
+            ],
+        }
+
+        # write to a temporary directory first, so a failure never leaves a
+        # partially written cache behind
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        for i, collection in enumerate(splits):
+            split_dir = tmp_path / f"split_{i}"
+            split_dir.mkdir(parents=True)
+            for name, column in collection.columns.items():
+                np.save(split_dir / f"{name}.npy", column, allow_pickle=False)
+        (tmp_path / "meta.json").write_text(json.dumps(meta))
+
+        if self.path.is_file():
+            self.path.unlink()
+        elif self.path.exists():
+            shutil.rmtree(self.path)
+        tmp_path.rename(self.path)
+
+
+def _qualname(o) -> str:
+    return f"{o.__module__}.{o.__qualname__}"
+
+
+def _import_qualname(name: str):
+    module, _, qualname = name.rpartition(".")
+    return getattr(importlib.import_module(module), qualname)
+
+
+def _class_names(class_map: ClassMap) -> List[Hashable]:
+    return [class_map.get_by_id(i) for i in range(len(class_map))]
+
+
+def _public_attributes(o) -> Dict[str, Any]:
+    """Arguments that are usually passed to a parser constructor, e.g. `img_dir`."""
+    return {
+        k: v
+        for k, v in vars(o).items()
+        if not k.startswith("_") and isinstance(v, (str, Path, int, float, bool))
+    }
+
+
+def _data_signature(parser) -> str:
+    """Hash of the data of a parser that does not define `source_files`."""
+    attributes = {
+        k: v
+        for k, v in vars(parser).items()
+        if not k.startswith("_") and k not in ("class_map", "idmap")
+    }
+    key = hashlib.sha1()
+    try:
+        # pickle (unlike `repr`) never contains memory addresses and handles
+        # `DataFrame`s and arrays, the protocol is fixed to keep the hash stable
+        key.update(pickle.dumps(sorted(attributes.items()), protocol=4))
+        for sample in parser:
+            key.update(pickle.dumps(sample, protocol=4))
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise TypeError(f"{type(parser).__name__} data cannot be fingerprinted: {e}")
+    return key.hexdigest()
+
+
+def _file_signature(filepath: Union[str, Path]) -> Tuple[str, int, int]:
+    stat = Path(filepath).stat()
+    return str(filepath), stat.st_size, stat.st_mtime_ns
+
+
+def _json_default(o):
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, Path):
+        return str(o)
+    # `str` would fall back to reprs that differ between runs (memory addresses)
+    raise TypeError(f"{type(o).__name__} {o!r} cannot be fingerprinted")
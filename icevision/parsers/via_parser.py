@@ -42,7 +42,8 @@ class VIABaseParser(Parser, FilepathMixin, LabelsMixin):
         class_map: ClassMap,
         label_field: str = "label",
     ):
-        self.annotations_dict = json.loads(Path(annotations_filepath).read_bytes())
+        self.annotations_filepath = Path(annotations_filepath)
+        self.annotations_dict = json.loads(self.annotations_filepath.read_bytes())
         self.img_dir = Path(img_dir)
         self.label_field = label_field
         super().__init__(class_map=class_map)
@@ -53,6 +54,9 @@ class VIABaseParser(Parser, FilepathMixin, LabelsMixin):
     def __len__(self):
         return len(self.annotations_dict.values())
 
+    def source_files(self) -> List[Path]:
+        return [self.annotations_filepath]
+
     def imageid(self, o) -> Hashable:
         return o["filename"]
 
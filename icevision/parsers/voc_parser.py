@@ -53,6 +53,9 @@ class VocXmlParser(Parser, FilepathMixin, SizeMixin, LabelsMixin, BBoxesMixin):
     def __iter__(self):
         yield from self.annotation_files
 
+    def source_files(self) -> List[Path]:
+        return self.annotation_files
+
     def prepare(self, o):
         tree = ET.parse(str(o))
         self._root = tree.getroot()
@@ -128,6 +131,9 @@ class VocMaskParser(VocXmlParser, MasksMixin):
     def __iter__(self):
         yield from self._intersection
 
+    def source_files(self) -> List[Path]:
+        return [*super().source_files(), *self.mask_files]
+
     def imageid_mask(self, o) -> Hashable:
         """Should return the same as `imageid` from parent parser."""
         return str(Path(o).stem)
@@ -1,2 +1,3 @@
 from albumentations import *
 from icevision.tfms.albumentations.tfms import *
+from icevision.tfms.albumentations.resize_pad_normalize import *
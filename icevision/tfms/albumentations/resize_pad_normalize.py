@@ -0,0 +1,175 @@
+__all__ = ["ResizePadNormalize"]
+
+from itertools import chain
+from icevision.imports import *
+from icevision.core import *
+from icevision.tfms.transform import *
+from icevision.tfms.albumentations.tfms import (
+    _func_max_size,
+    _remove_outside_keypoints,
+)
+
+
+class ResizePadNormalize(Transform):
+    """Fast path for `Adapter([*resize_and_pad(size), A.Normalize()])`.
+
+    The image is resized with cv2, then normalized and converted to a CHW float32
+    tensor while being copied into the padded output, instead of allocating an
+    intermediate image for each step. Annotations (bboxes, masks, keypoints) are
+    transformed with the same geometry as the albumentations pipeline.
+
+    The output image is a CHW tensor, ready for the model dataloaders, so this
+    has to be the last transform.
+
+    # Arguments
+        size: If an `int`, the longest side of the image is resized to `size` and the
+        image is padded to a square. If a `tuple`, the image is resized to that
+        exact `(height, width)`.
+        pad_value: Pixel value of the padding, before normalization.
+        mean: Same as `A.Normalize`.
+        std: Same as `A.Normalize`.
+        max_pixel_value: Same as `A.Normalize`.
+        interpolation: cv2 interpolation used for the image, masks always use
+        nearest neighbours.
+        masks_chunk_size: Number of `EncodedRLEs` masks decoded at the same time.
+    """
+
+    def __init__(
+        self,
+        size: Union[int, Tuple[int, int]],
+        pad_value: Sequence[float] = (124, 116, 104),
+        mean: Sequence[float] = (0.485, 0.456, 0.406),
+        std: Sequence[float] = (0.229, 0.224, 0.225),
+        max_pixel_value: float = 255.0,
+        interpolation: int = cv2.INTER_LINEAR,
+        masks_chunk_size: int = 16,
+    ):
+        self.size = size
+        self.interpolation = interpolation
+        self.masks_chunk_size = masks_chunk_size
+        # (img - mean * max_pixel_value) / (std * max_pixel_value) == img * mul + add
+        mean, std = np.array(mean), np.array(std)
+        self._mul = torch.tensor(1 / (std * max_pixel_value), dtype=torch.float32)
+        self._add = torch.tensor(-mean / std, dtype=torch.float32)
+        pad_value = np.array(pad_value) / max_pixel_value
+        self._pad_value = torch.tensor((pad_value - mean) / std, dtype=torch.float32)
+        super().__init__(tfms=None)
+
+    def apply(
+        self,
+        img: np.ndarray,
+        labels=None,
+        bboxes: List[BBox] = None,
+        masks: MaskArray = None,
+        iscrowds: List[int] = None,
+        keypoints: List[KeyPoints] = None,
+        **kwargs
+    ):
+        height, width = img.shape[:2]
+        new_height, new_width = self._resized_size(height, width)
+        out_height, out_width = self._output_size(new_height, new_width)
+        pad_top = int((out_height - new_height) / 2.0)
+        pad_left = int((out_width - new_width) / 2.0)
+        scale_x, scale_y = new_width / width, new_height / height
+
+        out = {"img": self._img(img, new_height, new_width, pad_top, pad_left)}
+        out["height"], out["width"] = new_height, new_width
+
+        if bboxes is not None:
+            xyxy = np.array([bbox.xyxy for bbox in bboxes], dtype=np.float64)
+            xyxy = xyxy.reshape(-1, 4) * [scale_x, scale_y, scale_x, scale_y]
+            xyxy += [pad_left, pad_top, pad_left, pad_top]
+            out["bboxes"] = [BBox.from_xyxy(*o) for o in xyxy.tolist()]
+
+        if masks is not None:
+            out["masks"] = self._masks(
+                masks, (height, width), (new_height, new_width), (pad_top, pad_left)
+            )
+
+        if keypoints is not None:
+            if isinstance(self.size, int):
+                # same as `A.LongestMaxSize`, keypoints are scaled by the exact
+                # ratio instead of the ratio of the rounded sizes
+                scale_x = scale_y = self.size / max(height, width)
+            out["keypoints"] = [
+                self._keypoints(
+                    o, scale_x, scale_y, pad_left, pad_top, new_height, new_width
+                )
+                for o in keypoints
+            ]
+
+        return out
+
+    def _resized_size(self, height: int, width: int) -> Tuple[int, int]:
+        if isinstance(self.size, int):
+            return _func_max_size(height, width, self.size, max)
+        return tuple(self.size)
+
+    def _output_size(self, height: int, width: int) -> Tuple[int, int]:
+        min_height, min_width = (
+            (self.size, self.size) if isinstance(self.size, int) else self.size
+        )
+        return max(height, min_height), max(width, min_width)
+
+    def _img(self, img, new_height, new_width, pad_top, pad_left) -> torch.Tensor:
+        if img.shape[:2] != (new_height, new_width):
+            img = cv2.resize(
+                img, (new_width, new_height), interpolation=self.interpolation
+            )
+        out_height, out_width = self._output_size(new_height, new_width)
+        channels = img.shape[2]
+
+        tensor_img = torch.empty((channels, out_height, out_width), dtype=torch.float32)
+        # fill only the padding, the rest is overwritten by the image
+        pad_value = self._pad_value.reshape(-1, 1, 1).expand(channels, 1, 1)
+        bottom, right = pad_top + new_height, pad_left + new_width
+        tensor_img[:, :pad_top] = pad_value
+        tensor_img[:, bottom:] = pad_value
+        tensor_img[:, pad_top:bottom, :pad_left] = pad_value
+        tensor_img[:, pad_top:bottom, right:] = pad_value
+
+        src = torch.from_numpy(np.ascontiguousarray(img)).permute(2, 0, 1)
+        torch.addcmul(
+            self._add.reshape(-1, 1, 1),
+            src,
+            self._mul.reshape(-1, 1, 1),
+            out=tensor_img[:, pad_top:bottom, pad_left:right],
+        )
+        return tensor_img
+
+    def _masks(self, masks, size, new_size, pad) -> Union[MaskArray, EncodedRLEs]:
+        height, width = size
+        out_height, out_width = self._output_size(*new_size)
+
+        lazy_masks = isinstance(masks, EncodedRLEs)
+        if not lazy_masks:
+            return self._mask_array(masks, new_size, pad)
+
+        tfmed = EncodedRLEs()
+        for i in range(0, len(masks), self.masks_chunk_size):
+            chunk = EncodedRLEs(masks.erles[i : i + self.masks_chunk_size])
+            chunk = self._mask_array(chunk.to_mask(h=height, w=width), new_size, pad)
+            tfmed.append(chunk.to_erles(h=out_height, w=out_width))
+        return tfmed
+
+    def _mask_array(self, masks: MaskArray, new_size, pad) -> MaskArray:
+        new_height, new_width = new_size
+        pad_top, pad_left = pad
+        out_height, out_width = self._output_size(new_height, new_width)
+
+        data = np.zeros((len(masks.data), out_height, out_width), dtype=np.uint8)
+        for mask, out in zip(masks.data, data):
+            if mask.shape != (new_height, new_width):
+                mask = cv2.resize(
+                    mask, (new_width, new_height), interpolation=cv2.INTER_NEAREST
+                )
+            out[pad_top : pad_top + new_height, pad_left : pad_left + new_width] = mask
+        return MaskArray(data)
+
+    def _keypoints(
+        self, keypoints, scale_x, scale_y, pad_left, pad_top, height, width
+    ) -> KeyPoints:
+        xy = [(x * scale_x + pad_left, y * scale_y + pad_top) for x, y in keypoints.xy]
+        # same as `Adapter`, points outside the image are made invisible
+        xyv = _remove_outside_keypoints(xy, height, width, list(keypoints.visible))
+        return KeyPoints.from_xyv(list(chain.from_iterable(xyv)), keypoints.metadata)
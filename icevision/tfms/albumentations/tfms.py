@@ -1,6 +1,8 @@
 __all__ = ["Adapter", "aug_tfms", "resize_and_pad"]
 
 import albumentations as A
+import hashlib
+from albumentations.core.serialization import SERIALIZABLE_REGISTRY
 from itertools import chain
 from icevision.imports import *
 from icevision.core import *
@@ -83,12 +85,38 @@ def aug_tfms(
 class Adapter(Transform):
     """Adapter that enables the use of albumentations transforms.
 
+    Masks given as `EncodedRLEs` (see `Dataset(lazy_masks=True)`) are decoded a few
+    at a time, the transforms are replayed on them and they are encoded again at
+    the final resolution, so the dense masks of all objects never need to be in
+    memory at the same time.
+
+    With a `cache` (see `data.TfmsCache`), the output of the deterministic
+    transforms at the start of `tfms` (e.g. the presize of `aug_tfms`) is computed
+    once per record and reused, only the remaining transforms are applied every
+    time the record is transformed.
+
     # Arguments
         tfms: `Sequence` of albumentation transforms.
+        masks_chunk_size: Number of `EncodedRLEs` masks decoded at the same time.
+        cache: Cache of the output of the first `n_deterministic` transforms.
+        n_deterministic: Number of transforms at the start of `tfms` whose output is
+        cached. By default, the transforms are inspected and all the transforms up to
+        the first one that is random (or not known to be deterministic) are cached.
     """
 
-    def __init__(self, tfms: Sequence[A.BasicTransform]):
+    def __init__(
+        self,
+        tfms: Sequence[A.BasicTransform],
+        masks_chunk_size: int = 16,
+        cache: Optional["TfmsCache"] = None,
+        n_deterministic: Optional[int] = None,
+    ):
         self.tfms_list = tfms
+        self.masks_chunk_size = masks_chunk_size
+        self.cache = cache
+        if n_deterministic is None:
+            n_deterministic = _deterministic_prefix_len(tfms)
+        self.n_deterministic = n_deterministic
         self.bbox_params = A.BboxParams(format="pascal_voc", label_fields=["labels"])
         self.keypoint_params = A.KeypointParams(
             format="xy", remove_invisible=False, label_fields=["keypoints_labels"]
@@ -98,6 +126,27 @@ class Adapter(Transform):
                 tfms, bbox_params=self.bbox_params, keypoint_params=self.keypoint_params
             )
         )
+        # created on first use, see `replay_tfms`
+        self._replay_tfms = None
+
+        self._cached_tfms, self._random_tfms = None, None
+        if cache is not None and n_deterministic > 0:
+            self._cached_tfms = Adapter(tfms[:n_deterministic], masks_chunk_size)
+            if n_deterministic < len(tfms):
+                self._random_tfms = Adapter(tfms[n_deterministic:], masks_chunk_size)
+
+    @property
+    def replay_tfms(self) -> A.ReplayCompose:
+        """Same as `tfms`, but records the random parameters so they can be
+        replayed on `EncodedRLEs` masks."""
+        if self._replay_tfms is None:
+            # a copy, `ReplayCompose` modifies the transforms it is given
+            self._replay_tfms = A.ReplayCompose(
+                deepcopy(self.tfms_list),
+                bbox_params=self.bbox_params,
+                keypoint_params=self.keypoint_params,
+            )
+        return self._replay_tfms
 
     def apply(
         self,
@@ -107,13 +156,83 @@ class Adapter(Transform):
         masks: MaskArray = None,
         iscrowds: List[int] = None,
         keypoints: List[KeyPoints] = None,
-        **kwargs
+        **kwargs,
+    ):
+        annotations = dict(
+            labels=labels,
+            bboxes=bboxes,
+            masks=masks,
+            iscrowds=iscrowds,
+            keypoints=keypoints,
+        )
+        if self._cached_tfms is not None:
+            return self._apply_cached(img, annotations, kwargs)
+        return self._apply(img, **annotations)
+
+    def _apply_cached(self, img: np.ndarray, annotations: dict, kwargs: dict):
+        """Reads the output of the deterministic transforms from the cache (or
+        computes it) and applies the random transforms to it."""
+        key = self._cache_key(img, annotations, kwargs)
+        if key is None:
+            return self._apply(img, **annotations)
+        out = self.cache.get(key)
+        if out is None:
+            out = self._cached_tfms._apply(img, **annotations)
+            self.cache.put(key, out)
+        if self._random_tfms is None:
+            return out
+
+        data = {**annotations, **out}
+        random_out = self._random_tfms._apply(
+            **{k: v for k, v in data.items() if k not in ("height", "width")}
+        )
+        # without padding and resizing in the random transforms, the size without
+        # padding is the one of the deterministic transforms
+        random_tfms_list = self._random_tfms.tfms_list
+        if (
+            get_transform(random_tfms_list, "Pad") is None
+            and random_out["img"].shape == out["img"].shape
+        ):
+            random_out["height"], random_out["width"] = out["height"], out["width"]
+        return {**out, **random_out}
+
+    def _cache_key(
+        self, img: np.ndarray, annotations: dict, kwargs: dict
+    ) -> Optional[str]:
+        """Key of the output of the cached transforms, `None` if the source of
+        the image is unknown (no filepath and not transformed by a `Dataset`)."""
+        filepath, source = kwargs.get("filepath"), kwargs.get("source")
+        if filepath is not None:
+            # invalidates the cached outputs when the original file changes
+            stat = Path(filepath).stat()
+            source = f"{Path(filepath).absolute()}:{stat.st_size}:{stat.st_mtime_ns}"
+        elif source is not None:
+            # e.g. `Dataset.from_images`, the imageid is only unique in its dataset
+            source = f"{source}:{kwargs.get('imageid')}"
+        else:
+            return None
+
+        tfms = [repr(tfm) for tfm in self._cached_tfms.tfms_list]
+        key = hashlib.sha1(f"{img.shape}:{img.dtype}:{tfms}:{source}".encode())
+        _update_annotations_key(key, annotations)
+        return key.hexdigest()
+
+    def _apply(
+        self,
+        img: np.ndarray,
+        labels=None,
+        bboxes: List[BBox] = None,
+        masks: MaskArray = None,
+        iscrowds: List[int] = None,
+        keypoints: List[KeyPoints] = None,
     ):
         # Substitue labels with list of idxs, so we can also filter out iscrowds in case any bboxes are removed
         # TODO: Same should be done if a masks is completely removed from the image (if bboxes is not given)
         params = {"image": img}
         params["labels"] = list(range(len(labels))) if labels is not None else []
-        params["bboxes"] = [o.xyxy for o in bboxes] if bboxes is not None else []
+        if bboxes is not None:
+            # albumentations refuses bboxes without a bboxes processor
+            params["bboxes"] = [o.xyxy for o in bboxes]
 
         if keypoints is not None:
             flat_tfms_list_ = _flatten_tfms(self.tfms_list)
@@ -129,15 +248,17 @@ class Adapter(Transform):
             params["keypoints"] = k
             params["keypoints_labels"] = c
 
-        if masks is not None:
+        lazy_masks = isinstance(masks, EncodedRLEs)
+        if masks is not None and not lazy_masks:
             params["masks"] = list(masks.data)
 
+        tfms = self.replay_tfms if lazy_masks else self.tfms
         if bboxes is None:
-            self.tfms.processors.pop("bboxes", None)
+            tfms.processors.pop("bboxes", None)
         if keypoints is None:
-            self.tfms.processors.pop("keypoints", None)
+            tfms.processors.pop("keypoints", None)
 
-        d = self.tfms(**params)
+        d = tfms(**params)
 
         img_h, img_w = _get_size_without_padding(self.tfms_list, img, d["image"])
         # We use the values in d['labels'] to get what was removed by the transform
@@ -159,7 +280,10 @@ class Adapter(Transform):
             bb = [xyxy for xyxy in d["bboxes"]]
             out["bboxes"] = [BBox.from_xyxy(*xyxy) for xyxy in bb]
 
-        if masks is not None:
+        if lazy_masks:
+            erles = self._replay_on_erles(d["replay"], masks, img.shape[:2])
+            out["masks"] = EncodedRLEs(_filter_attribute(erles.erles, keep_mask))
+        elif masks is not None:
             keep_masks = _filter_attribute(d["masks"], keep_mask)
             out["masks"] = MaskArray(np.array(keep_masks))
 
@@ -188,6 +312,92 @@ class Adapter(Transform):
 
         return out
 
+    def _replay_on_erles(
+        self, replay: dict, masks: EncodedRLEs, size: Tuple[int, int]
+    ) -> EncodedRLEs:
+        """Applies the transforms recorded in `replay` to the masks, chunk by chunk."""
+        height, width = size
+        replay = _skip_image_only_tfms(replay)
+        # the image is only needed for its size, the transforms left in `replay`
+        # never look at its content
+        dummy_img = np.zeros((height, width), dtype=np.uint8)
+        empty = {}
+        if "bboxes" in self.replay_tfms.processors:
+            empty.update(bboxes=[], labels=[])
+        if "keypoints" in self.replay_tfms.processors:
+            empty.update(keypoints=[], keypoints_labels=[])
+
+        tfmed = EncodedRLEs()
+        for i in range(0, len(masks), self.masks_chunk_size):
+            chunk = EncodedRLEs(masks.erles[i : i + self.masks_chunk_size])
+            d = A.ReplayCompose.replay(
+                replay,
+                image=dummy_img,
+                masks=list(chunk.to_mask(h=height, w=width).data),
+                **empty,
+            )
+            tfmed_height, tfmed_width = d["image"].shape[:2]
+            chunk = MaskArray(np.array(d["masks"]))
+            tfmed.append(chunk.to_erles(h=tfmed_height, w=tfmed_width))
+
+        return tfmed
+
+
+# transforms that always give the same output for the same input, if always applied
+_DETERMINISTIC_TFMS = (
+    A.Resize,
+    A.LongestMaxSize,
+    A.SmallestMaxSize,
+    A.PadIfNeeded,
+    A.CenterCrop,
+    A.Crop,
+    A.Normalize,
+    A.ToGray,
+    A.ToFloat,
+    A.FromFloat,
+)
+
+
+def _update_annotations_key(key, annotations: dict):
+    """Adds the annotations to the cache `key`."""
+    labels, bboxes = annotations["labels"], annotations["bboxes"]
+    key.update(repr(list(labels) if labels is not None else None).encode())
+    key.update(repr(annotations["iscrowds"]).encode())
+    if bboxes is not None:
+        key.update(np.array([bbox.xyxy for bbox in bboxes], dtype=np.float64).data)
+    for kpts in annotations["keypoints"] or []:
+        key.update(np.asarray(kpts.keypoints, dtype=np.float64).data)
+
+    masks = annotations["masks"]
+    if isinstance(masks, EncodedRLEs):
+        key.update(b"".join(erle["counts"] for erle in masks.erles))
+    elif masks is not None:
+        key.update(repr(masks.shape).encode())
+        key.update(np.ascontiguousarray(masks.data).data)
+
+
+def _skip_image_only_tfms(replay: dict) -> dict:
+    """Marks the image only transforms of `replay` as not applied."""
+    replay = dict(replay)
+    if "transforms" in replay:
+        replay["transforms"] = [_skip_image_only_tfms(o) for o in replay["transforms"]]
+    else:
+        tfm_class = SERIALIZABLE_REGISTRY.get(replay["__class_fullname__"])
+        if tfm_class is not None and issubclass(tfm_class, A.ImageOnlyTransform):
+            replay["applied"] = False
+    return replay
+
+
+def _deterministic_prefix_len(tfms_list) -> int:
+    """Number of deterministic transforms at the start of `tfms_list`."""
+    for i, tfm in enumerate(tfms_list):
+        is_deterministic = type(tfm) in _DETERMINISTIC_TFMS and (
+            tfm.always_apply or tfm.p >= 1
+        )
+        if not is_deterministic:
+            return i
+    return len(tfms_list)
+
 
 def _filter_attribute(v: list, keep_mask: Union[List[bool], None]):
     if keep_mask is None:
@@ -0,0 +1,95 @@
+__all__ = ["ImgPadStackTensor"]
+
+from icevision.imports import *
+from icevision.core import *
+from icevision.tfms.batch.batch_transform import BatchTransform
+
+
+class ImgPadStackTensor(BatchTransform):
+    """Pads the images of a batch to the same size and stacks them in a single
+    `(N, C, H, W)` tensor.
+
+    Each image is copied once into the batch tensor, converted (and normalized if
+    `mean` and `std` are given) in the same pass, only the padded area is filled
+    with `pad_value`. `record["img"]` becomes the CHW view of the batch tensor, the
+    `build_*_batch` functions use the batch tensor as is instead of converting and
+    stacking the images again.
+
+    With the defaults, images are converted the same way as `im2tensor`: uint8
+    images are scaled to `[0, 1]`, float images are kept as is.
+
+    # Arguments
+        pad_value: Value of the padded pixels in the output tensor, a single value
+        or one per channel.
+        mean: If given, the images are normalized by `(img - mean) / std`, after
+        uint8 images are scaled to `[0, 1]`.
+        std: See `mean`.
+        dtype: `torch.float32` or `torch.uint8` (only without normalization).
+        pin_memory: If True (and cuda is available), the batch tensor is allocated
+        in pinned memory, for faster (and `non_blocking`) copies to the GPU.
+        reuse_buffer: If True, the memory of the batch tensor is reused by the next
+        batches, so a batch is overwritten when the next one is built. Only use it
+        with `num_workers=0` and when batches are not kept around (e.g. training).
+    """
+
+    def __init__(
+        self,
+        pad_value: Union[float, Sequence[float]] = 0.0,
+        mean: Optional[Sequence[float]] = None,
+        std: Optional[Sequence[float]] = None,
+        dtype: torch.dtype = torch.float32,
+        pin_memory: bool = False,
+        reuse_buffer: bool = False,
+    ):
+        if dtype == torch.uint8 and (mean is not None or std is not None):
+            raise ValueError("mean and std can only be used with a float dtype")
+        self.pad_value = torch.tensor(pad_value, dtype=dtype).reshape(-1, 1, 1)
+        self.mean = np.zeros(1) if mean is None else np.array(mean)
+        self.std = np.ones(1) if std is None else np.array(std)
+        self.dtype = dtype
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.reuse_buffer = reuse_buffer
+        self._buffer = None
+
+    def apply(self, records: List[RecordType]) -> List[RecordType]:
+        imgs = [record["img"] for record in records]
+        height = max(img.shape[0] for img in imgs)
+        width = max(img.shape[1] for img in imgs)
+        channels = max(img.shape[2] for img in imgs)
+
+        batch = self._empty((len(imgs), channels, height, width))
+        pad_value = self.pad_value.expand(channels, 1, 1)
+        for img, out in zip(imgs, batch):
+            h, w, c = img.shape
+            # fill only the padding, the rest is overwritten by the image
+            out[:, h:].copy_(pad_value.expand(-1, height - h, width))
+            out[:, :h, w:].copy_(pad_value.expand(-1, h, width - w))
+            out[c:, :h, :w].copy_(pad_value[c:].expand(-1, h, w))
+            self._copy_img(img, out[:c, :h, :w])
+
+        for record, img in zip(records, batch):
+            record["img"] = img
+        return records
+
+    def _copy_img(self, img: np.ndarray, out: torch.Tensor):
+        src = torch.from_numpy(np.ascontiguousarray(img)).permute(2, 0, 1)
+        if self.dtype == torch.uint8:
+            out.copy_(src)
+            return
+
+        # (img * scale - mean) / std == img * scale / std - mean / std
+        scale = 1 / 255 if img.dtype == np.uint8 else 1
+        mul = torch.from_numpy(scale / self.std).to(self.dtype).reshape(-1, 1, 1)
+        add = torch.from_numpy(-self.mean / self.std).to(self.dtype).reshape(-1, 1, 1)
+        torch.addcmul(add, src, mul, out=out)
+
+    def _empty(self, shape: Tuple[int, ...]) -> torch.Tensor:
+        numel = int(np.prod(shape))
+        if not self.reuse_buffer:
+            return torch.empty(shape, dtype=self.dtype, pin_memory=self.pin_memory)
+
+        if self._buffer is None or self._buffer.numel() < numel:
+            self._buffer = torch.empty(
+                numel, dtype=self.dtype, pin_memory=self.pin_memory
+            )
+        return self._buffer[:numel].view(shape)
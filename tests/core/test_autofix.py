@@ -0,0 +1,85 @@
+import pytest
+from icevision.all import *
+
+
+@pytest.fixture
+def records(samples_source):
+    Record = create_mixed_record(
+        (FilepathRecordMixin, LabelsRecordMixin, BBoxesRecordMixin)
+    )
+    filepath = samples_source / "voc/JPEGImages/2007_000063.jpg"
+
+    def _record(imageid, labels, xyxys, filepath=filepath):
+        record = Record()
+        record.set_imageid(imageid)
+        record.set_filepath(filepath)
+        record.set_image_size(10, 10)
+        record.add_labels(labels)
+        record.add_bboxes([BBox.from_xyxy(*xyxy) for xyxy in xyxys])
+        return record
+
+    return [
+        _record(1, [1, 2], [(-1, 2, 4, 12), (1, 2, 3, 4)]),
+        _record(2, [1, 2, 3], [(1, 2, 3, 4), (11, 2, 14, 4), (1, 2, 1, 3)]),
+        _record(3, [1], [(1, 2, 3, 4)], filepath="none.jpg"),
+        _record(4, [1, 2], [(1, 2, 3, 4)]),
+        _record(5, [], []),
+    ]
+
+
+def test_autofix_records_report(records):
+    records, report = autofix_records(records, return_report=True)
+
+    assert [record.imageid for record in records] == [1, 2, 5]
+    assert records[0].bboxes == [
+        BBox.from_xyxy(0, 2, 4, 10),
+        BBox.from_xyxy(1, 2, 3, 4),
+    ]
+    assert records[1].labels == [1]
+    assert records[1].bboxes == [BBox.from_xyxy(1, 2, 3, 4)]
+
+    assert report.counts == {
+        "bbox_clip_xmin": 1,
+        "bbox_clip_ymax": 1,
+        "bbox_clip_xmax": 1,
+        "bbox_invalid": 2,
+        "removed_records": 2,
+    }
+    assert [o["imageid"] for o in report.removed_records] == [3, 4]
+    assert [(o["imageid"], o["index"]) for o in report.removed_annotations] == [
+        (2, 1),
+        (2, 2),
+    ]
+
+
+def test_autofix_record_collection(records):
+    collection = RecordCollection.from_records(records)
+    expected, expected_report = autofix_records(records, return_report=True)
+
+    fixed, report = autofix_records(collection, return_report=True)
+
+    assert isinstance(fixed, RecordCollection)
+    assert len(collection) == 5
+    assert fixed == expected
+    assert report.counts == expected_report.counts
+    assert report.removed_annotations == expected_report.removed_annotations
+
+
+def test_autofix_records_custom_mixin(records):
+    class PositiveLabelsRecordMixin(RecordMixin):
+        def _autofix(self) -> Dict[str, bool]:
+            success = [label > 1 for label in self.labels]
+            return {"positive_labels": success, **super()._autofix()}
+
+    Record = create_mixed_record(
+        (PositiveLabelsRecordMixin, LabelsRecordMixin, BBoxesRecordMixin)
+    )
+    record = Record()
+    record.set_imageid(1)
+    record.set_image_size(10, 10)
+    record.add_labels([1, 2])
+    record.add_bboxes([BBox.from_xyxy(1, 2, 3, 4), BBox.from_xyxy(1, 2, 3, 4)])
+
+    records = autofix_records([record])
+
+    assert records[0].labels == [2]
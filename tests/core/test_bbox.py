@@ -29,3 +29,33 @@ def test_bbox_autofix():
     bbox = BBox.from_xyxy(-1, 1, 4, 4)
     bbox.autofix(img_w=3, img_h=2)
     assert bbox.xyxy == (0, 1, 3, 2)
+
+
+def test_bbox_from_rle():
+    # decoded (4x4, column-major): ones at (1, 1), (2, 1), (1, 2), (2, 2)
+    rle = RLE.from_coco([5, 2, 2, 2, 5])
+    assert BBox.from_rle(rle, h=4, w=4).xyxy == (1, 1, 3, 3)
+
+    with pytest.raises(ValueError):
+        BBox.from_rle(rle, h=3, w=4)
+
+
+def test_bbox_from_kaggle_rle():
+    # the trailing run of 0s is omitted
+    rle = RLE.from_kaggle([6, 2, 10, 2])
+    assert BBox.from_rle(rle, h=4, w=4).xyxy == (1, 1, 3, 3)
+
+
+def test_bbox_array():
+    xyxy = np.array([[1, 2, 3, 4], [5, 6, 9, 10]], dtype=np.float32)
+    bboxes = BBoxArray(xyxy)
+
+    assert len(bboxes) == 2
+    assert bboxes[1].xyxy == (5, 6, 9, 10)
+    assert bboxes == [BBox.from_xyxy(1, 2, 3, 4), BBox.from_xyxy(5, 6, 9, 10)]
+    assert bboxes[1:] == BBoxArray(xyxy[1:])
+    assert bboxes[np.array([False, True])] == bboxes[1:]
+    np.testing.assert_equal(bboxes.xywh, [[1, 2, 2, 2], [5, 6, 4, 4]])
+    np.testing.assert_equal(bboxes.area, [4, 16])
+    assert BBoxArray.from_bboxes(list(bboxes)) == bboxes
+    assert len(BBoxArray(np.zeros((0, 4)))) == 0
@@ -49,6 +49,19 @@ def test_mask_array_to_coco_rle():
     assert mask.to_coco_rle(h=1, w=7) == [{"counts": [0, 6, 1], "size": (1, 7)}]
 
 
+def test_mask_array_to_coco_rle_matches_pycocotools():
+    data = np.random.RandomState(0).rand(3, 17, 13) > 0.5
+    data[1] = 0
+    data[2, 0, 0] = 1
+    masks = MaskArray(data)
+
+    rles = masks.to_coco_rle(h=17, w=13)
+    erles = mask_utils.frPyObjects(rles, 17, 13)
+
+    assert [sum(rle["counts"]) for rle in rles] == [17 * 13] * 3
+    np.testing.assert_equal(EncodedRLEs(erles).to_mask(17, 13).data, masks.data)
+
+
 def test_voc_mask_file(samples_source):
     mask_filepath = samples_source / "voc/SegmentationObject/2007_000063.png"
     mask = VocMaskFile(mask_filepath)
@@ -0,0 +1,100 @@
+import pytest
+from icevision.all import *
+
+
+@pytest.fixture
+def coco_mask_collection(coco_mask_records):
+    return RecordCollection.from_records(coco_mask_records)
+
+
+def test_record_collection(coco_mask_records, coco_mask_collection):
+    collection = coco_mask_collection
+    assert len(collection) == len(coco_mask_records)
+    assert collection.columns["bboxes"].dtype == np.float32
+    assert collection.columns["bboxes"].shape == (36, 4)
+    assert collection.columns["labels"].dtype == np.int32
+    assert collection.columns["masks_counts"].dtype == np.uint8
+
+    for record, expected in zip(collection, coco_mask_records):
+        assert type(record) == type(expected)
+        assert record.imageid == expected.imageid
+        assert record.filepath == expected.filepath
+        assert (record.width, record.height) == (expected.width, expected.height)
+        assert record.class_map is expected.class_map
+        assert record.labels == expected.labels
+        assert record.iscrowds == expected.iscrowds
+        assert record.masks == expected.masks
+        assert np.allclose(record.areas, expected.areas)
+        assert np.allclose(
+            [o.xyxy for o in record.bboxes], [o.xyxy for o in expected.bboxes]
+        )
+
+    assert collection[-1].imageid == coco_mask_records[-1].imageid
+    assert [o.imageid for o in collection[1:]] == [
+        o.imageid for o in coco_mask_records[1:]
+    ]
+    with pytest.raises(IndexError):
+        collection[len(collection)]
+
+
+def test_record_collection_dataset(coco_mask_records, coco_mask_collection):
+    expected = Dataset(coco_mask_records)[0]
+    sample = Dataset(coco_mask_collection)[0]
+
+    assert set(sample.keys()) == set(expected.keys())
+    assert np.all(sample["img"] == expected["img"])
+    assert np.all(sample["masks"].data == expected["masks"].data)
+    assert sample["labels"] == expected["labels"]
+
+
+def test_record_collection_pickle(coco_mask_collection):
+    collection = pickle.loads(pickle.dumps(coco_mask_collection))
+    assert collection == coco_mask_collection
+
+
+def test_record_collection_empty():
+    Record = create_mixed_record((BBoxesRecordMixin, LabelsRecordMixin))
+
+    with pytest.raises(ValueError):
+        RecordCollection.from_records([])
+
+    collection = RecordCollection.from_records([], record_class=Record)
+    assert len(collection) == 0
+    assert collection.columns["bboxes"].shape == (0, 4)
+
+
+def test_record_collection_unsupported():
+    Record = create_mixed_record((ImageRecordMixin,))
+    record = Record()
+    record.set_imageid(1)
+    record.set_img(np.zeros((4, 4, 3), dtype=np.uint8))
+
+    with pytest.raises(UnsupportedRecordError):
+        RecordCollection.from_records([record])
+
+
+def _assert_same_columns(collection, expected):
+    assert collection.columns.keys() == expected.columns.keys()
+    for name, column in expected.columns.items():
+        np.testing.assert_equal(collection.columns[name], column)
+
+
+def test_record_collection_add(coco_mask_records, coco_mask_collection):
+    first = RecordCollection.from_records(coco_mask_records[:2])
+    second = RecordCollection.from_records(coco_mask_records[2:])
+
+    collection = first + second
+    assert isinstance(collection, RecordCollection)
+    _assert_same_columns(collection, coco_mask_collection)
+
+    assert list(first) + second == collection
+    assert first + list(second) == collection
+
+
+def test_record_collection_add_keypoints(coco_keypoints_parser):
+    records = coco_keypoints_parser.parse(data_splitter=SingleSplitSplitter())[0]
+    first = RecordCollection.from_records(records[:1])
+    second = RecordCollection.from_records(records[1:])
+
+    expected = RecordCollection.from_records(records[1:] + records[:1])
+    _assert_same_columns(second + first, expected)
@@ -0,0 +1,71 @@
+import pytest
+from icevision.all import *
+
+
+@pytest.fixture
+def size_records():
+    Record = create_mixed_record((SizeRecordMixin,))
+    sizes = [(640, 480), (480, 640), (800, 400), (400, 800), (500, 500)] * 5
+    records = []
+    for i, (width, height) in enumerate(sizes):
+        record = Record()
+        record.set_imageid(i)
+        record.set_image_size(width=width, height=height)
+        records.append(record)
+    return records
+
+
+def _aspect_ratios(records, batch):
+    return {records[i].width / records[i].height for i in batch}
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_aspect_ratio_batch_sampler(size_records, shuffle):
+    batch_sampler = AspectRatioBatchSampler(size_records, batch_size=2, shuffle=shuffle)
+    batches = list(batch_sampler)
+
+    assert len(batches) == len(batch_sampler) == 13
+    assert sorted(i for batch in batches for i in batch) == list(range(25))
+    # each of the 5 groups has one leftover, batched together at the end
+    mixed = [batch for batch in batches if len(_aspect_ratios(size_records, batch)) > 1]
+    assert len(mixed) <= 2
+
+
+def test_aspect_ratio_batch_sampler_shuffle(size_records):
+    batch_sampler = AspectRatioBatchSampler(size_records, batch_size=2, shuffle=True)
+    torch.manual_seed(0)
+    epoch1 = list(batch_sampler)
+    epoch2 = list(batch_sampler)
+    torch.manual_seed(0)
+    assert list(batch_sampler) == epoch1
+    assert epoch1 != epoch2
+
+
+def test_aspect_ratio_batch_sampler_drop_last(size_records):
+    batch_sampler = AspectRatioBatchSampler(size_records, batch_size=4, drop_last=True)
+    batches = list(batch_sampler)
+
+    assert len(batches) == len(batch_sampler) == 6
+    assert all(len(batch) == 4 for batch in batches)
+
+
+def test_aspect_ratio_batch_sampler_size_bins(size_records):
+    collection = RecordCollection.from_records(size_records)
+    batch_sampler = AspectRatioBatchSampler(
+        collection, batch_size=2, aspect_ratio_bins=[], size_bins=[550]
+    )
+    np.testing.assert_equal(batch_sampler.group_ids, [1, 1, 1, 1, 0] * 5)
+
+
+def test_transform_dl_group_by_aspect_ratio(size_records):
+    dl = transform_dl(
+        size_records,
+        build_batch=lambda records, batch_tfms: (None, records),
+        group_by_aspect_ratio=True,
+        batch_size=5,
+        shuffle=True,
+    )
+
+    assert isinstance(dl.batch_sampler, AspectRatioBatchSampler)
+    for _, records in dl:
+        assert len({o.width / o.height for o in records}) == 1
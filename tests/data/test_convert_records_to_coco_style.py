@@ -104,3 +104,53 @@ def test_convert_record_to_coco_annotations_empty():
         "score",
         "segmentation",
     }
+
+
+def test_create_coco_eval_does_not_modify_records():
+    record = {
+        "imageid": 0,
+        "filepath": "none",
+        "height": 10,
+        "width": 10,
+        "labels": [1],
+        "bboxes": [BBox.from_xyxy(1, 2, 3, 5)],
+    }
+    pred = {"labels": [1], "bboxes": [BBox.from_xyxy(1, 2, 3, 4)], "scores": [0.5]}
+
+    create_coco_eval([record], [pred], "bbox")
+
+    assert set(record) == {"imageid", "filepath", "height", "width", "labels", "bboxes"}
+    assert set(pred) == {"labels", "bboxes", "scores"}
+
+
+def test_convert_preds_to_coco_style_arrays():
+    pred = {
+        "imageid": 3,
+        "filepath": "none",
+        "height": 10,
+        "width": 10,
+        "labels": [1, 2],
+        "bboxes": [BBox.from_xyxy(1, 2, 3, 5), BBox.from_xyxy(0, 0, 4, 4)],
+        "scores": [0.5, 0.9],
+    }
+    array_pred = {
+        **pred,
+        "labels": np.array([1, 2]),
+        "bboxes": np.array([[1, 2, 3, 5], [0, 0, 4, 4]]),
+        "scores": np.array([0.5, 0.9]),
+    }
+
+    coco_preds = convert_preds_to_coco_style([pred, array_pred])
+
+    annotations = coco_preds["annotations"]
+    assert annotations[0] == {
+        "image_id": 3,
+        "category_id": 1,
+        "bbox": [1, 2, 2, 3],
+        "area": 6,
+        "iscrowd": 0,
+        "score": 0.5,
+        "id": 1,
+    }
+    for annotation, array_annotation in zip(annotations[:2], annotations[2:]):
+        assert array_annotation == {**annotation, "id": annotation["id"] + 2}
@@ -0,0 +1,96 @@
+import pytest
+from icevision.all import *
+
+
+def _count_open_img(monkeypatch):
+    calls = []
+
+    def _open_img(filepath, gray=False):
+        calls.append(filepath)
+        return open_img(filepath, gray=gray)
+
+    monkeypatch.setattr("icevision.data.image_cache.open_img", _open_img)
+    return calls
+
+
+def test_image_cache_ram(coco_mask_records, monkeypatch):
+    calls = _count_open_img(monkeypatch)
+    img_cache = ImageCache()
+    dataset = Dataset(coco_mask_records, img_cache=img_cache)
+
+    expected = Dataset(coco_mask_records)[0]
+    samples = [dataset[0], dataset[0]]
+
+    assert len(calls) == 1
+    assert img_cache.info() == {
+        "images": 1,
+        "nbytes": expected["img"].nbytes,
+        "hits": 1,
+        "misses": 1,
+    }
+    for sample in samples:
+        assert np.all(sample["img"] == expected["img"])
+        assert sample["bboxes"] == expected["bboxes"]
+        assert np.all(sample["masks"].data == expected["masks"].data)
+
+    img_cache.clear()
+    assert img_cache.info()["images"] == 0
+
+
+def test_image_cache_eviction(coco_mask_records):
+    img = open_img(coco_mask_records[0].filepath)
+    img_cache = ImageCache(max_bytes=int(img.nbytes * 1.5))
+
+    img_cache.get(coco_mask_records[0].filepath)
+    img_cache.get(coco_mask_records[1].filepath)
+
+    info = img_cache.info()
+    assert info["images"] == 1
+    assert info["nbytes"] <= img_cache.max_bytes
+
+
+def test_image_cache_disk(coco_mask_records, tmpdir, monkeypatch):
+    calls = _count_open_img(monkeypatch)
+    record = coco_mask_records[0]
+
+    img_cache = ImageCache(max_bytes=0, cache_dir=tmpdir, max_size=200)
+    sample = img_cache.load(record)
+    assert len(list(Path(tmpdir).glob("*.npy"))) == 1
+
+    # a new cache, e.g. on a new run, reads the image from disk
+    img_cache = ImageCache(max_bytes=0, cache_dir=tmpdir, max_size=200)
+    cached_sample = img_cache.load(record)
+    assert len(calls) == 1
+
+    assert max(sample.img.shape) == 200
+    assert np.all(cached_sample.img == sample.img)
+    assert cached_sample.masks.shape == (len(record.masks), 150, 200)
+
+    scale = sample.width / record.width
+    expected_xyxy = np.array(record.bboxes[0].xyxy) * scale
+    assert np.allclose(cached_sample.bboxes[0].xyxy, expected_xyxy)
+
+
+def test_image_cache_dataloader_workers(coco_mask_records, tmpdir, monkeypatch):
+    # the workers are other processes, count the decoded images in a file
+    calls_filepath = Path(tmpdir) / "calls.txt"
+
+    def _open_img(filepath, gray=False):
+        with open(calls_filepath, "a") as f:
+            f.write(f"{filepath}\n")
+        return open_img(filepath, gray=gray)
+
+    monkeypatch.setattr("icevision.data.image_cache.open_img", _open_img)
+    img_cache = ImageCache()
+    dataset = Dataset(coco_mask_records, img_cache=img_cache)
+    dl = DataLoader(dataset, num_workers=2, collate_fn=lambda o: o)
+
+    # the images cached by the workers of the first epoch outlive them
+    for _ in range(2):
+        samples = [sample for batch in dl for sample in batch]
+        assert len(samples) == len(coco_mask_records)
+    assert len(calls_filepath.read_text().splitlines()) == len(coco_mask_records)
+
+    info = img_cache.info()
+    assert info["images"] == len(coco_mask_records)
+    assert info["misses"] == len(coco_mask_records)
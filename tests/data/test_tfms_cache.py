@@ -0,0 +1,99 @@
+import pytest
+from icevision.all import *
+
+
+def test_tfms_cache_disk(coco_mask_records, tmpdir):
+    tfms_list = [tfms.A.LongestMaxSize(200), tfms.A.HorizontalFlip(p=1.0)]
+    tfm = tfms.A.Adapter(tfms_list, cache=TfmsCache(max_bytes=0, cache_dir=tmpdir))
+    sample = Dataset(coco_mask_records, tfm)[0]
+    assert len(list(Path(tmpdir).glob("*.pkl"))) == 1
+
+    # a new cache, e.g. on a new run, reads the outputs from disk
+    tfms_cache = TfmsCache(cache_dir=tmpdir)
+    tfm = tfms.A.Adapter(tfms_list, cache=tfms_cache)
+    cached_tfm = tfm._cached_tfms
+    cached_tfm._apply = None
+    cached_sample = Dataset(coco_mask_records, tfm)[0]
+
+    assert tfms_cache.info()["images"] == 1
+    assert np.all(cached_sample["img"] == sample["img"])
+    assert cached_sample["bboxes"] == sample["bboxes"]
+    assert np.all(cached_sample["masks"].data == sample["masks"].data)
+
+
+def test_tfms_cache_eviction():
+    img = np.zeros((100, 100, 3), dtype=np.uint8)
+    tfms_cache = TfmsCache(max_bytes=int(img.nbytes * 1.5))
+
+    tfms_cache.put("a", {"img": img, "bboxes": [BBox.from_xyxy(1, 2, 3, 4)]})
+    tfms_cache.put("b", {"img": img + 1, "bboxes": []})
+
+    assert tfms_cache.get("a") is None
+    out = tfms_cache.get("b")
+    assert np.all(out["img"] == 1)
+    assert out["bboxes"] == []
+    info = tfms_cache.info()
+    assert info["images"] == 1
+    assert info["nbytes"] <= tfms_cache.max_bytes
+
+
+def test_tfms_cache_dataloader_workers(coco_mask_records, tmpdir):
+    tfms_cache = TfmsCache()
+    tfm = tfms.A.Adapter([tfms.A.LongestMaxSize(200)], cache=tfms_cache)
+    # the workers are other processes, count the transformed records in a file
+    calls_filepath = Path(tmpdir) / "calls.txt"
+    cached_apply = tfm._cached_tfms._apply
+
+    def _apply(img, **kwargs):
+        with open(calls_filepath, "a") as f:
+            f.write("apply\n")
+        return cached_apply(img, **kwargs)
+
+    tfm._cached_tfms._apply = _apply
+    dataset = Dataset(coco_mask_records, tfm)
+    dl = DataLoader(dataset, num_workers=2, collate_fn=lambda o: o)
+
+    # the outputs cached by the workers of the first epoch outlive them
+    for _ in range(2):
+        samples = [sample for batch in dl for sample in batch]
+        assert len(samples) == len(coco_mask_records)
+    assert len(calls_filepath.read_text().splitlines()) == len(coco_mask_records)
+    assert tfms_cache.info()["images"] == len(coco_mask_records)
+
+
+def test_tfms_cache_masks():
+    img = np.zeros((64, 64, 3), dtype=np.uint8)
+    masks = MaskArray(np.random.randint(0, 2, (20, 64, 64), dtype=np.uint8))
+    tfms_cache = TfmsCache()
+    tfms_cache.put("a", {"img": img, "masks": masks, "labels": [1] * 20})
+
+    out = tfms_cache.get("a")
+    assert isinstance(out["masks"], MaskArray)
+    np.testing.assert_equal(out["masks"].data, masks.data)
+    assert out["labels"] == [1] * 20
+    # the dense masks are in shared memory, not pickled in the index
+    *_, annotations = tfms_cache._index.get("a")
+    assert len(annotations) < 1000
+
+
+def test_tfms_cache_from_images(tmpdir):
+    # without filepaths the images have the same imageids and shapes
+    imgs = [np.full((100, 100, 3), i, dtype=np.uint8) for i in range(2)]
+    tfms_list = [tfms.A.LongestMaxSize(50)]
+    for i in range(2):
+        tfm = tfms.A.Adapter(tfms_list, cache=TfmsCache(cache_dir=tmpdir))
+        sample = Dataset.from_images(imgs[i : i + 1], tfm)[0]
+        assert np.all(sample["img"] == i)
+        assert "source" not in sample
+    assert len(list(Path(tmpdir).glob("*.pkl"))) == 2
+
+    tfms_cache = TfmsCache()
+    tfm = tfms.A.Adapter(tfms_list, cache=tfms_cache)
+    dataset = Dataset.from_images(imgs, tfm)
+    for _ in range(2):
+        assert [dataset[i]["img"][0, 0, 0] for i in range(2)] == [0, 1]
+    assert tfms_cache.info()["hits"] == 2
+
+    # outside of a `Dataset` the source of the image is unknown, not cached
+    tfm({"img": imgs[0], "imageid": 0})
+    assert tfms_cache.info()["images"] == 2
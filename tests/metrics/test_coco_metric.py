@@ -79,3 +79,169 @@ def test_coco_metric(records, preds, expected_coco_output):
         coco_metric.finalize()
 
     assert output == expected_coco_output
+
+
+def test_coco_metric_batches(records, preds, expected_coco_output):
+    coco_metric = COCOMetric(print_summary=True)
+    coco_metric.accumulate(records[:1], preds[:1])
+    coco_metric.accumulate(records[1:], preds[1:])
+
+    with CaptureStdout() as output:
+        coco_metric.finalize()
+
+    assert output == expected_coco_output
+
+
+@pytest.fixture()
+def random_records_preds():
+    Record = create_mixed_record(
+        (SizeRecordMixin, FilepathRecordMixin, LabelsRecordMixin, BBoxesRecordMixin)
+    )
+    rng = np.random.RandomState(42)
+
+    def random_xyxys(n):
+        xy = rng.uniform(0, 300, (n, 2))
+        wh = rng.uniform(2, 200, (n, 2))
+        return np.concatenate([xy, xy + wh], 1)
+
+    records, preds = [], []
+    for imageid in range(40):
+        n = rng.randint(0, 6)
+        xyxys = random_xyxys(n)
+
+        record = Record()
+        record.set_imageid(imageid)
+        record.set_filepath("none")
+        record.set_image_size(500, 500)
+        record.add_labels(rng.randint(1, 4, n).tolist())
+        record.add_bboxes([BBox.from_xyxy(*xyxy) for xyxy in xyxys])
+        records.append(record)
+
+        # jittered ground truth and random false positives, label 4 has no gt
+        m = rng.randint(0, 4)
+        pred_xyxys = np.concatenate(
+            [xyxys + rng.normal(0, 8, xyxys.shape), random_xyxys(m)]
+        )
+        pred_labels = [*record.labels, *rng.randint(1, 5, m).tolist()]
+        preds.append(
+            {
+                "labels": pred_labels,
+                "bboxes": [BBox.from_xyxy(*xyxy) for xyxy in pred_xyxys],
+                "scores": rng.uniform(0, 1, len(pred_labels)).tolist(),
+            }
+        )
+    return records, preds
+
+
+def test_streaming_coco_eval(random_records_preds):
+    records, preds = random_records_preds
+    coco_eval = create_coco_eval(records, deepcopy(preds), "bbox")
+    with CaptureStdout():
+        coco_eval.evaluate()
+        coco_eval.accumulate()
+        coco_eval.summarize()
+
+    streaming_eval = StreamingCOCOEval("bbox")
+    for i in range(0, len(records), 7):
+        streaming_eval.update(records[i : i + 7], deepcopy(preds[i : i + 7]))
+    streaming_coco_eval = streaming_eval.compute()
+    with CaptureStdout():
+        streaming_coco_eval.summarize()
+
+    for k in ["precision", "recall", "scores"]:
+        np.testing.assert_array_equal(streaming_coco_eval.eval[k], coco_eval.eval[k])
+    np.testing.assert_array_equal(streaming_coco_eval.stats, coco_eval.stats)
+
+
+def test_streaming_coco_eval_cached_targets(random_records_preds, monkeypatch):
+    records, preds = random_records_preds
+    streaming_eval = StreamingCOCOEval("bbox")
+
+    def run_epoch():
+        for i in range(0, len(records), 7):
+            streaming_eval.update(records[i : i + 7], deepcopy(preds[i : i + 7]))
+        coco_eval = streaming_eval.compute()
+        streaming_eval.reset()
+        return coco_eval
+
+    first_coco_eval = run_epoch()
+
+    def convert_records_to_coco_style(*args, **kwargs):
+        raise AssertionError("records should not be converted again")
+
+    module = sys.modules["icevision.metrics.coco_metric.streaming_coco_eval"]
+    monkeypatch.setattr(
+        module, "convert_records_to_coco_style", convert_records_to_coco_style
+    )
+    second_coco_eval = run_epoch()
+
+    np.testing.assert_array_equal(
+        second_coco_eval.eval["precision"], first_coco_eval.eval["precision"]
+    )
+
+
+def test_streaming_coco_eval_cached_targets_changed(random_records_preds):
+    records, preds = random_records_preds
+    records, preds = records[:5], preds[:5]
+    streaming_eval = StreamingCOCOEval("bbox")
+    streaming_eval.update(records, deepcopy(preds))
+    streaming_eval.reset()
+
+    # same imageids, e.g. after changing the size of the valid transforms
+    resized_records, resized_preds = [], deepcopy(preds)
+    for record, pred in zip(records, resized_preds):
+        record = deepcopy(record)
+        record.set_image_size(250, 250)
+        record.bboxes = [BBox.from_xyxy(*(np.array(o.xyxy) / 2)) for o in record.bboxes]
+        resized_records.append(record)
+        pred["bboxes"] = [
+            BBox.from_xyxy(*(np.array(o.xyxy) / 2)) for o in pred["bboxes"]
+        ]
+
+    streaming_eval.update(resized_records, deepcopy(resized_preds))
+    coco_eval = streaming_eval.compute()
+    expected_coco_eval = create_coco_eval(resized_records, resized_preds, "bbox")
+    with CaptureStdout():
+        expected_coco_eval.evaluate()
+        expected_coco_eval.accumulate()
+
+    np.testing.assert_array_equal(
+        coco_eval.eval["precision"], expected_coco_eval.eval["precision"]
+    )
+    # the changed records replaced the cached ones
+    assert len(streaming_eval._targets) == len(records)
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_parallel_coco_eval(random_records_preds, num_workers):
+    records, preds = random_records_preds
+    coco_eval = create_coco_eval(records, deepcopy(preds), "bbox")
+    parallel_coco_eval = create_coco_eval(
+        records, deepcopy(preds), "bbox", num_workers=num_workers
+    )
+
+    with CaptureStdout():
+        for o in [coco_eval, parallel_coco_eval]:
+            o.evaluate()
+            o.accumulate()
+            o.summarize()
+
+    for k in ["precision", "recall", "scores"]:
+        np.testing.assert_array_equal(parallel_coco_eval.eval[k], coco_eval.eval[k])
+    np.testing.assert_array_equal(parallel_coco_eval.stats, coco_eval.stats)
+
+
+def test_streaming_coco_eval_workers(random_records_preds):
+    records, preds = random_records_preds
+    coco_evals = []
+    for num_workers in [0, 2]:
+        streaming_eval = StreamingCOCOEval("bbox", num_workers=num_workers)
+        for i in range(0, len(records), 7):
+            streaming_eval.update(records[i : i + 7], deepcopy(preds[i : i + 7]))
+        coco_evals.append(streaming_eval.compute())
+        # the pool is shut down once the results are collected
+        assert streaming_eval._executor is None
+
+    np.testing.assert_array_equal(
+        coco_evals[1].eval["precision"], coco_evals[0].eval["precision"]
+    )
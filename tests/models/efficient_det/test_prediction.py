@@ -1,4 +1,5 @@
 from icevision.all import *
+from effdet import DetBenchPredict, unwrap_bench
 
 
 def _test_preds(preds):
@@ -51,3 +52,25 @@ def test_efficient_det_predict_dl_threshold(
     )
 
     assert len(preds[0]["labels"]) == 0
+
+
+def test_efficient_det_prepare_for_inference(fridge_efficientdet_records):
+    model = efficientdet.model(
+        "tf_efficientdet_lite0", num_classes=5, img_size=384, pretrained=False
+    )
+    state_keys = set(model.state_dict())
+
+    bench = efficientdet.prepare_for_inference(model)
+    assert isinstance(bench, DetBenchPredict)
+    assert not bench.training
+    assert efficientdet.prepare_for_inference(model) is bench
+    assert efficientdet.prepare_for_inference(bench) is bench
+    assert set(model.state_dict()) == state_keys
+
+    model.train()
+    batch, records = efficientdet.build_infer_batch(fridge_efficientdet_records)
+    preds = efficientdet.predict(model=model, batch=batch, detection_threshold=0)
+    expected = DetBenchPredict(unwrap_bench(model)).eval()(*batch)
+    expected = efficientdet.convert_raw_predictions(expected, detection_threshold=0)
+
+    assert preds[0]["bboxes"] == expected[0]["bboxes"]
@@ -0,0 +1,113 @@
+import pytest
+from icevision.all import *
+
+
+def _torchvision_model(model_type):
+    backbone = model_type.backbones.resnet_fpn.resnet18(pretrained=False)
+    return model_type.model(num_classes=3, backbone=backbone)
+
+
+def _efficientdet_model():
+    from effdet import get_efficientdet_config, create_model_from_config
+
+    config = get_efficientdet_config("tf_efficientdet_lite0")
+    config.update(num_classes=3, image_size=(128, 128))
+    return create_model_from_config(
+        config, bench_task="train", pretrained_backbone=False, num_classes=3
+    )
+
+
+@pytest.fixture(scope="module")
+def export_imgs():
+    np.random.seed(0)
+    return [np.random.randint(0, 255, (128, 128, 3), dtype=np.uint8) for _ in range(2)]
+
+
+def _eager_predict(model_type, model, imgs, detection_threshold):
+    infer_ds = Dataset.from_images(imgs, tfms.A.Adapter([tfms.A.Normalize()]))
+    batch, _ = model_type.build_infer_batch(list(infer_ds))
+    return model_type.predict(model, batch, detection_threshold=detection_threshold)
+
+
+def _score_order(pred):
+    # the detections of a random model have near ties, whose order can differ
+    scores = np.round(np.asarray(pred["scores"]), 3)
+    return np.lexsort([*np.round(pred["bboxes"].xyxy, 1).T[::-1], -scores])
+
+
+def _assert_same_preds(preds, expected):
+    assert len(preds) == len(expected)
+    for pred, exp in zip(preds, expected):
+        assert pred.keys() == exp.keys()
+        i, j = _score_order(pred), _score_order(exp)
+        xyxy, expected_xyxy = pred["bboxes"].xyxy[i], exp["bboxes"].xyxy[j]
+        np.testing.assert_allclose(xyxy, expected_xyxy, atol=1e-2)
+        np.testing.assert_allclose(pred["scores"][i], exp["scores"][j], atol=1e-4)
+        np.testing.assert_equal(pred["labels"][i], exp["labels"][j])
+        if "masks" in exp:
+            masks, expected_masks = pred["masks"].data[i], exp["masks"].data[j]
+            assert (masks != expected_masks).mean() < 1e-3
+
+
+@pytest.mark.parametrize(
+    "model_type, create_model",
+    [
+        (faster_rcnn, lambda: _torchvision_model(faster_rcnn)),
+        (retinanet, lambda: _torchvision_model(retinanet)),
+        (mask_rcnn, lambda: _torchvision_model(mask_rcnn)),
+        (efficientdet, _efficientdet_model),
+    ],
+)
+def test_export_torchscript(tmpdir, export_imgs, model_type, create_model):
+    torch.manual_seed(0)
+    model = create_model().eval()
+    filepath = export_torchscript(model, Path(tmpdir) / "model.pt")
+
+    engine = InferenceEngine(filepath)
+    assert engine.metadata["mean"] == list(IMAGENET_STATS[0])
+    # threshold 0 keeps all the detections of the random model
+    preds = engine.predict(export_imgs, detection_threshold=0)
+    expected = _eager_predict(model_type, model, export_imgs, detection_threshold=0)
+    _assert_same_preds(preds, expected)
+
+    outputs = engine(export_imgs)
+    assert outputs["counts"].sum() == len(outputs["scores"])
+
+    # the number of threads is only changed while the model runs
+    num_threads = torch.get_num_threads()
+    InferenceEngine(filepath, num_threads=num_threads + 1)(export_imgs)
+    assert torch.get_num_threads() == num_threads
+    # exporting does not modify the model
+    assert not isinstance(model, torch.jit.ScriptModule) and model.training is False
+
+
+def test_onnx_export_kwargs(monkeypatch):
+    from icevision.models.export import _onnx_export_kwargs
+
+    def export(model, args, f, opset_version=None):
+        pass
+
+    # versions of torch without the dynamo exporter
+    monkeypatch.setattr(torch.onnx, "export", export)
+    assert _onnx_export_kwargs() == {}
+
+
+def test_export_keypoint_rcnn_not_supported(tmpdir):
+    backbone = keypoint_rcnn.backbones.resnet_fpn.resnet18(pretrained=False)
+    model = keypoint_rcnn.model(num_keypoints=2, backbone=backbone)
+    with pytest.raises(ValueError):
+        export_torchscript(model, Path(tmpdir) / "model.pt")
+
+
+def test_export_onnx(tmpdir, export_imgs):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    torch.manual_seed(0)
+    model = _torchvision_model(faster_rcnn).eval()
+    filepath = export_onnx(model, Path(tmpdir) / "model.onnx", img_size=128)
+
+    engine = InferenceEngine(filepath)
+    assert engine.runtime == "onnx"
+    preds = engine.predict(export_imgs[:1], detection_threshold=0)
+    expected = _eager_predict(faster_rcnn, model, export_imgs[:1], 0)
+    _assert_same_preds(preds, expected)
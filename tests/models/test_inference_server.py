@@ -0,0 +1,151 @@
+import pytest, asyncio, threading, urllib.request
+from types import SimpleNamespace
+from icevision.all import *
+
+
+def _predict(model, batch, detection_threshold=0.5):
+    """Predicts a box with the mean value of the image as score."""
+    if model == "broken":
+        raise RuntimeError("broken model")
+    return [
+        {
+            "labels": np.array([1]),
+            "scores": np.array([record["img"].mean()]),
+            "bboxes": BBoxArray(np.array([[0, 0, 10, 10]])),
+        }
+        for record in batch
+    ]
+
+
+def _build_infer_batch(records):
+    # same as the model types, images of different sizes cannot be stacked
+    np.stack([record["img"] for record in records])
+    return records, records
+
+
+fake_model_type = SimpleNamespace(
+    build_infer_batch=_build_infer_batch, predict=_predict
+)
+
+
+def _img(value):
+    return np.full((8, 8, 3), value, dtype=np.uint8)
+
+
+def test_inference_server_coalesces_requests():
+    with InferenceServer(max_batch_size=4, max_latency=0.5) as server:
+        server.add_model("a", None, fake_model_type)
+        server.add_model("b", None, fake_model_type)
+
+        futures = [server.submit("a", _img(i)) for i in range(5)]
+        preds = [future.result(timeout=5) for future in futures]
+        assert [pred["scores"][0] for pred in preds] == list(range(5))
+        assert server.predict("b", _img(7))["scores"][0] == 7
+
+        metrics = server.metrics()
+    assert metrics["a"]["batch_sizes"] == {1: 1, 4: 1}
+    assert metrics["a"]["queue_depth"] == 0
+    assert metrics["b"]["batch_sizes"] == {1: 1}
+    # the last request of "a" waited for the deadline
+    assert 400 < metrics["a"]["latency_p99 (ms)"] < 5000
+
+
+def test_inference_server_async():
+    async def predict_all(server):
+        return await asyncio.gather(
+            *[server.predict_async("a", _img(i)) for i in range(3)]
+        )
+
+    with InferenceServer(max_batch_size=8, max_latency=0.05) as server:
+        server.add_model("a", None, fake_model_type)
+        preds = asyncio.run(predict_all(server))
+    assert [pred["scores"][0] for pred in preds] == [0, 1, 2]
+
+
+def test_inference_server_errors():
+    with InferenceServer(max_latency=0) as server:
+        server.add_model("broken", "broken", fake_model_type)
+        with pytest.raises(RuntimeError):
+            server.predict("broken", _img(0))
+        with pytest.raises(KeyError):
+            server.submit("missing", _img(0))
+        with pytest.raises(ValueError):
+            server.add_model("broken", "broken", fake_model_type)
+
+
+def test_inference_server_cancelled_requests():
+    release = threading.Event()
+
+    def _blocking_predict(model, batch, **kwargs):
+        release.wait(timeout=5)
+        return _predict(model, batch, **kwargs)
+
+    blocking_model_type = SimpleNamespace(
+        build_infer_batch=_build_infer_batch, predict=_blocking_predict
+    )
+    with InferenceServer(max_batch_size=1, max_latency=0) as server:
+        server.add_model("a", None, blocking_model_type)
+        first = server.submit("a", _img(1))
+        # queued while the first request is predicted, then cancelled
+        cancelled = server.submit("a", _img(2))
+        assert cancelled.cancel()
+        release.set()
+
+        assert first.result(timeout=5)["scores"][0] == 1
+        assert server.predict("a", _img(3), timeout=5)["scores"][0] == 3
+        metrics = server.metrics()
+    assert metrics["a"]["batch_sizes"] == {1: 2}
+
+
+def test_inference_server_async_timeout():
+    async def predict(server):
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(server.predict_async("a", _img(1)), timeout=0.01)
+        return await server.predict_async("a", _img(2))
+
+    with InferenceServer(max_batch_size=8, max_latency=0.2) as server:
+        server.add_model("a", None, fake_model_type)
+        pred = asyncio.run(predict(server))
+    assert pred["scores"][0] == 2
+
+
+def test_inference_server_mixed_sizes():
+    with InferenceServer(max_batch_size=4, max_latency=0.5) as server:
+        server.add_model("a", None, fake_model_type)
+        imgs = [_img(1), np.full((16, 12, 3), 2, np.uint8), _img(3)]
+        futures = [server.submit("a", img) for img in imgs]
+        preds = [future.result(timeout=5) for future in futures]
+        metrics = server.metrics()
+    assert [pred["scores"][0] for pred in preds] == [1, 2, 3]
+    # the batch is split by image size
+    assert metrics["a"]["batch_sizes"] == {1: 1, 2: 1}
+
+
+def test_serve_http(fridge_faster_rcnn_model):
+    with InferenceServer(max_latency=0.01) as server:
+        server.add_model(
+            "faster_rcnn",
+            fridge_faster_rcnn_model.eval(),
+            faster_rcnn,
+            tfm=tfms.A.Adapter([tfms.A.Normalize()]),
+            detection_threshold=0,
+        )
+        http_server = serve_http(server, port=0)
+        thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+        thread.start()
+        url = "http://{}:{}".format(*http_server.server_address)
+
+        _, img = cv2.imencode(".png", np.zeros((64, 64, 3), dtype=np.uint8))
+        request = urllib.request.Request(
+            f"{url}/predict/faster_rcnn", data=img.tobytes(), method="POST"
+        )
+        with urllib.request.urlopen(request) as response:
+            pred = json.loads(response.read())
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            metrics = json.loads(response.read())
+
+        http_server.shutdown()
+        http_server.server_close()
+
+    assert len(pred["bboxes"]) == len(pred["scores"]) == len(pred["labels"])
+    assert metrics["faster_rcnn"]["batch_sizes"] == {"1": 1}
@@ -0,0 +1,111 @@
+import pytest
+from icevision.all import *
+
+
+class _CountMetric(Metric):
+    def __init__(self):
+        super().__init__()
+        self.num_preds = 0
+
+    def accumulate(self, records, preds):
+        self.num_preds += len(preds)
+
+    def finalize(self):
+        logs = {"num_preds": self.num_preds}
+        self.num_preds = 0
+        return logs
+
+
+@pytest.fixture()
+def fridge_faster_rcnn_infer_dl(fridge_ds):
+    train_ds, _ = fridge_ds
+    return faster_rcnn.infer_dl(train_ds, batch_size=1)
+
+
+def test_quantize_static(fridge_faster_rcnn_model, fridge_faster_rcnn_infer_dl):
+    torch.manual_seed(0)
+    model = fridge_faster_rcnn_model.eval()
+    int8_model = faster_rcnn.quantize(
+        model, fridge_faster_rcnn_infer_dl, max_calib_batches=1, show_pbar=False
+    )
+
+    # the original model is not modified
+    assert isinstance(model.backbone.body.bn1, torchvision.ops.FrozenBatchNorm2d)
+    assert isinstance(int8_model.backbone, torch.fx.GraphModule)
+    assert isinstance(
+        int8_model.roi_heads.box_head.fc6, torch.ao.nn.quantized.dynamic.Linear
+    )
+
+    batch, _ = next(iter(fridge_faster_rcnn_infer_dl))
+    with torch.no_grad():
+        features = model.backbone(batch[0])
+        int8_features = int8_model.backbone(batch[0])
+    for k, v in features.items():
+        error = (int8_features[k] - v).abs().mean() / v.abs().mean()
+        assert error < 0.1
+
+    samples, preds = faster_rcnn.predict_dl(
+        int8_model, fridge_faster_rcnn_infer_dl, show_pbar=False
+    )
+    assert len(preds) == len(samples) == 2
+    assert isinstance(preds[0]["bboxes"], BBoxArray)
+
+
+def test_quantize_dynamic(fridge_faster_rcnn_model):
+    engine = torch.backends.quantized.engine
+    int8_model = faster_rcnn.quantize(
+        fridge_faster_rcnn_model, mode="dynamic", backend="qnnpack"
+    )
+    assert torch.backends.quantized.engine == engine
+    assert not isinstance(int8_model.backbone, torch.fx.GraphModule)
+    assert isinstance(
+        int8_model.roi_heads.box_predictor.cls_score,
+        torch.ao.nn.quantized.dynamic.Linear,
+    )
+
+
+def test_quantize_errors(fridge_faster_rcnn_model):
+    with pytest.raises(ValueError):
+        faster_rcnn.quantize(fridge_faster_rcnn_model)
+    with pytest.raises(ValueError):
+        faster_rcnn.quantize(fridge_faster_rcnn_model, mode="float16")
+
+
+def test_quantize_backbone_mobilenet():
+    torch.manual_seed(0)
+    backbone = backbones.mobilenet(pretrained=False).eval()
+    x = torch.rand(2, 3, 128, 128)
+    with torch.no_grad():
+        expected = backbone(x)
+
+        prepared = quantize_backbone(deepcopy(backbone))
+        prepared(x)
+        int8_backbone = torch.ao.quantization.quantize_fx.convert_fx(prepared)
+        features = int8_backbone(x)
+
+    # the features of a random backbone are too far off to be compared, only
+    # check that all the float convolutions were replaced by int8 ones
+    convs = [m for m in int8_backbone.modules() if isinstance(m, nn.Conv2d)]
+    assert len(convs) == 0
+    assert features.shape == expected.shape
+
+
+def test_quantization_report(fridge_faster_rcnn_model, fridge_faster_rcnn_infer_dl):
+    models = {
+        "float": fridge_faster_rcnn_model,
+        "int8": faster_rcnn.quantize(fridge_faster_rcnn_model, mode="dynamic"),
+    }
+    report = quantization_report(
+        models,
+        faster_rcnn.predict,
+        fridge_faster_rcnn_infer_dl,
+        metrics=[_CountMetric()],
+        show_pbar=False,
+        detection_threshold=0.1,
+    )
+
+    assert list(report) == ["float", "int8"]
+    for logs in report.values():
+        assert logs["_CountMetric/num_preds"] == 2
+        assert logs["latency (ms/img)"] > 0
+    assert report["int8"]["size (MB)"] < report["float"]["size (MB)"]
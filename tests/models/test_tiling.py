@@ -0,0 +1,74 @@
+import pytest
+from icevision.all import *
+from icevision.models.tiling import _predict_tiled
+
+
+def _build_batch(records):
+    return records, records
+
+
+def _predict(model, batch, detection_threshold):
+    """Detects the white squares of a tile, even when they are cut by its edges."""
+    preds = []
+    for record in batch:
+        img = record["img"][..., 0]
+        n, components = cv2.connectedComponents((img == 255).astype(np.uint8))
+        xyxy, masks = [], []
+        for i in range(1, n):
+            ys, xs = np.nonzero(components == i)
+            xyxy.append([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1])
+            masks.append(components == i)
+        preds.append(
+            {
+                "scores": np.ones(len(xyxy)),
+                "labels": np.ones(len(xyxy), dtype=int),
+                "bboxes": BBoxArray(np.array(xyxy, dtype=float).reshape(-1, 4)),
+                "masks": MaskArray(np.array(masks).reshape(-1, *img.shape)),
+            }
+        )
+    return preds
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 16])
+def test_predict_tiled(tmpdir, batch_size):
+    img = np.zeros((700, 900, 3), dtype=np.uint8)
+    # on a seam, on the border of the image and inside a single tile
+    squares = [(230, 240, 40, 40), (860, 0, 40, 30), (50, 50, 20, 20)]
+    for x, y, w, h in squares:
+        img[y : y + h, x : x + w] = 255
+    filepath = Path(tmpdir) / "img.npy"
+    np.save(filepath, img)
+    small_img = img[:100, :200]
+
+    preds = _predict_tiled(
+        predict_fn=_predict,
+        build_batch=_build_batch,
+        model=None,
+        images=[img, filepath, small_img],
+        tile_size=256,
+        overlap=64,
+        batch_size=batch_size,
+        show_pbar=False,
+        detection_threshold=0.5,
+    )
+    assert not isinstance(preds, list)
+    preds = list(preds)
+
+    assert len(preds) == 3
+    expected = sorted([x, y, x + w, y + h] for x, y, w, h in squares)
+    for pred in preds[:2]:
+        assert sorted(pred["bboxes"].xyxy.tolist()) == expected
+        masks = pred["masks"].to_mask(h=700, w=900).data
+        assert np.all(masks.any(0) == (img[..., 0] == 255))
+    assert preds[2]["bboxes"].xyxy.tolist() == [[50, 50, 70, 70]]
+    assert preds[2]["masks"].to_mask(h=100, w=200).data.sum() == 400
+
+
+def test_tile_offsets():
+    assert tile_offsets(100, 256, 64) == [0]
+    assert tile_offsets(256, 256, 64) == [0]
+    offsets = tile_offsets(1000, 256, 64)
+    assert offsets[0] == 0 and offsets[-1] == 1000 - 256
+    assert all(256 - (b - a) >= 64 for a, b in zip(offsets, offsets[1:]))
+    with pytest.raises(ValueError):
+        tile_offsets(1000, 256, 256)
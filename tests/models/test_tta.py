@@ -0,0 +1,150 @@
+import pytest
+from icevision.all import *
+
+
+@pytest.mark.parametrize(
+    "view",
+    [
+        tta.Identity(),
+        tta.HFlip(),
+        tta.VFlip(),
+        tta.Scale(0.5),
+        tta.Compose([tta.Scale(1.5), tta.HFlip(), tta.VFlip()]),
+    ],
+)
+def test_view_inverts_boxes_and_masks(view):
+    imgs = torch.zeros(1, 1, 40, 60)
+    imgs[..., 8:16, 12:32] = 1
+    view_imgs = view.apply(imgs)
+    assert tuple(view_imgs.shape[-2:]) == view.output_size((40, 60))
+
+    ys, xs = torch.nonzero(view_imgs[0, 0] > 0.5, as_tuple=True)
+    view_box = torch.stack([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]).float()
+    box = view.invert_boxes(view_box[None], size=(40, 60))
+    assert torch.allclose(box, torch.tensor([[12.0, 8, 32, 16]]), atol=0.5)
+
+    masks = view.invert_masks(view_imgs, size=(40, 60))
+    assert ((masks > 0.5) == (imgs > 0.5)).float().mean() > 0.99
+
+
+def test_hflip_keypoints():
+    keypoints = torch.tensor([[[10.0, 5, 1], [30, 5, 1]]])
+    inverted = tta.HFlip(keypoints_flip_idxs=[1, 0]).invert_keypoints(
+        keypoints, size=(20, 40)
+    )
+    assert inverted.tolist() == [[[10.0, 5, 1], [30, 5, 1]]]
+
+
+def _raw_pred(boxes, scores, labels):
+    return {
+        "boxes": torch.tensor(boxes, dtype=torch.float32).reshape(-1, 4),
+        "scores": torch.tensor(scores, dtype=torch.float32),
+        "labels": torch.tensor(labels, dtype=torch.int64),
+    }
+
+
+def test_fuse():
+    preds = [
+        _raw_pred([[0, 0, 10, 10], [50, 50, 60, 60]], [0.9, 0.8], [1, 1]),
+        _raw_pred([[2, 0, 12, 10], [0, 0, 10, 10]], [0.3, 0.6], [1, 2]),
+    ]
+
+    nms = tta.fuse(preds, fusion="nms", iou_threshold=0.5)
+    assert nms["boxes"].tolist() == [[0, 0, 10, 10], [50, 50, 60, 60], [0, 0, 10, 10]]
+    assert nms["labels"].tolist() == [1, 1, 2]
+
+    wbf = tta.fuse(preds, fusion="wbf", iou_threshold=0.5)
+    # the box found by both views is averaged weighted by the scores
+    assert torch.allclose(wbf["boxes"][0], torch.tensor([0.5, 0, 10.5, 10]))
+    assert torch.allclose(wbf["scores"], torch.tensor([0.6, 0.4, 0.3]))
+    assert wbf["labels"].tolist() == [1, 1, 2]
+
+    with pytest.raises(ValueError):
+        tta.fuse(preds, fusion="mean")
+
+
+@pytest.fixture()
+def tta_batches():
+    np.random.seed(0)
+    imgs = [np.random.randint(0, 255, (96, 128, 3), dtype=np.uint8) for _ in range(2)]
+    flipped_imgs = [np.ascontiguousarray(img[:, ::-1]) for img in imgs]
+    tfm = tfms.A.Adapter([tfms.A.Normalize()])
+    return [list(Dataset.from_images(o, tfm)) for o in [imgs, flipped_imgs]]
+
+
+def _mirror(xyxy, width):
+    return np.stack([width - xyxy[:, 2], xyxy[:, 1], width - xyxy[:, 0], xyxy[:, 3]], 1)
+
+
+@pytest.mark.parametrize("model_type", [faster_rcnn, mask_rcnn])
+def test_predict_tta(tta_batches, model_type):
+    torch.manual_seed(0)
+    backbone = model_type.backbones.resnet_fpn.resnet18(pretrained=False)
+    model = model_type.model(num_classes=3, backbone=backbone).eval()
+    (batch, _), (flipped_batch, _) = [
+        model_type.build_infer_batch(records) for records in tta_batches
+    ]
+
+    # the flipped view of the batch is the flipped batch
+    preds = model_type.predict_tta(
+        model, batch, views=[tta.HFlip()], fusion="nms", detection_threshold=0.05
+    )
+    expected = model_type.predict(model, flipped_batch, detection_threshold=0.05)
+    for pred, exp in zip(preds, expected):
+        np.testing.assert_allclose(
+            pred["bboxes"].xyxy, _mirror(exp["bboxes"].xyxy, 128), atol=1e-3
+        )
+        if "masks" in exp:
+            np.testing.assert_equal(pred["masks"].data, exp["masks"].data[..., ::-1])
+
+    views = [tta.Identity(), tta.HFlip(), tta.Scale(0.5), tta.Scale(1.25)]
+    preds = model_type.predict_tta(model, batch, views=views, detection_threshold=0.05)
+    assert len(preds) == 2
+    xyxy = preds[0]["bboxes"].xyxy
+    assert (xyxy >= 0).all() and (xyxy[:, [0, 2]] <= 128).all()
+    if "masks" in preds[0]:
+        assert preds[0]["masks"].data.shape == (len(xyxy), 96, 128)
+
+
+def test_predict_tta_scale(tta_batches):
+    backbone = faster_rcnn.backbones.resnet_fpn.resnet18(pretrained=False)
+    model = faster_rcnn.model(
+        num_classes=3, backbone=backbone, remove_internal_transforms=False
+    ).eval()
+    batch, _ = faster_rcnn.build_infer_batch(tta_batches[0])
+    sizes, min_sizes = [], []
+
+    def _hook(module, inputs, outputs):
+        sizes.append(inputs[0].shape[-2:])
+        # e.g. a `predict` in another thread would see this transform
+        min_sizes.append(model.transform.min_size)
+
+    model.backbone.register_forward_hook(_hook)
+
+    faster_rcnn.predict(model, batch)
+    faster_rcnn.predict_tta(model, batch, views=[tta.Scale(0.5)])
+    # the (padded) 48x64 view is resized like the 96x128 images, by 800 / 96,
+    # instead of to `min_size`
+    assert sizes[0][0] == 800
+    assert abs(sizes[1][0] - 64 * 800 / 96) <= 32
+    assert min_sizes == [(800,), (800,)]
+    assert model.transform.min_size == (800,)
+
+
+def test_efficientdet_predict_tta():
+    from effdet import get_efficientdet_config, create_model_from_config
+
+    config = get_efficientdet_config("tf_efficientdet_lite0")
+    config.update(num_classes=3, image_size=(128, 128))
+    model = create_model_from_config(
+        config, bench_task="train", pretrained_backbone=False, num_classes=3
+    )
+    imgs = [np.random.randint(0, 255, (128, 128, 3), dtype=np.uint8)]
+    infer_ds = Dataset.from_images(imgs, tfms.A.Adapter([tfms.A.Normalize()]))
+    batch, _ = efficientdet.build_infer_batch(list(infer_ds))
+
+    views = [tta.Identity(), tta.HFlip(), tta.Scale(0.5)]
+    preds = efficientdet.predict_tta(model, batch, views=views, detection_threshold=0)
+    assert len(preds) == 1 and len(preds[0]["scores"]) > 0
+    with pytest.raises(ValueError):
+        efficientdet.predict_tta(model, batch, views=[tta.Scale(1.5)])
@@ -0,0 +1,84 @@
+import pytest
+from icevision.all import *
+from icevision.models.torchvision import faster_rcnn
+
+
+def test_convert_raw_predictions():
+    raw_preds = [
+        {
+            "boxes": torch.tensor([[1.0, 2, 3, 4], [5, 6, 7, 8]]),
+            "scores": torch.tensor([0.9, 0.2]),
+            "labels": torch.tensor([1, 2]),
+        },
+        {
+            "boxes": torch.zeros((0, 4)),
+            "scores": torch.zeros(0),
+            "labels": torch.zeros(0, dtype=torch.int64),
+        },
+    ]
+    preds = faster_rcnn.convert_raw_predictions(raw_preds, detection_threshold=0.5)
+
+    assert len(preds) == 2
+    assert isinstance(preds[0]["bboxes"], BBoxArray)
+    assert preds[0]["bboxes"] == [BBox.from_xyxy(1, 2, 3, 4)]
+    assert preds[0]["labels"].tolist() == [1]
+    assert preds[0]["scores"].tolist() == pytest.approx([0.9])
+    assert len(preds[1]["bboxes"]) == 0
+
+    pred = faster_rcnn.convert_raw_prediction(raw_preds[0], detection_threshold=0.5)
+    assert pred["bboxes"] == preds[0]["bboxes"]
+
+    assert faster_rcnn.convert_raw_predictions([], detection_threshold=0.5) == []
+
+
+def test_predict_from_dl(fridge_ds, fridge_faster_rcnn_model):
+    _, valid_ds = fridge_ds
+    infer_dl = faster_rcnn.infer_dl(valid_ds, batch_size=1)
+    samples, preds = faster_rcnn.predict_dl(
+        fridge_faster_rcnn_model, infer_dl, show_pbar=False, detection_threshold=0
+    )
+
+    stream = faster_rcnn.predict_from_dl(
+        fridge_faster_rcnn_model, infer_dl, show_pbar=False, detection_threshold=0
+    )
+    assert not isinstance(stream, list)
+    pairs = list(stream)
+
+    assert len(pairs) == len(valid_ds)
+    for (sample, pred), expected_sample, expected_pred in zip(pairs, samples, preds):
+        assert "img" not in sample
+        assert sample["imageid"] == expected_sample["imageid"]
+        assert pred["bboxes"] == expected_pred["bboxes"]
+        np.testing.assert_equal(pred["scores"], expected_pred["scores"])
+
+    sample, _ = next(
+        iter(
+            faster_rcnn.predict_from_dl(
+                fridge_faster_rcnn_model, infer_dl, show_pbar=False, keep_images=True
+            )
+        )
+    )
+    assert "img" in sample
+
+
+def test_predict_tiled(fridge_faster_rcnn_model):
+    imgs = [np.zeros((500, 300, 3), dtype=np.uint8), np.zeros((200, 200, 3), np.uint8)]
+    preds = faster_rcnn.predict_tiled(
+        fridge_faster_rcnn_model,
+        imgs,
+        tfm=tfms.A.Adapter([tfms.A.Normalize()]),
+        tile_size=256,
+        overlap=32,
+        batch_size=2,
+        detection_threshold=0,
+        show_pbar=False,
+    )
+    preds = list(preds)
+
+    assert len(preds) == 2
+    for pred, img in zip(preds, imgs):
+        assert isinstance(pred["bboxes"], BBoxArray)
+        assert len(pred["bboxes"]) == len(pred["scores"]) == len(pred["labels"])
+        xyxy = pred["bboxes"].xyxy
+        assert np.all(xyxy >= 0)
+        assert np.all(xyxy[:, [2, 3]] <= [img.shape[1], img.shape[0]])
@@ -69,3 +69,34 @@ def test_mantis_mask_rcnn_predict_dl_threshold(sample_dataset, pretrained_state_
     )
 
     assert len(preds[0]["labels"]) == 0
+
+
+def test_mask_rcnn_convert_raw_predictions():
+    masks = torch.rand((2, 1, 8, 8))
+    raw_preds = [
+        {
+            "boxes": torch.tensor([[1.0, 2, 3, 4], [5, 6, 7, 8]]),
+            "scores": torch.tensor([0.2, 0.9]),
+            "labels": torch.tensor([1, 2]),
+            "masks": masks,
+        }
+    ] * 2
+    preds = mask_rcnn.convert_raw_predictions(
+        raw_preds, detection_threshold=0.5, mask_threshold=0.5
+    )
+
+    assert len(preds) == 2
+    pred = preds[1]
+    assert pred["bboxes"] == [BBox.from_xyxy(5, 6, 7, 8)]
+    assert pred["masks"].shape == (1, 8, 8)
+    np.testing.assert_equal(pred["masks"].data, (masks[1:, 0] > 0.5).numpy())
+
+    single = mask_rcnn.convert_raw_prediction(
+        raw_preds[0], detection_threshold=0.5, mask_threshold=0.5
+    )
+    np.testing.assert_equal(single["masks"].data, pred["masks"].data)
+
+    empty = mask_rcnn.convert_raw_predictions(
+        [], detection_threshold=0.5, mask_threshold=0.5
+    )
+    assert empty == []
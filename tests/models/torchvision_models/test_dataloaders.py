@@ -216,3 +216,39 @@ def test_keypoints_rcnn_dataloader(coco_keypoints_parser):
     assert y[ind]["labels"].tolist() == [1, 1, 1]
     assert y[-(ind - 1)]["keypoints"].shape == torch.Size([1, 17, 3])
     assert y[-(ind - 1)]["boxes"].shape == torch.Size([1, 4])
+
+
+def test_mask_rcnn_build_train_batch_lazy_masks(mask_records, masks):
+    lazy_records = []
+    for record in mask_records:
+        record = record.copy()
+        record.masks = masks.to_erles(h=4, w=4)
+        lazy_records.append(record)
+
+    batch = mask_rcnn.build_train_batch(lazy_records)
+    _test_mask_rcnn_batch(batch)
+
+
+def test_mask_rcnn_train_dataloader_slim_records(coco_mask_records):
+    dataset = Dataset(coco_mask_records[:2])
+    dl = mask_rcnn.train_dl(dataset, batch_size=2, slim_records=True)
+    full_dl = mask_rcnn.train_dl(dataset, batch_size=2)
+
+    (images, targets), records = first(dl)
+    (full_images, full_targets), full_records = first(full_dl)
+
+    for image, full_image in zip(images, full_images):
+        assert torch.all(image == full_image)
+    for target, full_target in zip(targets, full_targets):
+        assert torch.all(target["masks"] == full_target["masks"])
+
+    for record, full_record in zip(records, full_records):
+        assert "img" not in record
+        assert record["imageid"] == full_record["imageid"]
+        assert record["bboxes"] == full_record["bboxes"]
+        np.testing.assert_equal(
+            record["masks"].to_mask(record["height"], record["width"]).data,
+            full_record["masks"].data,
+        )
+
+    assert len(pickle.dumps(records)) < len(pickle.dumps(full_records)) / 10
@@ -65,3 +65,85 @@ def test_mask_parser(coco_mask_parser):
             b"00O1O1O1N2O1N2N2N101N1O2O0O2N2O0O5G=^Ob0^OXTS2",
         }
     ]
+
+
+def test_mask_parser_num_workers(coco_dir):
+    parser = parsers.coco(coco_dir / "annotations.json", coco_dir / "images")
+    records = parser.parse(data_splitter=SingleSplitSplitter())[0]
+
+    parallel_parser = parsers.coco(coco_dir / "annotations.json", coco_dir / "images")
+    parallel_records = parallel_parser.parse(
+        data_splitter=SingleSplitSplitter(), num_workers=2
+    )[0]
+
+    assert parallel_parser.idmap.get_names() == parser.idmap.get_names()
+    assert len(parallel_records) == len(records)
+    for parallel_record, record in zip(parallel_records, records):
+        assert parallel_record.imageid == record.imageid
+        assert parallel_record.labels == record.labels
+        assert parallel_record.bboxes == record.bboxes
+        assert parallel_record.masks == record.masks
+
+
+def test_parser_image_memo(coco_dir, monkeypatch):
+    def raise_get_image_size(filepath):
+        raise AssertionError("size should be read from the annotations file")
+
+    exists_calls = []
+
+    def count_exists(self):
+        exists_calls.append(self)
+        return True
+
+    monkeypatch.setattr(parsers.coco_parser, "get_image_size", raise_get_image_size)
+    monkeypatch.setattr(Path, "exists", count_exists)
+
+    parser = parsers.coco(coco_dir / "annotations.json", coco_dir / "images")
+    records = parser.parse(data_splitter=SingleSplitSplitter(), autofix=False)[0]
+
+    assert (records[0].width, records[0].height) == (640, 480)
+    assert len(exists_calls) == len(records) == 5
+
+
+def test_mask_parser_cache(coco_dir, tmpdir):
+    cache_filepath = Path(tmpdir) / "coco_cache"
+    parser = parsers.coco(coco_dir / "annotations.json", coco_dir / "images")
+    records = parser.parse(
+        data_splitter=SingleSplitSplitter(), cache_filepath=cache_filepath
+    )[0]
+
+    parser = parsers.coco(coco_dir / "annotations.json", coco_dir / "images")
+    cached_records = parser.parse(
+        data_splitter=SingleSplitSplitter(), cache_filepath=cache_filepath
+    )[0]
+
+    assert len(cached_records) == len(records)
+    for cached_record, record in zip(cached_records, records):
+        assert cached_record.imageid == record.imageid
+        assert cached_record.filepath == record.filepath
+        assert cached_record.labels == record.labels
+        assert cached_record.iscrowds == record.iscrowds
+        assert cached_record.masks == record.masks
+        np.testing.assert_allclose(cached_record.areas, record.areas, rtol=1e-6)
+        np.testing.assert_allclose(
+            [bbox.xyxy for bbox in cached_record.bboxes],
+            [bbox.xyxy for bbox in record.bboxes],
+            rtol=1e-6,
+        )
+
+
+def test_keypoints_parser_cache(coco_dir, tmpdir):
+    cache_filepath = Path(tmpdir) / "coco_keypoints_cache"
+    for _ in range(2):
+        parser = parsers.COCOKeyPointsParser(
+            coco_dir / "keypoints_annotations.json", coco_dir / "images"
+        )
+        records = parser.parse(
+            data_splitter=SingleSplitSplitter(), cache_filepath=cache_filepath
+        )[0]
+
+    assert isinstance(records, RecordCollection)
+    assert len(records[1].keypoints) == 1
+    assert records[1].keypoints[0].n_visible_keypoints == 16
+    assert records[1].keypoints[0].y.max() == 485
+    assert records[1].keypoints[0].metadata == parsers.COCOKeypointsMetadata
@@ -49,7 +49,7 @@ def test_parser(data, tmpdir):
     assert parser.class_map.get_by_name("background") == 0
     assert parser.class_map.get_by_id(0) == "background"
 
-    cache_filepath = Path(tmpdir / "simple_parser.pkl")
+    cache_filepath = Path(tmpdir / "simple_parser_cache")
     records = parser.parse(data_splitter=SingleSplitSplitter())[0]
     assert cache_filepath.exists() == False
     assert len(records) == 2
@@ -73,20 +73,105 @@ def test_parser(data, tmpdir):
         BBox.from_xyxy(10, 20, 30, 40),
     ]
 
-    assert parser._check_path() == False
-    assert parser._check_path(cache_filepath) == False
+    parser = SimpleParser(data)
     records = parser.parse(
         data_splitter=SingleSplitSplitter(), cache_filepath=cache_filepath
     )[0]
-    assert parser._check_path(cache_filepath) == True
     assert cache_filepath.exists() == True
-    assert pickle.load(open(cache_filepath, "rb"))[0] == records
+
+    parser = SimpleParser(data)
+    cached_records = parser.parse(
+        data_splitter=SingleSplitSplitter(), cache_filepath=cache_filepath
+    )[0]
+    assert isinstance(cached_records, RecordCollection)
+    assert cached_records == records
+    assert parser.class_map == ClassMap(["a", "b"])
+    assert parser.idmap.get_names() == [1, 42, 3]
 
     parser = SimpleParser(data, class_map=ClassMap(["a", "b"]))
     assert len(parser.class_map) == 3
     assert parser.class_map._lock == True
 
 
+def test_parser_cache_invalidation(data, tmpdir):
+    cache_filepath = Path(tmpdir / "simple_parser_cache")
+    parser = SimpleParser(data)
+    parser.parse(data_splitter=SingleSplitSplitter(), cache_filepath=cache_filepath)
+
+    parser = SimpleParser(data)
+    splits = parser.parse(
+        data_splitter=RandomSplitter([0.5, 0.5], seed=42),
+        cache_filepath=cache_filepath,
+    )
+    assert len(splits) == 2
+    assert all(isinstance(records, RecordCollection) for records in splits)
+
+    parser = SimpleParser(data)
+    splits = parser.parse(
+        data_splitter=RandomSplitter([0.5, 0.5], seed=42),
+        cache_filepath=cache_filepath,
+    )
+    assert all(isinstance(records, RecordCollection) for records in splits)
+
+
+def test_parser_cache_return_type(data, tmpdir):
+    cache_filepath = Path(tmpdir / "simple_parser_cache")
+    for _ in range(2):
+        # cold and warm cache
+        train, valid = SimpleParser(data).parse(
+            data_splitter=RandomSplitter([0.5, 0.5], seed=42),
+            cache_filepath=cache_filepath,
+        )
+        assert isinstance(train, RecordCollection)
+        assert isinstance(train + valid, RecordCollection)
+        assert len(train + valid) == 2
+
+        records = list(train)
+        records[0].set_filepath("other.jpg")
+        assert records[0].filepath == Path("other.jpg")
+
+
+def test_parser_cache_data_changed(data, tmpdir):
+    cache_filepath = Path(tmpdir / "simple_parser_cache")
+    SimpleParser(data).parse(
+        data_splitter=SingleSplitSplitter(), cache_filepath=cache_filepath
+    )
+
+    # `SimpleParser` has no `source_files`, the cache is keyed by its data
+    data[0]["labels"] = ["b"]
+    data[0]["bboxes"] = [[5, 6, 70, 80]]
+    parser = SimpleParser(data)
+    records = parser.parse(
+        data_splitter=SingleSplitSplitter(), cache_filepath=cache_filepath
+    )[0]
+    record = records[0]
+    assert parser.class_map.get_by_id(record.labels[0]) == "b"
+    assert record.bboxes == [BBox.from_xyxy(5, 6, 70, 80)]
+
+
+def test_parser_cache_not_fingerprintable(data, tmpdir):
+    cache_filepath = Path(tmpdir / "simple_parser_cache")
+    parser = SimpleParser(data)
+    parser.label_func = lambda o: o
+    records = parser.parse(
+        data_splitter=SingleSplitSplitter(), cache_filepath=cache_filepath
+    )[0]
+    assert len(records) == 2
+    assert cache_filepath.exists() == False
+
+
+def test_parser_num_workers(data):
+    records = SimpleParser(data).parse(data_splitter=SingleSplitSplitter())[0]
+
+    parser = SimpleParser(data)
+    splits = parser.parse(data_splitter=SingleSplitSplitter(), num_workers=2)
+    parallel_records = splits[0]
+
+    assert parallel_records == records
+    assert parser.class_map == ClassMap(["a", "b"])
+    assert parser.idmap.get_names() == [1, 42, 3]
+
+
 @pytest.mark.skip
 def test_parser_annotation_len_mismatch(data):
     class BrokenParser(SimpleParser):
@@ -0,0 +1,67 @@
+import pytest
+from icevision.all import *
+
+
+@pytest.fixture()
+def records():
+    imgs = [
+        np.random.randint(0, 256, (2, 4, 3), dtype=np.uint8),
+        np.random.randint(0, 256, (3, 2, 3), dtype=np.uint8),
+    ]
+    return [{"img": img, "height": img.shape[0], "width": img.shape[1]} for img in imgs]
+
+
+def _expected(records, pad_value):
+    expected = torch.empty((2, 3, 3, 4))
+    expected[:] = torch.tensor(pad_value, dtype=torch.float).reshape(-1, 1, 1)
+    expected[0, :, :2, :4] = im2tensor(records[0]["img"])
+    expected[1, :, :3, :2] = im2tensor(records[1]["img"])
+    return expected
+
+
+@pytest.mark.parametrize("pad_value", [0, (1, 2, 3)])
+def test_img_pad_stack_tensor(records, pad_value):
+    expected = _expected(records, pad_value)
+    tfmed_records = tfms.batch.ImgPadStackTensor(pad_value=pad_value)(records)
+
+    batch = torch.stack([record["img"] for record in tfmed_records])
+    assert torch.allclose(batch, expected)
+    sizes = [(record["height"], record["width"]) for record in tfmed_records]
+    assert sizes == [(2, 4), (3, 2)]
+
+
+def test_img_pad_stack_tensor_normalize(records):
+    mean, std = np.array([0.485, 0.456, 0.406]), np.array([0.229, 0.224, 0.225])
+    expected = _expected(records, 0)
+    expected[0, :, :2, :4] -= torch.tensor(mean, dtype=torch.float).reshape(3, 1, 1)
+    expected[0, :, :2, :4] /= torch.tensor(std, dtype=torch.float).reshape(3, 1, 1)
+
+    batch_tfm = tfms.batch.ImgPadStackTensor(mean=mean, std=std, reuse_buffer=True)
+    tfmed_records = batch_tfm(records)
+    assert torch.allclose(tfmed_records[0]["img"], expected[0], atol=1e-6)
+
+    # the next batch is written in the same memory
+    next_records = batch_tfm([{"img": np.zeros((2, 2, 3), dtype=np.uint8)}])
+    assert next_records[0]["img"].data_ptr() == tfmed_records[0]["img"].data_ptr()
+
+
+def test_img_pad_stack_tensor_uint8(records):
+    imgs = [record["img"] for record in records]
+    tfmed_records = tfms.batch.ImgPadStackTensor(dtype=torch.uint8)(records)
+
+    img = tfmed_records[1]["img"]
+    assert img.dtype == torch.uint8
+    np.testing.assert_equal(img[:, :3, :2].permute(1, 2, 0).numpy(), imgs[1])
+
+    with pytest.raises(ValueError):
+        tfms.batch.ImgPadStackTensor(dtype=torch.uint8, mean=[0.5], std=[0.5])
+
+
+def test_img_pad_stack_tensor_build_infer_batch(records):
+    expected = _expected(records, 0)
+    batch_tfm = tfms.batch.ImgPadStackTensor()
+    (imgs,), samples = faster_rcnn.build_infer_batch(records, batch_tfms=batch_tfm)
+
+    assert torch.allclose(imgs, expected)
+    # the batch tensor is used as is, not copied again
+    assert imgs.data_ptr() == samples[0]["img"].data_ptr()
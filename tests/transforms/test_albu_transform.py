@@ -1,6 +1,10 @@
 import pytest
 from icevision.all import *
-from icevision.tfms.albumentations.tfms import _remove_outside_keypoints, _clip_bboxes
+from icevision.tfms.albumentations.tfms import (
+    _remove_outside_keypoints,
+    _clip_bboxes,
+    _skip_image_only_tfms,
+)
 
 
 @pytest.fixture
@@ -108,3 +112,129 @@ def test_filter_boxes():
 
     res = _clip_bboxes(inp, h, w)
     assert out == res
+
+
+@pytest.mark.parametrize(
+    "crop_fn", [None, partial(tfms.A.RandomSizedBBoxSafeCrop, p=1)]
+)
+def test_lazy_masks_transform(records, crop_fn):
+    tfm = tfms.A.Adapter(
+        [*tfms.A.aug_tfms(size=384, presize=512, crop_fn=crop_fn), tfms.A.Normalize()],
+        masks_chunk_size=3,
+    )
+    ds = Dataset(records, tfm=tfm)
+    lazy_ds = Dataset(records, tfm=tfm, lazy_masks=True)
+
+    random.seed(42), np.random.seed(42)
+    sample = ds[0]
+    random.seed(42), np.random.seed(42)
+    lazy_sample = lazy_ds[0]
+
+    assert isinstance(lazy_sample["masks"], EncodedRLEs)
+    assert len(lazy_sample["masks"]) == len(sample["masks"]) > 0
+    assert lazy_sample["bboxes"] == sample["bboxes"]
+    assert np.all(lazy_sample["img"] == sample["img"])
+
+    height, width = sample["img"].shape[:2]
+    lazy_masks = lazy_sample["masks"].to_mask(h=height, w=width)
+    assert np.all(lazy_masks.data == sample["masks"].data)
+
+
+def test_skip_image_only_tfms():
+    A = tfms.A
+    tfm = A.ReplayCompose(
+        [A.HorizontalFlip(p=1), A.OneOf([A.Blur(p=1)], p=1), A.Normalize()]
+    )
+    replay = tfm(image=np.zeros((8, 8, 3), dtype=np.uint8))["replay"]
+
+    skipped = _skip_image_only_tfms(replay)
+    flip, one_of, normalize = skipped["transforms"]
+    assert flip["applied"] and one_of["applied"]
+    assert not one_of["transforms"][0]["applied"] and not normalize["applied"]
+    # the original replay is not modified
+    assert replay["transforms"][2]["applied"]
+
+
+@pytest.mark.parametrize("size", [384, (300, 400)])
+@pytest.mark.parametrize("lazy_masks", [False, True])
+def test_resize_pad_normalize(records, size, lazy_masks):
+    adapter = tfms.A.Adapter([*tfms.A.resize_and_pad(size), tfms.A.Normalize()])
+    expected = Dataset(records, adapter, lazy_masks=lazy_masks)[0]
+    tfmed = Dataset(records, tfms.A.ResizePadNormalize(size), lazy_masks=lazy_masks)[0]
+
+    assert isinstance(tfmed["img"], torch.Tensor)
+    assert torch.allclose(tfmed["img"], im2tensor(expected["img"]), atol=1e-5)
+    assert (tfmed["height"], tfmed["width"]) == (expected["height"], expected["width"])
+    np.testing.assert_allclose(
+        [o.xyxy for o in tfmed["bboxes"]], [o.xyxy for o in expected["bboxes"]]
+    )
+    assert tfmed["labels"] == expected["labels"]
+    masks, expected_masks = tfmed["masks"], expected["masks"]
+    if lazy_masks:
+        height, width = expected["img"].shape[:2]
+        masks = masks.to_mask(h=height, w=width)
+        expected_masks = expected_masks.to_mask(h=height, w=width)
+    np.testing.assert_equal(masks.data, expected_masks.data)
+
+
+def test_resize_pad_normalize_keypoints(coco_keypoints_parser):
+    records = coco_keypoints_parser.parse(data_splitter=SingleSplitSplitter())[0]
+    adapter = tfms.A.Adapter([*tfms.A.resize_and_pad(384), tfms.A.Normalize()])
+    expected = Dataset(records, adapter)[0]
+    tfmed = Dataset(records, tfms.A.ResizePadNormalize(384))[0]
+
+    assert torch.allclose(tfmed["img"], im2tensor(expected["img"]), atol=1e-5)
+    np.testing.assert_allclose(
+        [o.keypoints for o in tfmed["keypoints"]],
+        [o.keypoints for o in expected["keypoints"]],
+    )
+
+
+@pytest.mark.parametrize("lazy_masks", [False, True])
+@pytest.mark.parametrize(
+    "tfms_list, n_deterministic",
+    [
+        ([tfms.A.SmallestMaxSize(300), tfms.A.HorizontalFlip(p=1.0)], 1),
+        ([*tfms.A.resize_and_pad(384), tfms.A.HorizontalFlip(p=1.0)], 2),
+        (tfms.A.resize_and_pad(384), 2),
+    ],
+)
+def test_adapter_cache(records, tfms_list, n_deterministic, lazy_masks):
+    tfms_cache = TfmsCache()
+    tfm = tfms.A.Adapter(tfms_list, cache=tfms_cache)
+    assert tfm.n_deterministic == n_deterministic
+
+    expected = Dataset(records, tfms.A.Adapter(tfms_list), lazy_masks=lazy_masks)[0]
+    tfm_ds = Dataset(records, tfm, lazy_masks=lazy_masks)
+    samples = [tfm_ds[0], tfm_ds[0]]
+
+    assert tfms_cache.info()["hits"] == 1
+    for sample in samples:
+        assert np.all(sample["img"] == expected["img"])
+        assert (sample["height"], sample["width"]) == (
+            expected["height"],
+            expected["width"],
+        )
+        assert sample["labels"] == expected["labels"]
+        assert sample["bboxes"] == expected["bboxes"]
+        assert sample["iscrowds"] == expected["iscrowds"]
+        masks, expected_masks = sample["masks"], expected["masks"]
+        if lazy_masks:
+            assert masks.erles == expected_masks.erles
+        else:
+            assert np.all(masks.data == expected_masks.data)
+
+
+def test_adapter_cache_key_masks(records):
+    tfm = tfms.A.Adapter(tfms.A.resize_and_pad(384), cache=TfmsCache(max_bytes=0))
+    record = records[0].load()
+    data = record.as_dict()
+    annotations = {
+        k: data.get(k) for k in ("labels", "bboxes", "masks", "iscrowds", "keypoints")
+    }
+    key = tfm._cache_key(data["img"], annotations, data)
+
+    masks = annotations["masks"].data.copy()
+    masks[0] = 1 - masks[0]
+    changed = {**annotations, "masks": MaskArray(masks)}
+    assert tfm._cache_key(data["img"], changed, data) != key